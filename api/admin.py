@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist
+from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist, DailyServiceRollup, ReportJob, AppointmentTombstone, AppointmentEvent, ArchivedAppointment, WaitlistEntry
 
 
 @admin.register(CustomUser)
@@ -54,3 +54,62 @@ class ReceptionistAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'hire_date')
     search_fields = ('user__email', 'user__first_name', 'user__last_name', 'employee_id')
     readonly_fields = ('id', 'created_at', 'updated_at')
+
+
+@admin.register(DailyServiceRollup)
+class DailyServiceRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'professional', 'service_type', 'status', 'count', 'revenue', 'total_duration')
+    list_filter = ('status', 'date')
+    search_fields = ('professional__name', 'service_type__name')
+    date_hierarchy = 'date'
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('report', 'status', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('report', 'status', 'created_at')
+    readonly_fields = ('id', 'fingerprint', 'data_version', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+
+@admin.register(AppointmentTombstone)
+class AppointmentTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('appointment_id', 'scheduled_date', 'professional_id', 'deleted_at')
+    list_filter = ('deleted_at',)
+    readonly_fields = ('appointment_id', 'scheduled_date', 'professional_id', 'deleted_at')
+
+
+@admin.register(AppointmentEvent)
+class AppointmentEventAdmin(admin.ModelAdmin):
+    list_display = ('appointment_id', 'kind', 'status', 'scheduled_date', 'scheduled_time', 'occurred_at')
+    list_filter = ('kind', 'status', 'occurred_at')
+    search_fields = ('appointment_id',)
+
+    # The log is append-only, entries are only written by appointment changes
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(admin.ModelAdmin):
+    list_display = ('client', 'professional', 'service_type', 'scheduled_date', 'scheduled_time', 'status', 'archived_at')
+    list_filter = ('status', 'scheduled_date')
+    search_fields = ('client__name', 'professional__name', 'service_type__name')
+    date_hierarchy = 'scheduled_date'
+
+    # Archived appointments are only written by the archiver
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('client', 'service_type', 'professional', 'earliest_date', 'latest_date', 'earliest_time', 'latest_time', 'status')
+    list_filter = ('status', 'service_type', 'earliest_date')
+    search_fields = ('client__name', 'service_type__name', 'professional__name')
+    readonly_fields = ('id', 'created_at', 'updated_at')
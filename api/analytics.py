@@ -0,0 +1,388 @@
+import threading
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Max
+from django.utils import timezone
+from .models import Appointment, AppointmentRecord, AppointmentTombstone
+from .reports import ServiceReportManager
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, the analytics engine is disabled without it
+    np = None
+
+
+STATUS_CODES = {status: code for code, (status, label) in enumerate(Appointment.STATUS_CHOICES)}
+STATUSES = [status for status, label in Appointment.STATUS_CHOICES]
+
+# Dimensions accepted by ColumnarAppointmentStore.breakdown
+BREAKDOWN_DIMENSIONS = ('professional', 'service_type', 'weekday', 'hour', 'status')
+
+LOAD_CHUNK_SIZE = 5000
+
+_COLUMNS = (
+    ('date', 'int32'),            # date.toordinal()
+    ('time', 'int16'),            # minutes since midnight
+    ('professional', 'int32'),    # code in professional_ids
+    ('service_type', 'int32'),    # code in service_type_ids
+    ('status', 'int8'),           # code in STATUSES
+    ('price_cents', 'int64'),
+    ('duration', 'int32'),
+)
+
+
+def numpy_available():
+    return np is not None
+
+
+class ColumnarAppointmentStore:
+    """
+    In-memory columnar copy of the appointment table.
+
+    Every appointment is one position in a set of compact NumPy arrays
+    (int-coded date, time, professional, service type and status, price in
+    cents and duration). Group-bys are answered with vectorized bincounts
+    instead of SQL. refresh() only reads appointments whose updated_at moved
+    past the last load, and drops deleted ones from the AppointmentTombstone
+    records written since. It reloads everything only when the tombstones it
+    still needs may have been purged.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImproperlyConfigured('The analytics engine requires numpy (pip install numpy).')
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.size = 0
+        self.columns = {name: np.zeros(1024, dtype=dtype) for name, dtype in _COLUMNS}
+        self.positions = {}
+        self.appointment_ids = []
+        self.professional_ids = []
+        self.service_type_ids = []
+        self._professional_codes = {}
+        self._service_type_codes = {}
+        self.watermark = None
+        self.deleted_watermark = None
+
+    def _grow(self, needed):
+        capacity = len(self.columns['date'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, values in self.columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+
+    @staticmethod
+    def _code(value, codes, ids):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(ids)
+            ids.append(value)
+        return code
+
+    def refresh(self):
+        """
+        Bring the arrays up to date with the appointments, archived ones included.
+
+        Returns:
+            int: Number of appointment rows read
+        """
+        with self._lock:
+            now = timezone.now()
+            sync_settings = getattr(settings, 'APPOINTMENT_SYNC', {})
+            retention = timedelta(days=sync_settings.get('TOMBSTONE_RETENTION_DAYS', 30))
+            if self.deleted_watermark is not None and self.deleted_watermark < now - retention:
+                # Tombstones written since the last refresh may be purged already
+                self._reset()
+
+            if self.watermark is not None:
+                self._drop_deleted()
+            # Deletes committing a little after their tombstone's deleted_at are read again next time
+            self.deleted_watermark = now - timedelta(seconds=sync_settings.get('LAG_SECONDS', 5))
+
+            queryset = AppointmentRecord.objects.all()
+            if self.watermark is not None:
+                queryset = queryset.filter(updated_at__gte=self.watermark)
+
+            new_watermark = queryset.aggregate(latest=Max('updated_at'))['latest']
+            if new_watermark is None:
+                return 0
+
+            rows = queryset.filter(updated_at__lte=new_watermark).values_list(
+                'id', 'scheduled_date', 'scheduled_time', 'professional_id', 'service_type_id',
+                'status', 'price', 'duration_minutes'
+            ).iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+            read = 0
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == LOAD_CHUNK_SIZE:
+                    self._load_chunk(chunk)
+                    read += len(chunk)
+                    chunk = []
+            if chunk:
+                self._load_chunk(chunk)
+                read += len(chunk)
+
+            self.watermark = new_watermark
+            return read
+
+    def _drop_deleted(self):
+        """Remove the appointments deleted since the last refresh"""
+        tombstones = AppointmentTombstone.objects.filter(deleted_at__gte=self.deleted_watermark)
+        for appointment_id in tombstones.values_list('appointment_id', flat=True):
+            self._remove(appointment_id)
+
+    def _remove(self, appointment_id):
+        """Move the last row into the removed row's position, keeping the arrays dense"""
+        position = self.positions.pop(appointment_id, None)
+        if position is None:
+            return
+        last = self.size - 1
+        if position != last:
+            moved = self.appointment_ids[last]
+            for values in self.columns.values():
+                values[position] = values[last]
+            self.appointment_ids[position] = moved
+            self.positions[moved] = position
+        self.appointment_ids.pop()
+        self.size = last
+
+    def _load_chunk(self, rows):
+        positions = np.empty(len(rows), dtype=np.int64)
+        values = {name: [] for name, dtype in _COLUMNS}
+
+        next_position = self.size
+        for index, (appointment_id, day, start, professional_id, service_type_id, status, price, duration) in enumerate(rows):
+            position = self.positions.get(appointment_id)
+            if position is None:
+                position = self.positions[appointment_id] = next_position
+                self.appointment_ids.append(appointment_id)
+                next_position += 1
+            positions[index] = position
+
+            values['date'].append(day.toordinal())
+            values['time'].append(start.hour * 60 + start.minute)
+            values['professional'].append(self._code(professional_id, self._professional_codes, self.professional_ids))
+            values['service_type'].append(self._code(service_type_id, self._service_type_codes, self.service_type_ids))
+            values['status'].append(STATUS_CODES[status])
+            values['price_cents'].append(int(round(price * 100)))
+            values['duration'].append(duration)
+
+        self._grow(next_position)
+        self.size = next_position
+        for name, column in values.items():
+            self.columns[name][positions] = column
+
+    def _mask(self, start_date=None, end_date=None, professional_id=None, service_type_id=None, status=None):
+        columns = {name: values[:self.size] for name, values in self.columns.items()}
+        mask = np.ones(self.size, dtype=bool)
+
+        if start_date:
+            mask &= columns['date'] >= start_date.toordinal()
+        if end_date:
+            mask &= columns['date'] <= end_date.toordinal()
+        if professional_id:
+            code = self._professional_codes.get(_as_uuid(professional_id))
+            mask &= columns['professional'] == (-1 if code is None else code)
+        if service_type_id:
+            code = self._service_type_codes.get(_as_uuid(service_type_id))
+            mask &= columns['service_type'] == (-1 if code is None else code)
+        if status:
+            mask &= columns['status'] == STATUS_CODES[status]
+
+        return columns, mask
+
+    @staticmethod
+    def _group(keys, mask, columns, size):
+        """Count, price cents and duration sums per key code"""
+        selected = keys[mask]
+        return (
+            np.bincount(selected, minlength=size),
+            np.bincount(selected, weights=columns['price_cents'][mask], minlength=size),
+            np.bincount(selected, weights=columns['duration'][mask], minlength=size),
+        )
+
+    def _grouped(self, dimension, **filters):
+        columns, mask = self._mask(**filters)
+        if dimension == 'professional':
+            keys, size = columns['professional'], len(self.professional_ids)
+        elif dimension == 'service_type':
+            keys, size = columns['service_type'], len(self.service_type_ids)
+        elif dimension == 'weekday':
+            keys, size = (columns['date'] - 1) % 7, 7
+        elif dimension == 'hour':
+            keys, size = columns['time'] // 60, 24
+        elif dimension == 'status':
+            keys, size = columns['status'], len(STATUSES)
+        else:
+            raise ValueError(f'Unknown dimension: {dimension}')
+
+        counts, cents, durations = self._group(keys.astype(np.int64), mask, columns, size)
+        return {
+            int(code): (int(counts[code]), int(cents[code]), int(durations[code]))
+            for code in np.flatnonzero(counts)
+        }
+
+    def breakdown(self, dimension, start_date=None, end_date=None, professional_id=None, service_type_id=None, status='completed'):
+        """
+        Count, revenue and duration of appointments grouped by one dimension.
+
+        Args:
+            dimension (str): One of BREAKDOWN_DIMENSIONS
+            status (str): Only count appointments in this status (None for all)
+
+        Returns:
+            list: One dict per non-empty group
+        """
+        if dimension not in BREAKDOWN_DIMENSIONS:
+            raise ValueError(f'Unknown dimension: {dimension}')
+
+        with self._lock:
+            groups = self._grouped(
+                dimension, start_date=start_date, end_date=end_date,
+                professional_id=professional_id, service_type_id=service_type_id, status=status
+            )
+            professional_ids = list(self.professional_ids)
+            service_type_ids = list(self.service_type_ids)
+
+        labels = {
+            'professional': lambda code: professional_ids[code],
+            'service_type': lambda code: service_type_ids[code],
+            'status': lambda code: STATUSES[code],
+        }.get(dimension, lambda code: code)
+
+        return [
+            {
+                dimension: labels(code),
+                'count': count,
+                'revenue': _cents_to_decimal(cents),
+                'total_duration': duration,
+            }
+            for code, (count, cents, duration) in sorted(groups.items())
+        ]
+
+
+class ColumnarReportManager(ServiceReportManager):
+    """
+    ServiceReportManager answering from a ColumnarAppointmentStore.
+
+    Results have the same shape as the ORM-backed manager.
+    """
+    store = None
+
+    @classmethod
+    def _grouped(cls, dimension, **filters):
+        store = cls.store
+        with store._lock:
+            groups = store._grouped(dimension, **filters)
+            if dimension == 'professional':
+                return {store.professional_ids[code]: totals for code, totals in groups.items()}
+            if dimension == 'service_type':
+                return {store.service_type_ids[code]: totals for code, totals in groups.items()}
+            return groups
+
+    @classmethod
+    def _completed_rollup_rows(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None):
+        """Rows shaped like ROLLUP_COLUMNS, built from the arrays instead of the rollup table"""
+        store = cls.store
+        with store._lock:
+            columns, mask = store._mask(start_date, end_date, professional_id, service_type_id, 'completed')
+            if not mask.any():
+                return []
+
+            professionals = len(store.professional_ids)
+            service_types = len(store.service_type_ids)
+            keys = (
+                columns['date'][mask].astype(np.int64) * professionals + columns['professional'][mask]
+            ) * service_types + columns['service_type'][mask]
+
+            # Only the (day, professional, service type) combinations that occur
+            combinations, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse)
+            cents = np.bincount(inverse, weights=columns['price_cents'][mask])
+            durations = np.bincount(inverse, weights=columns['duration'][mask])
+
+            rows = []
+            for index, key in enumerate(combinations.tolist()):
+                day, rest = divmod(key, professionals * service_types)
+                professional, service_type = divmod(rest, service_types)
+                rows.append((
+                    date.fromordinal(day),
+                    store.professional_ids[professional],
+                    store.service_type_ids[service_type],
+                    int(counts[index]),
+                    _cents_to_decimal(cents[index]),
+                    int(durations[index]),
+                ))
+            return rows
+
+    @classmethod
+    def get_performance_metrics(cls, start_date=None, end_date=None):
+        groups = cls._grouped('status', start_date=start_date, end_date=end_date)
+        by_status = {STATUSES[code]: count for code, (count, cents, duration) in groups.items()}
+        total = sum(by_status.values())
+
+        def rate(status):
+            return round(by_status.get(status, 0) / total * 100, 2) if total else 0
+
+        return {
+            'total_appointments': total,
+            'completed_appointments': by_status.get('completed', 0),
+            'completion_rate': rate('completed'),
+            'cancellation_rate': rate('cancelled'),
+            'no_show_rate': rate('no_show'),
+            'status_breakdown': [
+                {'status': status, 'count': by_status[status]}
+                for status in sorted(by_status)
+            ]
+        }
+
+    @classmethod
+    def get_completed_services_count(cls, start_date=None, end_date=None):
+        store = cls.store
+        with store._lock:
+            columns, mask = store._mask(start_date, end_date, status='completed')
+            return int(mask.sum())
+
+
+def _cents_to_decimal(cents):
+    return (Decimal(int(cents)) / 100).quantize(Decimal('0.01'))
+
+
+def _as_uuid(value):
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(refresh=True):
+    """
+    Get the process-wide columnar store, loading it on first use.
+
+    Raises:
+        ImproperlyConfigured: When numpy is not installed
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ColumnarAppointmentStore()
+            ColumnarReportManager.store = _store
+    if refresh:
+        _store.refresh()
+    return _store
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Appointment, AppointmentRecord, ArchivedAppointment
+
+
+# Statuses that no longer change, the only ones archived
+CLOSED_STATUSES = ('completed', 'cancelled', 'no_show')
+
+ARCHIVED_FIELDS = (
+    'id', 'client_id', 'professional_id', 'service_type_id', 'scheduled_date', 'scheduled_time',
+    'duration_minutes', 'end_minute', 'price', 'status', 'notes', 'version',
+    'created_at', 'updated_at', 'created_by_id',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, 'APPOINTMENT_ARCHIVE', {}).get(name, default)
+
+
+class AppointmentArchive:
+    """
+    Moves closed, old appointments out of the working table.
+
+    The agenda only works on recent and upcoming days, so keeping years of
+    closed appointments in api_appointment only makes its indexes larger.
+    Archived rows keep their id and columns in ArchivedAppointment, and
+    queries reaching archived days read AppointmentRecord, a view over both
+    tables. Rollups, counters and the event log are left as they are:
+    archiving does not change any report.
+    """
+
+    @staticmethod
+    def cutoff(today=None):
+        """First day kept in the working table"""
+        today = today or timezone.localdate()
+        return today - timedelta(days=_setting('HORIZON_DAYS', 365))
+
+    @staticmethod
+    def latest_archived_date():
+        """
+        Latest scheduled_date in the archive, None when it is empty.
+
+        Read on every call rather than cached: archiving usually runs in
+        another process, and a stale boundary would hide archived rows.
+        The max is one lookup at the end of idx_archived_keyset.
+        """
+        return ArchivedAppointment.objects.aggregate(latest=Max('scheduled_date'))['latest']
+
+    @classmethod
+    def reaches_archive(cls, start_date=None):
+        """Whether a query starting at start_date (None for no lower bound) can match archived rows"""
+        latest = cls.latest_archived_date()
+        return latest is not None and (start_date is None or start_date <= latest)
+
+    @classmethod
+    def queryset(cls, start_date=None):
+        """Appointments for a query starting at start_date, with the archive only when it is needed"""
+        if cls.reaches_archive(start_date):
+            return AppointmentRecord.objects.all()
+        return Appointment.objects.all()
+
+    @staticmethod
+    def archive(before, batch_size=None):
+        """
+        Move closed appointments scheduled before a day to the archive.
+
+        Each batch is copied and deleted in its own transaction, so the
+        working table is never locked for long. The delete skips model
+        signals: the appointments are moved, not removed, and derived data
+        must keep counting them.
+
+        Args:
+            before (date): Appointments scheduled before this day are archived
+            batch_size (int): Appointments moved per transaction
+
+        Returns:
+            int: Number of appointments archived
+        """
+        batch_size = batch_size or _setting('BATCH_SIZE', 1000)
+        candidates = Appointment.objects.filter(status__in=CLOSED_STATUSES, scheduled_date__lt=before)
+        archived = 0
+
+        while True:
+            with transaction.atomic():
+                ids = list(candidates.order_by('scheduled_date', 'id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+
+                now = timezone.now()
+                batch = Appointment.objects.filter(pk__in=ids)
+                ArchivedAppointment.objects.bulk_create(
+                    [ArchivedAppointment(archived_at=now, **row) for row in batch.values(*ARCHIVED_FIELDS)]
+                )
+                batch._raw_delete(batch.db)
+            archived += len(ids)
+
+        return archived
+
+    @staticmethod
+    def count_archivable(before):
+        return Appointment.objects.filter(status__in=CLOSED_STATUSES, scheduled_date__lt=before).count()
@@ -0,0 +1,199 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from .models import Appointment, Professional
+
+
+def _setting(name, default):
+    return getattr(settings, 'SALON_HOURS', {}).get(name, default)
+
+
+def _minutes(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%H:%M').time()
+    return value.hour * 60 + value.minute
+
+
+class ScheduleGrid:
+    """
+    Fixed grid of equal slots covering the salon's opening hours.
+
+    One professional-day is stored as a Python int used as a bitmap: bit i
+    is set when slot i is taken. Marking an appointment, merging days and
+    searching for N consecutive free slots are then a handful of integer
+    operations, whatever the number of appointments in the day.
+    """
+
+    def __init__(self, opening_time=None, closing_time=None, slot_minutes=None, closed_weekdays=None):
+        self.opening = _minutes(opening_time or _setting('OPENING_TIME', '08:00'))
+        self.closing = _minutes(closing_time or _setting('CLOSING_TIME', '18:00'))
+        self.slot_minutes = slot_minutes or _setting('SLOT_MINUTES', 15)
+        self.closed_weekdays = set(_setting('CLOSED_WEEKDAYS', [6]) if closed_weekdays is None else closed_weekdays)
+        self.slots = (self.closing - self.opening) // self.slot_minutes
+        self.full = (1 << self.slots) - 1
+
+    def is_open(self, day):
+        return day.weekday() not in self.closed_weekdays
+
+    def slots_needed(self, duration_minutes):
+        return max(1, -(-duration_minutes // self.slot_minutes))
+
+    def mask(self, start_time, duration_minutes):
+        """Bitmap of the slots touched by an interval, clipped to opening hours"""
+        start = _minutes(start_time) - self.opening
+        end = start + duration_minutes
+        first = max(0, start // self.slot_minutes)
+        last = min(self.slots, -(-end // self.slot_minutes))
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def start_window(self, start_time, end_time, slots_needed):
+        """Bitmap of the start slots keeping `slots_needed` slots inside a time window"""
+        first = max(0, -(-(_minutes(start_time) - self.opening) // self.slot_minutes))
+        last = min(self.slots, (_minutes(end_time) - self.opening) // self.slot_minutes) - slots_needed
+        if last < first:
+            return 0
+        return ((1 << (last - first + 1)) - 1) << first
+
+    def slot_time(self, slot):
+        minutes = self.opening + slot * self.slot_minutes
+        return time(minutes // 60, minutes % 60)
+
+    def fitting_starts(self, busy, slots_needed):
+        """
+        Bitmap of the slots where `slots_needed` consecutive free slots begin.
+
+        Shifting the free bitmap by 1, 2, 4... and AND-ing it with itself
+        grows the run that every set bit guarantees, so the search costs
+        O(log slots_needed) integer operations.
+        """
+        starts = self.full & ~busy
+        covered = 1
+        while covered < slots_needed:
+            step = min(covered, slots_needed - covered)
+            starts &= starts >> step
+            covered += step
+        return starts
+
+    def free_intervals(self, busy, slots_needed):
+        """
+        Maximal free intervals of a day that fit `slots_needed` slots.
+
+        Returns:
+            list: (start slot, end slot) pairs, end exclusive
+        """
+        starts = self.fitting_starts(busy, slots_needed)
+        free = self.full & ~busy
+        intervals = []
+        while starts:
+            first = (starts & -starts).bit_length() - 1
+            run = (free >> first) & ~((free >> first) + 1)
+            end = first + run.bit_length()
+            intervals.append((first, end))
+            starts &= ~((1 << end) - 1)
+        return intervals
+
+
+class AvailabilityManager:
+    """Free-slot search over the appointments of every active professional"""
+
+    @staticmethod
+    def busy_bitmaps(grid, start_date, end_date, professional_ids=None, exclude_id=None):
+        """
+        Build the taken-slot bitmap of every professional-day in a range.
+
+        Args:
+            grid (ScheduleGrid): Slot grid
+            start_date (date): First day (inclusive)
+            end_date (date): Last day (inclusive)
+            professional_ids (list): Only these professionals (None for all)
+            exclude_id: Appointment to leave out, e.g. the one being moved
+
+        Returns:
+            dict: Bitmap per (professional_id, date), days without appointments are absent
+        """
+        appointments = Appointment.objects.filter(
+            scheduled_date__gte=start_date,
+            scheduled_date__lte=end_date,
+            status__in=Appointment.BLOCKING_STATUSES
+        )
+        if professional_ids is not None:
+            appointments = appointments.filter(professional_id__in=professional_ids)
+        if exclude_id:
+            appointments = appointments.exclude(pk=exclude_id)
+
+        bitmaps = {}
+        rows = appointments.values_list('professional_id', 'scheduled_date', 'scheduled_time', 'duration_minutes')
+        for professional_id, day, start_time, duration in rows.iterator(chunk_size=2000):
+            key = (professional_id, day)
+            bitmaps[key] = bitmaps.get(key, 0) | grid.mask(start_time, duration)
+        return bitmaps
+
+    @staticmethod
+    def find_free_slots(service_type, start_date, end_date, professional_id=None, now=None, grid=None):
+        """
+        Find when each active professional can take a service.
+
+        Args:
+            service_type (ServiceType): Service to fit, its duration_minutes sets the window
+            start_date (date): First day (inclusive)
+            end_date (date): Last day (inclusive)
+            professional_id: Only search this professional
+            now (datetime): Slots before this moment are not offered
+
+        Returns:
+            dict: Free intervals per professional and day
+        """
+        grid = grid or ScheduleGrid()
+        professionals = Professional.objects.filter(is_active=True).order_by('name')
+        if professional_id:
+            professionals = professionals.filter(pk=professional_id)
+        professionals = list(professionals.values_list('id', 'name'))
+
+        ids = [professional for professional, name in professionals]
+        bitmaps = AvailabilityManager.busy_bitmaps(grid, start_date, end_date, ids) if ids else {}
+        slots_needed = grid.slots_needed(service_type.duration_minutes)
+
+        days = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+        ]
+        days = [day for day in days if grid.is_open(day)]
+
+        past = {}
+        if now is not None:
+            # Slots already started today count as taken
+            elapsed = _minutes(now.time()) - grid.opening
+            if elapsed > 0:
+                past[now.date()] = grid.mask(grid.slot_time(0), elapsed)
+            days = [day for day in days if day >= now.date()]
+
+        results = []
+        for professional, name in professionals:
+            free_days = []
+            for day in days:
+                busy = bitmaps.get((professional, day), 0) | past.get(day, 0)
+                intervals = grid.free_intervals(busy, slots_needed)
+                if intervals:
+                    free_days.append({
+                        'date': day,
+                        'free': [
+                            {'start': grid.slot_time(first), 'end': grid.slot_time(end)}
+                            for first, end in intervals
+                        ]
+                    })
+            results.append({
+                'professional_id': professional,
+                'professional_name': name,
+                'days': free_days,
+            })
+
+        return {
+            'service_type_id': service_type.id,
+            'service_type_name': service_type.name,
+            'duration_minutes': service_type.duration_minutes,
+            'slot_minutes': grid.slot_minutes,
+            'start': start_date,
+            'end': end_date,
+            'professionals': results,
+        }
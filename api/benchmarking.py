@@ -0,0 +1,195 @@
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import time as dt_time, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Appointment, Client, Professional, ServiceType, minutes_after_midnight
+from .rollups import RollupManager
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(function, repeat=5, warmup=1, track_memory=False):
+    """
+    Time a callable over several runs.
+
+    Args:
+        function (callable): Code to time, called without arguments
+        repeat (int): Number of timed runs
+        warmup (int): Untimed runs made first
+        track_memory (bool): Also record peak Python memory of one run
+
+    Returns:
+        dict: p50, p95 and mean latency in milliseconds, queries per run
+        and, when requested, peak memory in KiB
+    """
+    for _ in range(warmup):
+        function()
+
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    result = {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': len(queries.captured_queries) // repeat,
+    }
+
+    if track_memory:
+        tracemalloc.start()
+        try:
+            function()
+            result['peak_memory_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+SERVICE_CATALOG = (
+    ('Corte de Cabelo', Decimal('50.00'), 60),
+    ('Corte Masculino', Decimal('30.00'), 45),
+    ('Manicure', Decimal('25.00'), 45),
+    ('Pedicure', Decimal('30.00'), 60),
+    ('Escova', Decimal('80.00'), 120),
+    ('Coloração', Decimal('120.00'), 180),
+    ('Hidratação', Decimal('40.00'), 90),
+    ('Maquiagem', Decimal('60.00'), 60),
+    ('Sobrancelha', Decimal('20.00'), 30),
+    ('Massagem', Decimal('70.00'), 90),
+)
+
+# Same status mix as create_test_data.py
+STATUS_WEIGHTS = (('scheduled', 0.1), ('completed', 0.7), ('cancelled', 0.15), ('no_show', 0.05))
+
+# Half-hour slots from 08:00 to 17:30
+SLOT_TIMES = tuple(dt_time(hour, minute) for hour in range(8, 18) for minute in (0, 30))
+
+
+class SyntheticDataset:
+    """
+    Deterministic appointment dataset for benchmarks.
+
+    Appointment number i always lands on the same (day, professional, slot)
+    cell of the calendar grid, and all other fields come from one seeded
+    random stream, so a dataset of N appointments is the first N rows of
+    every larger one. grow() can therefore step through several sizes
+    without regenerating what is already stored.
+
+    Rows are written with bulk_create, which skips the model signals, so
+    the rollup table is rebuilt once after every grow().
+    """
+
+    def __init__(self, end_date, seed=42, span_days=730, professionals=400, clients=2000):
+        self.end_date = end_date
+        self.start_date = end_date - timedelta(days=span_days - 1)
+        self.seed = seed
+        self.span_days = span_days
+        self.professional_count = professionals
+        self.client_count = clients
+        self.capacity = span_days * professionals * len(SLOT_TIMES)
+        self.stride = self._stride(self.capacity)
+        self.size = 0
+        self._random = random.Random(seed)
+        self._catalog = None
+
+    @staticmethod
+    def _stride(capacity):
+        """A step coprime with the capacity, so i * stride % capacity visits every cell once"""
+        stride = int(capacity * 0.6180339887) | 1
+        while math.gcd(stride, capacity) != 1:
+            stride += 2
+        return stride
+
+    def _create_catalog(self):
+        if Appointment.objects.exists():
+            raise ValueError('The synthetic dataset needs an empty appointments table.')
+
+        services = ServiceType.objects.bulk_create(
+            ServiceType(name=name, base_price=price, duration_minutes=duration)
+            for name, price, duration in SERVICE_CATALOG
+        )
+        professionals = Professional.objects.bulk_create(
+            Professional(name=f'Profissional {number}', cpf=f'{90000000000 + number:011d}')
+            for number in range(self.professional_count)
+        )
+        clients = Client.objects.bulk_create(
+            (
+                Client(
+                    name=f'Cliente {number}', cpf=f'{80000000000 + number:011d}',
+                    phone=f'+55119{number:08d}', email=f'cliente{number}@benchmark.local'
+                )
+                for number in range(self.client_count)
+            ),
+            batch_size=1000
+        )
+        self._catalog = (services, professionals, clients)
+
+    def _build(self, index):
+        services, professionals, clients = self._catalog
+        rng = self._random
+        cell = index * self.stride % self.capacity
+        day, rest = divmod(cell, self.professional_count * len(SLOT_TIMES))
+        professional, slot = divmod(rest, len(SLOT_TIMES))
+
+        service = services[rng.randrange(len(services))]
+        price = (service.base_price * Decimal(rng.randint(80, 120)) / 100).quantize(Decimal('0.01'))
+        status = rng.choices([status for status, weight in STATUS_WEIGHTS],
+                             weights=[weight for status, weight in STATUS_WEIGHTS])[0]
+
+        return Appointment(
+            client=clients[rng.randrange(len(clients))],
+            professional=professionals[professional],
+            service_type=service,
+            scheduled_date=self.start_date + timedelta(days=day),
+            scheduled_time=SLOT_TIMES[slot],
+            duration_minutes=service.duration_minutes,
+            end_minute=minutes_after_midnight(SLOT_TIMES[slot]) + service.duration_minutes,
+            price=price,
+            status=status,
+        )
+
+    def grow(self, size, batch_size=5000, progress=None):
+        """
+        Append appointments until the dataset holds `size` rows.
+
+        Args:
+            size (int): Target number of appointments
+            batch_size (int): Rows per INSERT batch
+            progress (callable): Called with the number of rows stored after each batch
+
+        Returns:
+            int: Number of appointments added
+        """
+        if size > self.capacity:
+            raise ValueError(
+                f'{size} appointments do not fit in {self.span_days} days x {self.professional_count} '
+                f'professionals x {len(SLOT_TIMES)} slots.'
+            )
+        if self._catalog is None:
+            self._create_catalog()
+
+        added = 0
+        while self.size < size:
+            count = min(batch_size, size - self.size)
+            Appointment.objects.bulk_create([self._build(self.size + offset) for offset in range(count)])
+            self.size += count
+            added += count
+            if progress:
+                progress(self.size)
+
+        if added:
+            RollupManager.rebuild()
+        return added
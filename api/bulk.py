@@ -0,0 +1,244 @@
+from collections import defaultdict
+from django.db import transaction
+from django.utils import timezone
+from .availability import ScheduleGrid
+from .models import Appointment, Client, Professional, ServiceType, minutes_after_midnight
+from .serializers import AppointmentBulkItemSerializer
+from .signals import notify_appointment_changes, snapshot
+from .waitlist import WaitlistMatcher
+
+
+# Largest number of items accepted in one bulk request
+BULK_MAX_ITEMS = 500
+
+RELATED_FIELDS = (
+    ('client', Client),
+    ('professional', Professional),
+    ('service_type', ServiceType),
+)
+
+UPDATE_FIELDS = (
+    'client', 'professional', 'service_type', 'scheduled_date', 'scheduled_time',
+    'duration_minutes', 'end_minute', 'price', 'status', 'notes', 'version', 'updated_at',
+)
+
+
+class DaySchedule:
+    """Appointments of one professional-day, as (id, start minute, end minute, status) entries"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, appointment_id, scheduled_time, end_minute, status):
+        self.entries[appointment_id] = (minutes_after_midnight(scheduled_time), end_minute, status)
+
+    def remove(self, appointment_id):
+        self.entries.pop(appointment_id, None)
+
+    def conflict(self, appointment_id, scheduled_time, end_minute, status):
+        """Error message for the first clash with another entry, None when the slot is free"""
+        start = minutes_after_midnight(scheduled_time)
+        for other_id, (other_start, other_end, other_status) in sorted(self.entries.items(), key=lambda item: item[1]):
+            if other_id == appointment_id:
+                continue
+            if other_start == start:
+                return 'The professional already has an appointment starting at this time.'
+            if (
+                status in Appointment.BLOCKING_STATUSES and other_status in Appointment.BLOCKING_STATUSES
+                and other_start < end_minute and start < other_end
+            ):
+                return (
+                    f'The professional already has an appointment from '
+                    f'{other_start // 60:02d}:{other_start % 60:02d} to {other_end // 60:02d}:{other_end % 60:02d}.'
+                )
+        return None
+
+
+class BulkAppointmentWriter:
+    """
+    Creates and updates many appointments in one transaction.
+
+    Related rows, the appointments being updated and every appointment of
+    the professional-days the batch touches are loaded with one query each.
+    Items are then validated in order against that preloaded schedule (and
+    against the items accepted before them), and the accepted ones are
+    written with one bulk_create and one bulk_update. Items that fail are
+    reported without affecting the others. Updates that cancel an
+    appointment or mark it as a no-show get the waitlist candidates for the
+    freed time once the batch is saved.
+    """
+
+    @staticmethod
+    def write(items, user=None):
+        """
+        Validate and save a batch of appointments.
+
+        Args:
+            items (list): Appointment dicts, items with an id update that appointment
+            user (CustomUser): Recorded as created_by of new appointments
+
+        Returns:
+            list: One result per item, in order
+        """
+        results = [None] * len(items)
+        parsed = {}
+        freed = []
+
+        seen_ids = set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = _error(index, {'non_field_errors': ['Expected an object.']})
+                continue
+
+            serializer = AppointmentBulkItemSerializer(data=item, partial='id' in item)
+            if not serializer.is_valid():
+                results[index] = _error(index, serializer.errors)
+                continue
+
+            data = serializer.validated_data
+            if 'id' in data:
+                if data['id'] in seen_ids:
+                    results[index] = _error(index, {'id': ['This appointment appears more than once in the batch.']})
+                    continue
+                seen_ids.add(data['id'])
+            parsed[index] = data
+
+        with transaction.atomic():
+            existing = Appointment.objects.in_bulk(list(seen_ids)) if seen_ids else {}
+            related = BulkAppointmentWriter._load_related(parsed.values())
+
+            # Resolve every item into an unsaved or updated Appointment instance
+            pending = {}
+            for index, data in parsed.items():
+                built, errors = BulkAppointmentWriter._build(data, existing, related, user)
+                if errors:
+                    results[index] = _error(index, errors)
+                else:
+                    pending[index] = built
+
+            schedules = BulkAppointmentWriter._load_schedules(pending.values())
+
+            to_create = []
+            to_update = []
+            changes = []
+            now = timezone.now()
+            for index, (appointment, before) in pending.items():
+                key = (appointment.professional_id, appointment.scheduled_date)
+                message = schedules[key].conflict(
+                    appointment.pk, appointment.scheduled_time, appointment.end_minute, appointment.status
+                )
+                if message:
+                    results[index] = _error(index, {'scheduled_time': [message]})
+                    continue
+
+                if before is not None:
+                    schedules[(before.professional_id, before.scheduled_date)].remove(appointment.pk)
+                    appointment.updated_at = now
+                    appointment.version += 1
+                    to_update.append(appointment)
+                    if WaitlistMatcher.frees_slot(before.status, appointment.status):
+                        freed.append(index)
+                else:
+                    to_create.append(appointment)
+                schedules[key].add(appointment.pk, appointment.scheduled_time, appointment.end_minute, appointment.status)
+                changes.append((before, snapshot(appointment)))
+                results[index] = {
+                    'index': index,
+                    'status': 'updated' if before is not None else 'created',
+                    'id': appointment.pk,
+                }
+
+            # Updates first, they may free start times taken by the new appointments
+            if to_update:
+                Appointment.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+            if to_create:
+                Appointment.objects.bulk_create(to_create, batch_size=500)
+            if changes:
+                # bulk_create and bulk_update do not send model signals
+                notify_appointment_changes(changes)
+
+        if freed:
+            grid = ScheduleGrid()
+            now = timezone.localtime()
+            for index in freed:
+                results[index]['waitlist_candidates'] = WaitlistMatcher.for_appointment(
+                    results[index]['id'], now=now, grid=grid
+                )
+
+        return results
+
+    @staticmethod
+    def _load_related(items):
+        """Preload the clients, professionals and service types referenced by the batch"""
+        related = {}
+        for field, model in RELATED_FIELDS:
+            ids = {data[field] for data in items if field in data}
+            related[field] = model.objects.in_bulk(list(ids)) if ids else {}
+        return related
+
+    @staticmethod
+    def _build(data, existing, related, user):
+        """
+        Turn validated item data into an Appointment instance.
+
+        Returns:
+            tuple: (appointment, before) and None, or None and the item errors
+        """
+        before = None
+        if 'id' in data:
+            appointment = existing.get(data['id'])
+            if appointment is None:
+                return None, {'id': ['Appointment not found.']}
+            before = snapshot(appointment)
+        else:
+            appointment = Appointment(created_by=user)
+
+        errors = {}
+        for field, value in data.items():
+            if field == 'id':
+                continue
+            if field in related:
+                instance = related[field].get(value)
+                if instance is None:
+                    errors[field] = [f'Invalid pk "{value}" - object does not exist.']
+                    continue
+                setattr(appointment, field, instance)
+            else:
+                setattr(appointment, field, value)
+
+        if errors:
+            return None, errors
+
+        appointment.end_minute = minutes_after_midnight(appointment.scheduled_time) + appointment.duration_minutes
+        return (appointment, before), None
+
+    @staticmethod
+    def _load_schedules(pending):
+        """
+        Load every appointment of the professional-days the batch touches.
+
+        The professionals are locked first, so no other booking can land on
+        those days before the batch commits.
+        """
+        schedules = defaultdict(DaySchedule)
+        professional_ids = {appointment.professional_id for appointment, before in pending}
+        days = {appointment.scheduled_date for appointment, before in pending}
+        if not professional_ids:
+            return schedules
+
+        list(
+            Professional.objects.select_for_update()
+            .filter(pk__in=professional_ids).order_by('pk').values_list('pk')
+        )
+
+        rows = Appointment.objects.filter(
+            professional_id__in=professional_ids, scheduled_date__in=days
+        ).values_list('id', 'professional_id', 'scheduled_date', 'scheduled_time', 'end_minute', 'status')
+        for appointment_id, professional_id, day, scheduled_time, end_minute, status in rows:
+            schedules[(professional_id, day)].add(appointment_id, scheduled_time, end_minute, status)
+
+        return schedules
+
+
+def _error(index, errors):
+    return {'index': index, 'status': 'error', 'errors': errors}
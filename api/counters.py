@@ -0,0 +1,144 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from .archive import AppointmentArchive
+from .models import DailyServiceRollup
+
+
+COMPLETED_KEY = 'counters:completed:{}'
+
+# Seeded counters expire so a missed update cannot drift forever
+COUNTER_TIMEOUT = getattr(settings, 'REPORT_COUNTERS', {}).get('TIMEOUT', 86400)
+
+
+def _days(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+class CompletedServiceCounters:
+    """
+    Completed-service counts per day kept in Django's cache framework.
+
+    Counters are moved on commit whenever an appointment enters or leaves
+    the completed status (or a completed appointment changes day). A day
+    without a counter is seeded from the rollup table on first read, so
+    only counters that exist are ever incremented.
+    """
+
+    @staticmethod
+    def apply_change(before, after):
+        """
+        Move the counters for one appointment write once it commits.
+
+        Args:
+            before: Appointment state before the write (None when created)
+            after: Appointment state after the write (None when deleted)
+        """
+        CompletedServiceCounters.apply_changes([(before, after)])
+
+    @staticmethod
+    def apply_changes(changes):
+        """Move the counters for a batch of (before, after) appointment changes once it commits"""
+        deltas = {}
+        for before, after in changes:
+            for state, sign in ((before, -1), (after, 1)):
+                if state is not None and state.status == 'completed':
+                    deltas[state.scheduled_date] = deltas.get(state.scheduled_date, 0) + sign
+
+        deltas = {day: delta for day, delta in deltas.items() if delta}
+        if deltas:
+            transaction.on_commit(lambda: CompletedServiceCounters._apply(deltas))
+
+    @staticmethod
+    def _apply(deltas):
+        for day, delta in deltas.items():
+            try:
+                cache.incr(COMPLETED_KEY.format(day.isoformat()), delta)
+            except ValueError:
+                # Not seeded yet, the next read counts the committed rows
+                pass
+
+    @staticmethod
+    def get_counts(start_date, end_date):
+        """
+        Get the completed-service count of every day in a range.
+
+        Args:
+            start_date (date): First day (inclusive)
+            end_date (date): Last day (inclusive)
+
+        Returns:
+            dict: Count per day
+        """
+        keys = {COMPLETED_KEY.format(day.isoformat()): day for day in _days(start_date, end_date)}
+        cached = cache.get_many(list(keys))
+        counts = {day: cached[key] for key, day in keys.items() if key in cached}
+
+        missing = [day for day in keys.values() if day not in counts]
+        if missing:
+            seeded = CompletedServiceCounters._count_from_rollups(missing[0], missing[-1])
+            for day in missing:
+                value = seeded.get(day, 0)
+                if not cache.add(COMPLETED_KEY.format(day.isoformat()), value, timeout=COUNTER_TIMEOUT):
+                    # Seeded concurrently, keep the value other writers already moved
+                    value = cache.get(COMPLETED_KEY.format(day.isoformat()), value)
+                counts[day] = value
+
+        return counts
+
+    @staticmethod
+    def get_count(start_date, end_date):
+        return sum(CompletedServiceCounters.get_counts(start_date, end_date).values())
+
+    @staticmethod
+    def _count_from_rollups(start_date, end_date):
+        rows = (
+            DailyServiceRollup.objects
+            .filter(status='completed', date__gte=start_date, date__lte=end_date)
+            .values('date')
+            .annotate(total=Sum('count'))
+            .order_by()
+        )
+        return {row['date']: row['total'] for row in rows}
+
+    @staticmethod
+    def reconcile(start_date, end_date, fix=True):
+        """
+        Compare the cached counters of a range against the appointment table.
+
+        Days without a counter are skipped, they are seeded from the
+        database on their next read anyway.
+
+        Args:
+            start_date (date): First day (inclusive)
+            end_date (date): Last day (inclusive)
+            fix (bool): Overwrite counters that disagree with the table
+
+        Returns:
+            list: (day, cached, actual) for every counter that disagreed
+        """
+        keys = {COMPLETED_KEY.format(day.isoformat()): day for day in _days(start_date, end_date)}
+        cached = cache.get_many(list(keys))
+        if not cached:
+            return []
+
+        actual = dict(
+            AppointmentArchive.queryset(start_date)
+            .filter(status='completed', scheduled_date__gte=start_date, scheduled_date__lte=end_date)
+            .values_list('scheduled_date')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+
+        drift = []
+        for key, value in cached.items():
+            day = keys[key]
+            expected = actual.get(day, 0)
+            if value != expected:
+                drift.append((day, value, expected))
+                if fix:
+                    cache.set(key, expected, timeout=COUNTER_TIMEOUT)
+
+        return sorted(drift)
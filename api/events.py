@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import json
+import threading
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+EVENT_FIELDS = (
+    'id', 'scheduled_date', 'scheduled_time', 'professional_id', 'service_type_id',
+    'status', 'duration_minutes',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, 'APPOINTMENT_EVENTS', {}).get(name, default)
+
+
+class Subscription:
+    """
+    One listener of the broker, bound to the event loop that consumes it.
+
+    Events are handed to the loop with call_soon_threadsafe, so publishing
+    from a request thread never blocks on a slow listener. When the queue
+    is full the subscription is marked as lagged and stops receiving, and
+    the listener is expected to reload and subscribe again.
+    """
+
+    def __init__(self, loop, date=None, professional_id=None, queue_size=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size or _setting('QUEUE_SIZE', 100))
+        self.date = date
+        self.professional_id = professional_id
+        self.lagged = False
+
+    def matches(self, event):
+        states = [state for state in (event['appointment'], event['previous']) if state]
+        if self.date and not any(state['scheduled_date'] == self.date for state in states):
+            return False
+        if self.professional_id and not any(state['professional_id'] == self.professional_id for state in states):
+            return False
+        return True
+
+    def _put(self, event):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The listener's loop is already closed
+            pass
+
+
+class EventBroker:
+    """In-process publish/subscribe of appointment changes, for a single server process"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, date=None, professional_id=None):
+        """Register a listener on the running event loop"""
+        subscription = Subscription(asyncio.get_running_loop(), date, professional_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, event):
+        event = dict(event, sequence=next(self._sequence))
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+    def publish_changes(self, changes):
+        """Publish a batch of (before, after) appointment changes once the transaction commits"""
+        if not self._subscriptions:
+            return
+
+        events = [appointment_event(before, after) for before, after in changes]
+        transaction.on_commit(lambda: [self.publish(event) for event in events])
+
+
+def _state(snapshot):
+    if snapshot is None:
+        return None
+    state = {field: getattr(snapshot, field) for field in EVENT_FIELDS}
+    # Plain strings, so filters compare with query parameters as they arrive
+    return json.loads(json.dumps(state, cls=DjangoJSONEncoder))
+
+
+def appointment_event(before, after):
+    """Event describing one appointment write"""
+    if before is None:
+        kind = 'created'
+    elif after is None:
+        kind = 'deleted'
+    else:
+        kind = 'updated'
+    return {'event': kind, 'appointment': _state(after or before), 'previous': _state(before) if after else None}
+
+
+broker = EventBroker()
@@ -0,0 +1,177 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions, serializers
+
+
+def parse_fieldset(query_params):
+    """
+    Read ?fields= and ?expand= from a request.
+
+    fields takes comma-separated names; a dotted name (client.name) picks a
+    field of an expanded relation and expands it. expand takes the names of
+    relations to nest as objects instead of ids.
+
+    Returns:
+        tuple: (field names or None for all, {expanded name: nested field names or None})
+    """
+    requested = [name.strip() for name in query_params.get('fields', '').split(',') if name.strip()]
+    expand = {name.strip(): None for name in query_params.get('expand', '').split(',') if name.strip()}
+
+    fields = []
+    for name in requested:
+        head, _, rest = name.partition('.')
+        if rest:
+            expand[head] = (expand.get(head) or []) + [rest]
+        if head not in fields:
+            fields.append(head)
+
+    if not fields:
+        return None, expand
+    return fields + [name for name in expand if name not in fields], expand
+
+
+def select_fields(fields, requested):
+    """
+    Keep the requested fields, in their declaration order.
+
+    Raises:
+        ValidationError: When a requested field does not exist
+    """
+    unknown = [name for name in requested if name not in fields]
+    if unknown:
+        raise serializers.ValidationError({'fields': [f'Unknown field: {name}' for name in unknown]})
+    return {name: field for name, field in fields.items() if name in requested}
+
+
+class FieldsetSerializerMixin:
+    """
+    Serializer that can be trimmed to some fields and nest related objects.
+
+    Takes `fields` (names to keep, None for all) and `expand` ({name:
+    nested field names or None}) keyword arguments. Relations listed in
+    expandable_fields can be expanded into their own serializer.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self._requested_fields = fields
+        self._expand = expand or {}
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        unknown = [name for name in self._expand if name not in self.expandable_fields]
+        if unknown:
+            raise serializers.ValidationError({'expand': [f'Cannot expand: {name}' for name in unknown]})
+        for name, nested_fields in self._expand.items():
+            fields[name] = self.expandable_fields[name](read_only=True, fields=nested_fields)
+
+        if self._requested_fields is not None:
+            fields = select_fields(fields, self._requested_fields)
+        return fields
+
+
+def _model_columns(model, source):
+    """
+    Columns and relations needed to read a dotted source from a model.
+
+    Returns:
+        tuple: (only() paths, select_related() paths)
+
+    Raises:
+        FieldDoesNotExist: When the source is not a chain of forward relations ending in a field
+    """
+    parts = source.split('.')
+    columns, relations = [], []
+    for index, part in enumerate(parts):
+        field = model._meta.get_field(part)
+        if not field.concrete or field.many_to_many:
+            raise FieldDoesNotExist(source)
+        path = '__'.join(parts[:index + 1])
+        columns.append(path)
+        if index < len(parts) - 1:
+            if not field.is_relation:
+                raise FieldDoesNotExist(source)
+            relations.append(path)
+            model = field.related_model
+    return columns, relations
+
+
+def serializer_columns(serializer, prefix=''):
+    """
+    Columns a serializer reads, for .only(), and the relations to join.
+
+    Returns:
+        tuple: (only() paths, select_related() paths), or None when a field
+        reads something other than model columns (methods, properties)
+    """
+    model = serializer.Meta.model
+    columns, relations = [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        source = field.source
+        if source.startswith('get_') and source.endswith('_display'):
+            source = source[len('get_'):-len('_display')]
+
+        try:
+            field_columns, field_relations = _model_columns(model, source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, serializers.ListSerializer):
+            return None
+        if isinstance(field, serializers.BaseSerializer):
+            nested = serializer_columns(field, prefix=f'{prefix}{field_columns[-1]}__')
+            if nested is None:
+                return None
+            field_relations.append(field_columns[-1])
+            columns.extend(nested[0])
+            relations.extend(nested[1])
+
+        columns.extend(prefix + column for column in field_columns)
+        relations.extend(prefix + relation for relation in field_relations)
+
+    return list(dict.fromkeys(columns)), list(dict.fromkeys(relations))
+
+
+class FieldsetViewSetMixin:
+    """
+    ViewSet answering ?fields= and ?expand= on reads.
+
+    The serializer is trimmed to the requested fields and the queryset
+    selects only the columns they read (plus the keyset ordering), joining
+    just the relations they traverse. Writes always use every field.
+    """
+
+    def get_fieldset(self):
+        """(fields, expand) requested on a read, None when the full representation is wanted"""
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return None
+        fields, expand = parse_fieldset(self.request.query_params)
+        if fields is None and not expand:
+            return None
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None and issubclass(self.get_serializer_class(), FieldsetSerializerMixin):
+            kwargs.setdefault('fields', fieldset[0])
+            kwargs.setdefault('expand', fieldset[1])
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_fieldset() is None:
+            return queryset
+
+        needed = serializer_columns(self.get_serializer())
+        if needed is None:
+            return queryset
+        columns, relations = needed
+        columns += [field for field in getattr(self, 'keyset_ordering', ()) if field != 'pk']
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*dict.fromkeys(columns))
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.utils.encoders import JSONEncoder
+from .models import ReportJob
+from .report_cache import CachedServiceReportManager, report_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Parameters each report accepts, in call order
+REPORT_PARAMETERS = {
+    'completed_services': ('start_date', 'end_date', 'professional_id', 'service_type_id', 'granularity'),
+    'performance_metrics': ('start_date', 'end_date'),
+    'top_services': ('start_date', 'end_date', 'limit'),
+    'professional_performance': ('start_date', 'end_date'),
+}
+
+REPORT_METHODS = {
+    'completed_services': CachedServiceReportManager.get_completed_services_report,
+    'performance_metrics': CachedServiceReportManager.get_performance_metrics,
+    'top_services': CachedServiceReportManager.get_top_services,
+    'professional_performance': CachedServiceReportManager.get_professional_performance,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_JOBS', {}).get('WORKERS', 2),
+                thread_name_prefix='report-job'
+            )
+        return _executor
+
+
+def _run_in_worker(job_id):
+    try:
+        ReportJobManager.run(job_id)
+    finally:
+        # Worker threads are outside the request cycle, release their connection here
+        close_old_connections()
+
+
+class ReportJobManager:
+    """Creates, reuses and runs background report jobs"""
+
+    @staticmethod
+    def fingerprint(report, parameters):
+        payload = json.dumps([report, parameters], sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def submit(report, parameters, user=None):
+        """
+        Queue a report job, or return a finished job with the same spec.
+
+        A completed job is reused only while the report data version it was
+        computed at is still current.
+
+        Returns:
+            tuple: (ReportJob, created)
+        """
+        parameters = {name: parameters.get(name) for name in REPORT_PARAMETERS[report]}
+        fingerprint = ReportJobManager.fingerprint(report, parameters)
+
+        reusable = (
+            ReportJob.objects.filter(fingerprint=fingerprint)
+            .filter(status__in=['pending', 'running'])
+            .first()
+        ) or (
+            ReportJob.objects.filter(
+                fingerprint=fingerprint,
+                status='completed',
+                data_version=report_cache.data_version()
+            ).first()
+        )
+        if reusable:
+            return reusable, False
+
+        job = ReportJob.objects.create(
+            report=report,
+            parameters=json.loads(json.dumps(parameters, cls=DjangoJSONEncoder)),
+            fingerprint=fingerprint,
+            created_by=user if user and user.is_authenticated else None
+        )
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job.pk))
+        return job, True
+
+    @staticmethod
+    def run(job_id):
+        """Run one pending job. Safe to call from any thread or process."""
+        claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+            status='running',
+            started_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        job = ReportJob.objects.get(pk=job_id)
+        try:
+            data_version = report_cache.data_version()
+            result = ReportJobManager.compute(job.report, job.parameters)
+        except Exception as e:
+            logger.exception('Report job %s failed', job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job.status = 'completed'
+            job.data_version = data_version
+            # DRF's encoder, as the report endpoints render: Decimals stay numbers
+            job.result = json.loads(json.dumps(result, cls=JSONEncoder))
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'data_version', 'result', 'finished_at'])
+
+    @staticmethod
+    def compute(report, parameters):
+        arguments = []
+        for name in REPORT_PARAMETERS[report]:
+            value = parameters.get(name)
+            if name in ('start_date', 'end_date') and value:
+                value = parse_date(value)
+            if name == 'limit' and value is None:
+                value = 10
+            if name == 'granularity' and value is None:
+                value = 'day'
+            arguments.append(value)
+        return REPORT_METHODS[report](*arguments)
+
+    @staticmethod
+    def run_pending(include_running=False):
+        """
+        Run queued jobs in the current thread.
+
+        Args:
+            include_running (bool): Also re-run jobs left running by a stopped worker
+
+        Returns:
+            int: Number of jobs run
+        """
+        if include_running:
+            ReportJob.objects.filter(status='running').update(status='pending', started_at=None)
+
+        job_ids = list(ReportJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True))
+        for job_id in job_ids:
+            ReportJobManager.run(job_id)
+        return len(job_ids)
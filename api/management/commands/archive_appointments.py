@@ -0,0 +1,29 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from api.archive import AppointmentArchive
+
+
+class Command(BaseCommand):
+    help = 'Move closed appointments older than the archive horizon out of the working table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive appointments scheduled before this day (YYYY-MM-DD), default: today minus HORIZON_DAYS')
+        parser.add_argument('--batch-size', type=int, help='Appointments moved per transaction, default: BATCH_SIZE')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the appointments that would be archived')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid date format. Use YYYY-MM-DD')
+        else:
+            before = AppointmentArchive.cutoff()
+
+        if options['dry_run']:
+            count = AppointmentArchive.count_archivable(before)
+            self.stdout.write(f'{count} appointments scheduled before {before} would be archived.')
+            return
+
+        archived = AppointmentArchive.archive(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} appointments scheduled before {before}.'))
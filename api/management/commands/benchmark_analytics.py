@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from api.analytics import ColumnarReportManager, get_store, numpy_available
+from api.benchmarking import measure
+from api.models import Appointment
+from api.reports import ServiceReportManager
+
+
+class Command(BaseCommand):
+    help = 'Compare the columnar analytics engine with the ORM report path on the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument(
+            '--days', default='7,30,90,365',
+            help='Comma-separated range widths in days, ending at the latest appointment'
+        )
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            raise CommandError('The analytics engine requires numpy (pip install numpy).')
+
+        latest = Appointment.objects.aggregate(latest=Max('scheduled_date'))['latest']
+        if latest is None:
+            raise CommandError('No appointments to benchmark. Run create_test_data.py first.')
+
+        started = time.perf_counter()
+        store = get_store(refresh=False)
+        rows = store.refresh()
+        self.stdout.write(f'Loaded {rows} appointments in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        methods = (
+            ('completed_services_report', lambda manager, start, end: manager.get_completed_services_report(start, end)),
+            ('performance_metrics', lambda manager, start, end: manager.get_performance_metrics(start, end)),
+            ('top_services', lambda manager, start, end: manager.get_top_services(start, end)),
+            ('professional_performance', lambda manager, start, end: manager.get_professional_performance(start, end)),
+        )
+
+        self.stdout.write(f"{'method':<28}{'days':>6}{'orm p50 ms':>12}{'columnar p50 ms':>17}{'speedup':>9}  match")
+        for width in (int(value) for value in options['days'].split(',')):
+            start = latest - timedelta(days=width - 1)
+            for name, call in methods:
+                orm = measure(lambda: call(ServiceReportManager, start, latest), repeat=options['repeat'])
+                columnar = measure(lambda: call(ColumnarReportManager, start, latest), repeat=options['repeat'])
+                match = call(ServiceReportManager, start, latest) == call(ColumnarReportManager, start, latest)
+                speedup = orm['p50_ms'] / columnar['p50_ms'] if columnar['p50_ms'] else float('inf')
+                self.stdout.write(
+                    f"{name:<28}{width:>6}{orm['p50_ms']:>12.2f}{columnar['p50_ms']:>17.2f}{speedup:>8.1f}x  {match}"
+                )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from api.benchmarking import measure
+from api.models import Appointment, Client
+from api.serializers import AppointmentListSerializer, ClientSerializer
+from api.values_serialization import ValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF model serialization with the values() path of the list endpoints on the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--rows', default='50,500,5000', help='Comma-separated row counts to serialize')
+
+    def handle(self, *args, **options):
+        lists = (
+            (
+                'appointments', AppointmentListSerializer,
+                Appointment.objects.select_related('client', 'professional', 'service_type')
+                .order_by('scheduled_date', 'scheduled_time', 'id'),
+            ),
+            ('clients', ClientSerializer, Client.objects.order_by('name', 'id')),
+        )
+        if not Appointment.objects.exists():
+            raise CommandError('No appointments to benchmark. Run create_test_data.py first.')
+
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'list':<14}{'rows':>7}{'drf p50 ms':>12}{'values p50 ms':>15}{'speedup':>9}  identical")
+        for name, serializer_class, queryset in lists:
+            values_serializer = ValuesSerializer.for_serializer(serializer_class)
+            for rows in (int(value) for value in options['rows'].split(',')):
+                # Query, serialize and render, as one list request does
+                def regular():
+                    return renderer.render(serializer_class(list(queryset[:rows]), many=True).data)
+
+                def fast():
+                    return renderer.render(values_serializer.to_representation(values_serializer.values(queryset)[:rows]))
+
+                drf = measure(regular, repeat=options['repeat'])
+                values = measure(fast, repeat=options['repeat'])
+                speedup = drf['p50_ms'] / values['p50_ms'] if values['p50_ms'] else float('inf')
+                self.stdout.write(
+                    f"{name:<14}{rows:>7}{drf['p50_ms']:>12.2f}{values['p50_ms']:>15.2f}{speedup:>8.1f}x  {regular() == fast()}"
+                )
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from rest_framework.renderers import JSONRenderer
+from api.benchmarking import measure
+from api.models import Appointment
+from api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack_available, orjson_available
+from api.reports import ServiceReportManager
+from api.serializers import AppointmentListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the JSON and MessagePack renderers on appointment lists and the completed services report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--rows', default='50,500,5000', help='Comma-separated appointment list sizes')
+        parser.add_argument('--days', type=int, default=365, help='Days of the completed services report, ending at the latest appointment')
+
+    def handle(self, *args, **options):
+        if not orjson_available():
+            raise CommandError('FastJSONRenderer needs orjson to differ from JSONRenderer (pip install orjson).')
+
+        latest = Appointment.objects.aggregate(latest=Max('scheduled_date'))['latest']
+        if latest is None:
+            raise CommandError('No appointments to benchmark. Run create_test_data.py first.')
+
+        queryset = Appointment.objects.select_related('client', 'professional', 'service_type').order_by(
+            'scheduled_date', 'scheduled_time', 'id'
+        )
+        payloads = [
+            (f'appointments x{rows}', AppointmentListSerializer(list(queryset[:rows]), many=True).data)
+            for rows in (int(value) for value in options['rows'].split(','))
+        ]
+        start = latest.fromordinal(latest.toordinal() - options['days'] + 1)
+        payloads.append((
+            f'completed report {options["days"]}d',
+            ServiceReportManager.get_completed_services_report(start, latest),
+        ))
+
+        renderers = [('json', JSONRenderer()), ('orjson', FastJSONRenderer())]
+        if msgpack_available():
+            renderers.append(('msgpack', MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack is not installed, MessagePack is skipped')
+
+        header = f"{'payload':<26}" + ''.join(f'{name + " p50 ms":>16}{"KiB":>8}' for name, _ in renderers)
+        self.stdout.write(header + '  identical')
+        for label, data in payloads:
+            line = f'{label:<26}'
+            for _, renderer in renderers:
+                timing = measure(lambda: renderer.render(data), repeat=options['repeat'])
+                line += f"{timing['p50_ms']:>16.2f}{len(renderer.render(data)) / 1024:>8.1f}"
+            identical = JSONRenderer().render(data) == FastJSONRenderer().render(data)
+            self.stdout.write(f'{line}  {identical}')
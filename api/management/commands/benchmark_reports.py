@@ -0,0 +1,232 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import timedelta
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.test import APIClient
+from api.benchmarking import SyntheticDataset, measure
+from api.models import CustomUser
+from api.report_cache import report_cache
+from api.reports import ServiceReportManager
+
+
+SIZE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+# Report manager methods timed at every range width, called with (start_date, end_date)
+MANAGER_METHODS = (
+    ('get_completed_services_report', lambda start, end: ServiceReportManager.get_completed_services_report(start, end)),
+    ('get_performance_metrics', lambda start, end: ServiceReportManager.get_performance_metrics(start, end)),
+    ('get_top_services', lambda start, end: ServiceReportManager.get_top_services(start, end)),
+    ('get_professional_performance', lambda start, end: ServiceReportManager.get_professional_performance(start, end)),
+    ('get_completed_services_count', lambda start, end: ServiceReportManager.get_completed_services_count(start, end)),
+    ('iter_completed_services', lambda start, end: sum(1 for row in ServiceReportManager.iter_completed_services(start, end))),
+)
+
+# Report endpoints timed at every range width with a cold report cache
+ENDPOINTS = (
+    '/api/reports/completed-services/',
+    '/api/reports/performance-metrics/',
+    '/api/reports/top-services/',
+    '/api/reports/professional-performance/',
+    '/api/reports/completed-services/export/',
+    '/api/reports/bundle/',
+)
+
+# Endpoints running their queries on worker threads, which the query count does not capture
+THREADED_ENDPOINTS = ('/api/reports/bundle/',)
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    multiplier = SIZE_SUFFIXES.get(value[-1:], 1)
+    number = value[:-1] if value[-1:] in SIZE_SUFFIXES else value
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise CommandError(f'Invalid dataset size: {value}')
+
+
+def result_key(result):
+    return (result['size'], result['target'], result['days'])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the report manager methods and endpoints on synthetic datasets of growing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10k,100k', help='Comma-separated dataset sizes, e.g. 10k,100k,1m,5m')
+        parser.add_argument('--days', default='1,7,30,90,365', help='Comma-separated range widths in days')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the synthetic dataset')
+        parser.add_argument('--end-date', help='Last day of the dataset (YYYY-MM-DD, default: today)')
+        parser.add_argument('--no-memory', action='store_true', help='Skip the peak memory measurement')
+        parser.add_argument('--output', default='report_benchmark.json', help='File the JSON results are written to')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help='p50 increase (percent) reported as a regression when comparing'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(parse_size(value) for value in options['sizes'].split(','))
+        widths = [int(value) for value in options['days'].split(',')]
+        end_date = timezone.localdate()
+        if options['end_date']:
+            end_date = parse_date(options['end_date'])
+            if not end_date:
+                raise CommandError('Invalid --end-date format. Use YYYY-MM-DD.')
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        dataset = SyntheticDataset(end_date, seed=options['seed'])
+        if sizes[-1] > dataset.capacity:
+            raise CommandError(f'The largest supported dataset has {dataset.capacity} appointments.')
+
+        results = self._run(dataset, sizes, widths, options)
+
+        report = {
+            'meta': {
+                'commit': self._commit(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'end_date': end_date.isoformat(),
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} measurements to {options['output']}"))
+
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError(f'{regressions} measurements regressed against {options["compare"]}.')
+
+    def _run(self, dataset, sizes, widths, options):
+        """Build the datasets in a scratch database and time every target on each of them"""
+        # The scratch database and cache keep benchmark rows away from real data
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        scratch_dir = None
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            scratch_dir = tempfile.TemporaryDirectory()
+            test_settings['NAME'] = os.path.join(scratch_dir.name, 'report_benchmark.sqlite3')
+
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'report-benchmark',
+            }}):
+                user = CustomUser.objects.create_user(username='benchmark', password=None)
+                api = APIClient()
+                api.force_authenticate(user)
+
+                results = []
+                for size in sizes:
+                    self.stdout.write(f'Generating {size} appointments...')
+                    dataset.grow(size, progress=lambda stored: self.stdout.write(f'  {stored}', ending='\r'))
+                    self.stdout.write('')
+                    results.extend(self._measure_size(dataset, size, widths, api, options))
+                return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if scratch_dir is not None:
+                scratch_dir.cleanup()
+
+    def _measure_size(self, dataset, size, widths, api, options):
+        repeat = options['repeat']
+        track_memory = not options['no_memory']
+        results = []
+
+        def record(target, days, function, **extra):
+            result = dict(size=size, target=target, days=days, **extra)
+            result.update(measure(function, repeat=repeat, track_memory=track_memory))
+            results.append(result)
+            self.stdout.write(
+                f"{size:>9} {target:<45}{'' if days is None else days:>5} "
+                f"p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  {result['queries']:>4} queries"
+                + (' (worker thread queries not counted)' if target in THREADED_ENDPOINTS else '')
+            )
+
+        for days in widths:
+            start = dataset.end_date - timedelta(days=days - 1)
+            for name, method in MANAGER_METHODS:
+                record(name, days, lambda: method(start, dataset.end_date))
+
+            params = {'start_date': start.isoformat(), 'end_date': dataset.end_date.isoformat()}
+            for path in ENDPOINTS:
+                record(path, days, lambda: self._get(api, path, params), cache='cold')
+
+        # Quick stats are meant to be served from warm counters
+        cache.clear()
+        record('/api/reports/quick-stats/', None, lambda: self._get(api, '/api/reports/quick-stats/', {}, cold=False),
+               cache='warm')
+
+        return results
+
+    @staticmethod
+    def _get(api, path, params, cold=True):
+        if cold:
+            report_cache.entries.clear()
+        response = api.get(path, params)
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered {response.status_code}')
+        if response.streaming:
+            for chunk in response.streaming_content:
+                pass
+        return response
+
+    def _compare(self, baseline, report, threshold):
+        """Print p50 and query count changes against an earlier run and count the regressions"""
+        previous = {result_key(result): result for result in baseline['results']}
+        self.stdout.write(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+
+        regressions = 0
+        for result in report['results']:
+            before = previous.get(result_key(result))
+            if before is None:
+                continue
+
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            slower = change > threshold and result['p50_ms'] - before['p50_ms'] > 1
+            more_queries = result['queries'] > before['queries']
+            if slower or more_queries:
+                regressions += 1
+
+            line = (
+                f"{result['size']:>9} {result['target']:<45}{'' if result['days'] is None else result['days']:>5} "
+                f"p50 {before['p50_ms']:>10.2f} -> {result['p50_ms']:>10.2f} ms ({change:+.1f}%)  "
+                f"queries {before['queries']} -> {result['queries']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if slower or more_queries else line)
+
+        return regressions
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,81 @@
+import random
+from django.core.management.base import BaseCommand
+from api.availability import ScheduleGrid
+from api.benchmarking import measure
+from api.scheduling import DayScheduleOptimizer, ScheduleRequest
+
+
+def first_fit(grid, busy, eligibility, requests):
+    """Baseline: requests in arrival order, earliest start on the first professional that fits"""
+    busy = dict(busy)
+    booked = 0
+    for request in requests:
+        for professional_id in eligibility[request.service_type_id]:
+            starts = grid.fitting_starts(busy[professional_id], request.slots_needed) & request.window
+            if starts:
+                slot = (starts & -starts).bit_length() - 1
+                busy[professional_id] |= ((1 << request.slots_needed) - 1) << slot
+                booked += 1
+                break
+    return booked, DayScheduleOptimizer(grid, busy, eligibility).idle_slots()
+
+
+class Command(BaseCommand):
+    help = 'Time the day schedule optimizer on synthetic salon days and compare it with first-fit booking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--professionals', default='10,40,80', help='Comma-separated professional counts')
+        parser.add_argument('--requests-per-professional', type=int, default=10, help='Pending requests per professional')
+        parser.add_argument('--services', type=int, default=12, help='Service types of the synthetic salon')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def day(self, grid, professionals, requests, services, seed):
+        """Deterministic synthetic day: busy bitmaps, eligibility and pending requests"""
+        generator = random.Random(seed)
+        durations = [generator.choice((30, 45, 60, 90, 120)) for _ in range(services)]
+
+        eligibility = {service: [] for service in range(services)}
+        busy = {}
+        for professional in range(professionals):
+            for service in generator.sample(range(services), generator.randint(2, 4)):
+                eligibility[service].append(professional)
+            busy[professional] = 0
+            # Appointments already booked, about a quarter of the day
+            for _ in range(generator.randint(0, 4)):
+                start = generator.randrange(grid.slots)
+                busy[professional] |= grid.mask(grid.slot_time(start), generator.choice(durations))
+
+        pending = []
+        for index in range(requests):
+            service = generator.randrange(services)
+            slots_needed = grid.slots_needed(durations[service])
+            start = generator.randrange(grid.slots - slots_needed + 1)
+            width = generator.randint(0, 16)
+            window = ((1 << (width + 1)) - 1) << start & ((1 << (grid.slots - slots_needed + 1)) - 1)
+            preferred = generator.choice(eligibility[service]) if eligibility[service] and generator.random() < 0.2 else None
+            pending.append(ScheduleRequest(index, service, slots_needed, window, preferred))
+        return busy, eligibility, pending
+
+    def handle(self, *args, **options):
+        grid = ScheduleGrid()
+        self.stdout.write(
+            f"{'professionals':>13}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'booked':>8}{'first-fit':>11}{'idle min':>10}{'first-fit':>11}"
+        )
+        for professionals in (int(value) for value in options['professionals'].split(',')):
+            requests = professionals * options['requests_per_professional']
+            busy, eligibility, pending = self.day(grid, professionals, requests, options['services'], options['seed'])
+
+            timing = measure(
+                lambda: DayScheduleOptimizer(grid, busy, eligibility).solve(pending), repeat=options['repeat']
+            )
+            optimizer = DayScheduleOptimizer(grid, busy, eligibility)
+            placed, unplaced = optimizer.solve(pending)
+            baseline_booked, baseline_idle = first_fit(grid, busy, eligibility, pending)
+
+            self.stdout.write(
+                f"{professionals:>13}{requests:>10}{timing['p50_ms']:>10.1f}{timing['p95_ms']:>10.1f}"
+                f"{len(placed):>8}{baseline_booked:>11}"
+                f"{optimizer.idle_slots() * grid.slot_minutes:>10}{baseline_idle * grid.slot_minutes:>11}"
+            )
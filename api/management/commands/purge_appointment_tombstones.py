@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.sync import AppointmentSync
+
+
+class Command(BaseCommand):
+    help = 'Delete appointment tombstones older than the sync retention period'
+
+    def handle(self, *args, **options):
+        deleted = AppointmentSync.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
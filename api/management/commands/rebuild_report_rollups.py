@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from api.report_cache import report_cache
+from api.rollups import RollupManager
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily service rollup table from the appointments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start_date = self._parse(options['start_date'], 'start-date')
+        end_date = self._parse(options['end_date'], 'end-date')
+
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('--start-date cannot be after --end-date.')
+
+        rows = RollupManager.rebuild(start_date=start_date, end_date=end_date)
+        # Reports cached by the server were computed from the old rollups
+        report_cache.invalidate(all_days=True)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup rows.'))
+
+    @staticmethod
+    def _parse(value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if not parsed:
+            raise CommandError(f'Invalid --{name} format. Use YYYY-MM-DD.')
+        return parsed
@@ -0,0 +1,41 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from api.counters import CompletedServiceCounters
+
+
+class Command(BaseCommand):
+    help = 'Check the cached completed-service counters against the appointments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First day to check (YYYY-MM-DD, default: 31 days ago)')
+        parser.add_argument('--end-date', help='Last day to check (YYYY-MM-DD, default: today)')
+        parser.add_argument('--check-only', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        end_date = self._parse(options['end_date'], 'end-date') or timezone.localdate()
+        start_date = self._parse(options['start_date'], 'start-date') or end_date - timedelta(days=31)
+
+        if start_date > end_date:
+            raise CommandError('--start-date cannot be after --end-date.')
+
+        drift = CompletedServiceCounters.reconcile(start_date, end_date, fix=not options['check_only'])
+        for day, cached, actual in drift:
+            self.stdout.write(f'{day.isoformat()}: counter {cached}, table {actual}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Counters match the appointments table.'))
+        elif options['check_only']:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} counters disagree with the appointments table.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} counters.'))
+
+    @staticmethod
+    def _parse(value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if not parsed:
+            raise CommandError(f'Invalid --{name} format. Use YYYY-MM-DD.')
+        return parsed
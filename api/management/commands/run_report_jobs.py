@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from api.jobs import ReportJobManager
+
+
+class Command(BaseCommand):
+    help = 'Run queued background report jobs in this process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-running',
+            action='store_true',
+            help='Also re-run jobs left in the running state by a stopped worker'
+        )
+
+    def handle(self, *args, **options):
+        count = ReportJobManager.run_pending(include_running=options['include_running'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} report jobs.'))
@@ -0,0 +1,171 @@
+import hashlib
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+from .report_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # optional dependency, only gzip is offered without it
+    brotli = None
+
+
+DEFAULT_CONTENT_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, default)
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q > 0), lowercased"""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    if '*' in accepted:
+        accepted |= {'gzip', 'br'}
+    return accepted
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses with brotli (when installed) or gzip.
+
+    Only content types in CONTENT_TYPES are compressed, so event streams
+    and binary payloads pass through untouched, and regular responses
+    smaller than MIN_SIZE are left alone. Streaming responses (sync or
+    async) are compressed chunk by chunk as they are sent.
+
+    Compressed bodies of cacheable responses are kept in an LRU keyed by
+    encoding and a hash of the uncompressed body, so the same list or page
+    requested again is only hashed, not compressed again.
+    """
+    # Random gzip header padding against BREACH, as in Django's GZipMiddleware
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = _setting('MIN_SIZE', 1024)
+        self.content_types = frozenset(_setting('CONTENT_TYPES', DEFAULT_CONTENT_TYPES))
+        self.brotli_quality = _setting('BROTLI_QUALITY', 5)
+        self.cache_max_size = _setting('CACHE_MAX_SIZE', 1024 * 1024)
+        self.cache = LRUCache(_setting('CACHE_ENTRIES', 256))
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.content_types:
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, encoding)
+            # The compressed size is only known once everything was sent
+            del response.headers['Content-Length']
+        else:
+            compressed = self.compress(request, response, encoding)
+            if compressed is None:
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would claim the compressed body is the same bytes as the plain one
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def is_cacheable(self, request, response):
+        cache_control = response.get('Cache-Control', '').lower()
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.cookies
+            and 'no-store' not in cache_control
+            and 'private' not in cache_control
+            and len(response.content) <= self.cache_max_size
+        )
+
+    def compress(self, request, response, encoding):
+        """Compressed body, or None when compressing does not make it smaller"""
+        content = response.content
+        key = None
+        if self.is_cacheable(request, response):
+            key = (encoding, hashlib.blake2b(content, digest_size=16).digest())
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                return compressed
+
+        if encoding == 'br':
+            compressed = brotli.compress(content, quality=self.brotli_quality)
+        else:
+            compressed = compress_string(content, max_random_bytes=self.max_random_bytes)
+        if len(compressed) >= len(content):
+            return None
+
+        if key is not None:
+            self.cache.set(key, compressed)
+        return compressed
+
+    def stream_compressor(self, encoding):
+        """(process, finish) functions of an incremental compressor"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        return compressor.compress, compressor.flush
+
+    def compress_stream(self, response, encoding):
+        # Bound here, in case streaming_content is replaced later
+        chunks = response.streaming_content
+        process, finish = self.stream_compressor(encoding)
+
+        if response.is_async:
+            async def compressed():
+                async for chunk in chunks:
+                    data = process(chunk)
+                    if data:
+                        yield data
+                yield finish()
+        else:
+            def compressed():
+                for chunk in chunks:
+                    data = process(chunk)
+                    if data:
+                        yield data
+                yield finish()
+
+        return compressed()
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+    DailyServiceRollup = apps.get_model('api', 'DailyServiceRollup')
+
+    grouped = (
+        Appointment.objects.values('scheduled_date', 'professional_id', 'service_type_id', 'status')
+        .annotate(count=Count('id'), revenue=Sum('price'), total_duration=Sum('duration_minutes'))
+        .order_by()
+    )
+    DailyServiceRollup.objects.bulk_create(
+        [
+            DailyServiceRollup(
+                date=row['scheduled_date'],
+                professional_id=row['professional_id'],
+                service_type_id=row['service_type_id'],
+                status=row['status'],
+                count=row['count'],
+                revenue=row['revenue'] or 0,
+                total_duration=row['total_duration'] or 0,
+            )
+            for row in grouped
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_auto_20250811_1845'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyServiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_duration', models.IntegerField(default=0, help_text='Sum of duration in minutes')),
+                ('professional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.professional')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.servicetype')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['status', 'date'], name='idx_rollup_status_date')],
+                'unique_together': {('date', 'professional', 'service_type', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
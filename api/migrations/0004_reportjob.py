@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:43
+
+import django.core.serializers.json
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_dailyservicerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report', models.CharField(choices=[('completed_services', 'Completed Services'), ('performance_metrics', 'Performance Metrics'), ('top_services', 'Top Services'), ('professional_performance', 'Professional Performance')], max_length=50)),
+                ('parameters', models.JSONField(blank=True, default=dict)),
+                ('fingerprint', models.CharField(help_text='Hash of report and parameters, used to reuse results', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('data_version', models.BigIntegerField(blank=True, help_text='Report cache data version the result was computed at', null=True)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['fingerprint', 'status'], name='idx_reportjob_fingerprint'), models.Index(fields=['status', 'created_at'], name='idx_reportjob_status_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:54
+
+from django.db import migrations, models
+
+
+def populate_end_minutes(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+
+    # Start times and durations repeat a lot, one UPDATE per distinct pair
+    pairs = Appointment.objects.values_list('scheduled_time', 'duration_minutes').distinct().order_by()
+    for scheduled_time, duration_minutes in list(pairs):
+        Appointment.objects.filter(scheduled_time=scheduled_time, duration_minutes=duration_minutes).update(
+            end_minute=scheduled_time.hour * 60 + scheduled_time.minute + duration_minutes
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='end_minute',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Minutes after midnight of scheduled_date when the appointment ends'),
+        ),
+        migrations.RunPython(populate_end_minutes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['professional', 'scheduled_date', 'scheduled_time', 'end_minute', 'status'], name='idx_appointment_overlap'),
+        ),
+    ]
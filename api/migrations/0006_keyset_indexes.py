@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_appointment_end_minute'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['scheduled_date', 'scheduled_time', 'id'], name='idx_appointment_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['name', 'id'], name='idx_client_name'),
+        ),
+        migrations.AddIndex(
+            model_name='professional',
+            index=models.Index(fields=['name', 'id'], name='idx_professional_name'),
+        ),
+    ]
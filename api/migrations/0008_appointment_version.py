@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_appointment_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incremented on every write'),
+        ),
+    ]
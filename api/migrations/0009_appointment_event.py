@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_appointment_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_id', models.UUIDField()),
+                ('professional_id', models.UUIDField()),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'created'), (2, 'status_changed'), (3, 'rescheduled'), (4, 'deleted')])),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], help_text='Status after the event', max_length=20)),
+                ('scheduled_date', models.DateField()),
+                ('scheduled_time', models.TimeField()),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['occurred_at', 'id'],
+                'indexes': [models.Index(fields=['appointment_id', 'occurred_at'], name='idx_event_appointment'), models.Index(fields=['occurred_at'], name='idx_event_occurred_at'), models.Index(fields=['professional_id', 'occurred_at'], name='idx_event_professional')],
+            },
+        ),
+    ]
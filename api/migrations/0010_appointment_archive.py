@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+RECORD_COLUMNS = (
+    'id, client_id, professional_id, service_type_id, scheduled_date, scheduled_time, '
+    'duration_minutes, end_minute, price, status, notes, version, created_at, updated_at, created_by_id'
+)
+
+CREATE_RECORD_VIEW = (
+    f'CREATE VIEW api_appointment_record AS '
+    f'SELECT {RECORD_COLUMNS} FROM api_appointment '
+    f'UNION ALL '
+    f'SELECT {RECORD_COLUMNS} FROM api_archivedappointment'
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_appointment_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentRecord',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('scheduled_date', models.DateField()),
+                ('scheduled_time', models.TimeField()),
+                ('duration_minutes', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('version', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'api_appointment_record',
+                'ordering': ['scheduled_date', 'scheduled_time'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('scheduled_date', models.DateField()),
+                ('scheduled_time', models.TimeField()),
+                ('duration_minutes', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='api.client')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_appointments', to=settings.AUTH_USER_MODEL)),
+                ('professional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='api.professional')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='api.servicetype')),
+            ],
+            options={
+                'ordering': ['scheduled_date', 'scheduled_time'],
+                'indexes': [models.Index(fields=['scheduled_date', 'scheduled_time', 'id'], name='idx_archived_keyset'), models.Index(fields=['status', 'scheduled_date'], name='idx_archived_status_date')],
+            },
+        ),
+        migrations.RunSQL(CREATE_RECORD_VIEW, 'DROP VIEW api_appointment_record'),
+    ]
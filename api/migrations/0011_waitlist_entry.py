@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_appointment_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('earliest_date', models.DateField()),
+                ('latest_date', models.DateField()),
+                ('earliest_time', models.TimeField()),
+                ('latest_time', models.TimeField()),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('booked', 'Booked'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='api.client')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('professional', models.ForeignKey(blank=True, help_text='Preferred professional, any eligible professional when empty', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entries', to='api.professional')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='api.servicetype')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['created_at', 'id'], name='idx_waitlist_keyset'), models.Index(condition=models.Q(('status', 'waiting')), fields=['service_type', 'earliest_date', 'latest_date', 'earliest_time', 'latest_time'], name='idx_waitlist_open')],
+            },
+        ),
+    ]
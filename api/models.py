@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
+from django.utils import timezone
 import uuid
+from datetime import time
 
 
 class CustomUser(AbstractUser):
@@ -38,6 +41,9 @@ class Professional(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='idx_professional_name'),
+        ]
 
     def __str__(self):
         return self.name
@@ -63,6 +69,9 @@ class Client(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='idx_client_name'),
+        ]
 
     def __str__(self):
         return self.name
@@ -86,6 +95,37 @@ class ServiceType(models.Model):
         return f"{self.name} - R$ {self.base_price}"
 
 
+def minutes_after_midnight(value):
+    return value.hour * 60 + value.minute
+
+
+class AppointmentQuerySet(models.QuerySet):
+
+    def blocking(self):
+        """Appointments that keep their professional's time taken"""
+        return self.filter(status__in=Appointment.BLOCKING_STATUSES)
+
+    def overlapping(self, professional_id, scheduled_date, scheduled_time, duration_minutes):
+        """
+        Blocking appointments of a professional that overlap an interval.
+
+        Served by idx_appointment_overlap: one seek on (professional,
+        scheduled_date) and a range over scheduled_time, with end_minute and
+        status read from the same index.
+        """
+        start = minutes_after_midnight(scheduled_time)
+        end = start + duration_minutes
+
+        queryset = self.blocking().filter(
+            professional_id=professional_id,
+            scheduled_date=scheduled_date,
+            end_minute__gt=start
+        )
+        if end < 24 * 60:
+            queryset = queryset.filter(scheduled_time__lt=time(end // 60, end % 60))
+        return queryset
+
+
 class Appointment(models.Model):
     """Model for salon appointments/services"""
     STATUS_CHOICES = [
@@ -96,6 +136,18 @@ class Appointment(models.Model):
         ('no_show', 'No Show'),
     ]
 
+    # Statuses that keep the professional's time slot taken
+    BLOCKING_STATUSES = ('scheduled', 'in_progress', 'completed')
+
+    # Status changes allowed by update_status
+    STATUS_TRANSITIONS = {
+        'scheduled': ('in_progress', 'completed', 'cancelled', 'no_show'),
+        'in_progress': ('completed', 'cancelled'),
+        'completed': (),
+        'cancelled': ('scheduled',),
+        'no_show': ('scheduled',),
+    }
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='appointments')
     professional = models.ForeignKey(Professional, on_delete=models.CASCADE, related_name='appointments')
@@ -104,23 +156,52 @@ class Appointment(models.Model):
     scheduled_date = models.DateField()
     scheduled_time = models.TimeField()
     duration_minutes = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text="Minutes after midnight of scheduled_date when the appointment ends"
+    )
     
     price = models.DecimalField(max_digits=8, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     
     notes = models.TextField(blank=True, help_text="Additional notes about the appointment")
+    version = models.PositiveIntegerField(default=1, editable=False, help_text="Incremented on every write")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
         ordering = ['scheduled_date', 'scheduled_time']
         unique_together = ['professional', 'scheduled_date', 'scheduled_time']
+        indexes = [
+            # Keyset pagination order of the appointment list
+            models.Index(fields=['scheduled_date', 'scheduled_time', 'id'], name='idx_appointment_keyset'),
+            # Delta sync reads appointments changed after a watermark
+            models.Index(fields=['updated_at'], name='idx_appointment_updated_at'),
+            models.Index(
+                fields=['professional', 'scheduled_date', 'scheduled_time', 'end_minute', 'status'],
+                name='idx_appointment_overlap'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.client.name} - {self.service_type.name} - {self.scheduled_date} {self.scheduled_time}"
 
+    def save(self, *args, **kwargs):
+        self.end_minute = minutes_after_midnight(self.scheduled_time) + self.duration_minutes
+        if not self._state.adding:
+            self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'version'}
+            if {'scheduled_time', 'duration_minutes'} & update_fields:
+                update_fields.add('end_minute')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
 
 class Receptionist(models.Model):
     """Model for salon receptionists"""
@@ -134,3 +215,252 @@ class Receptionist(models.Model):
 
     def __str__(self):
         return f"Receptionist: {self.user.get_full_name() or self.user.email}"
+
+
+class DailyServiceRollup(models.Model):
+    """Pre-aggregated appointment totals per day, professional, service type and status"""
+    date = models.DateField()
+    professional = models.ForeignKey(Professional, on_delete=models.CASCADE, related_name='daily_rollups')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='daily_rollups')
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+
+    count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_duration = models.IntegerField(default=0, help_text="Sum of duration in minutes")
+
+    class Meta:
+        ordering = ['date']
+        unique_together = ['date', 'professional', 'service_type', 'status']
+        indexes = [
+            models.Index(fields=['status', 'date'], name='idx_rollup_status_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.professional_id} - {self.service_type_id} - {self.status}: {self.count}"
+
+
+class ReportJob(models.Model):
+    """Model for reports computed in the background"""
+    REPORT_CHOICES = [
+        ('completed_services', 'Completed Services'),
+        ('performance_metrics', 'Performance Metrics'),
+        ('top_services', 'Top Services'),
+        ('professional_performance', 'Professional Performance'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report = models.CharField(max_length=50, choices=REPORT_CHOICES)
+    parameters = models.JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(max_length=64, help_text="Hash of report and parameters, used to reuse results")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    data_version = models.BigIntegerField(null=True, blank=True, help_text="Report cache data version the result was computed at")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'status'], name='idx_reportjob_fingerprint'),
+            models.Index(fields=['status', 'created_at'], name='idx_reportjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_display()} ({self.status})"
+
+
+class AppointmentTombstone(models.Model):
+    """Record of a deleted appointment, kept so sync clients can drop their copy"""
+    appointment_id = models.UUIDField()
+    scheduled_date = models.DateField()
+    professional_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['deleted_at'], name='idx_tombstone_deleted_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.appointment_id} deleted at {self.deleted_at}"
+
+
+class AppointmentEvent(models.Model):
+    """
+    Append-only log of appointment writes: creation, status changes, reschedules and deletion.
+
+    Rows only hold ids, codes and the slot, so the log stays small, and
+    they are kept after the appointment is deleted.
+    """
+    CREATED = 1
+    STATUS_CHANGED = 2
+    RESCHEDULED = 3
+    DELETED = 4
+    KIND_CHOICES = [
+        (CREATED, 'created'),
+        (STATUS_CHANGED, 'status_changed'),
+        (RESCHEDULED, 'rescheduled'),
+        (DELETED, 'deleted'),
+    ]
+
+    appointment_id = models.UUIDField()
+    professional_id = models.UUIDField()
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES, help_text="Status after the event")
+    scheduled_date = models.DateField()
+    scheduled_time = models.TimeField()
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['occurred_at', 'id']
+        indexes = [
+            models.Index(fields=['appointment_id', 'occurred_at'], name='idx_event_appointment'),
+            models.Index(fields=['occurred_at'], name='idx_event_occurred_at'),
+            models.Index(fields=['professional_id', 'occurred_at'], name='idx_event_professional'),
+        ]
+
+    def __str__(self):
+        return f"{self.appointment_id} {self.get_kind_display()} ({self.status}) at {self.occurred_at}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Appointment events are append-only')
+        super().save(*args, **kwargs)
+
+
+class ArchivedAppointment(models.Model):
+    """
+    Closed appointment moved out of the working table by the archiver.
+
+    Same columns as Appointment, so rows can be read back together through
+    AppointmentRecord. Archived appointments are read-only.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='archived_appointments')
+    professional = models.ForeignKey(Professional, on_delete=models.CASCADE, related_name='archived_appointments')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='archived_appointments')
+
+    scheduled_date = models.DateField()
+    scheduled_time = models.TimeField()
+    duration_minutes = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField(default=0)
+
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+
+    notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=1)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_appointments'
+    )
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['scheduled_date', 'scheduled_time']
+        indexes = [
+            models.Index(fields=['scheduled_date', 'scheduled_time', 'id'], name='idx_archived_keyset'),
+            models.Index(fields=['status', 'scheduled_date'], name='idx_archived_status_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.scheduled_date} {self.scheduled_time} (archived)"
+
+
+class AppointmentRecord(models.Model):
+    """
+    Working and archived appointments together, read through a database view.
+
+    Used instead of Appointment when a query reaches days that were
+    archived; it is read-only.
+    """
+    id = models.UUIDField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    professional = models.ForeignKey(Professional, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+
+    scheduled_date = models.DateField()
+    scheduled_time = models.TimeField()
+    duration_minutes = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+
+    notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'api_appointment_record'
+        ordering = ['scheduled_date', 'scheduled_time']
+
+    def __str__(self):
+        return f"{self.id} - {self.scheduled_date} {self.scheduled_time}"
+
+
+class WaitlistEntry(models.Model):
+    """Client waiting for a slot of a service, offered freed slots on cancellations"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('booked', 'Booked'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='waitlist_entries')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='waitlist_entries')
+    professional = models.ForeignKey(
+        Professional, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entries',
+        help_text="Preferred professional, any eligible professional when empty"
+    )
+
+    # Acceptable days, and hours on each of them
+    earliest_date = models.DateField()
+    latest_date = models.DateField()
+    earliest_time = models.TimeField()
+    latest_time = models.TimeField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    notes = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Keyset pagination order of the waitlist
+            models.Index(fields=['created_at', 'id'], name='idx_waitlist_keyset'),
+            # Freed slot matching only reads open entries
+            models.Index(
+                fields=['service_type', 'earliest_date', 'latest_date', 'earliest_time', 'latest_time'],
+                condition=models.Q(status='waiting'),
+                name='idx_waitlist_open'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.client.name} - {self.service_type.name} ({self.earliest_date} to {self.latest_date})"
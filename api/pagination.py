@@ -0,0 +1,154 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    The cursor holds the ordering values of the row at the edge of the
+    page and the next page is read with a row comparison on them, e.g.
+    (scheduled_date, scheduled_time, id) > (d, t, i). With an index on the
+    ordering every page costs the same, however deep it is.
+
+    Views choose the ordering with a `keyset_ordering` attribute. Its
+    fields must be non-null and, taken together, unique (end with the
+    primary key).
+    """
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    # Counting stops here, larger totals are reported as estimates
+    total_count_limit = 10000
+    default_ordering = ('pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.default_ordering))
+        self.page_size = self.get_page_size(request)
+        self.total = self.get_total(queryset, request)
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        order = [f'-{field}' if reverse else field for field in self.ordering]
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going forward there is more ahead when the extra row came back, and
+        # something behind when a cursor was given; going back it is the opposite
+        more_ahead, more_behind = (position is not None, has_more) if reverse else (has_more, position is not None)
+
+        self.next_position = self._position(rows[-1]) if rows and more_ahead else None
+        self.previous_position = self._position(rows[0]) if rows and more_behind else None
+
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_total(self, queryset, request):
+        """Row count of the filtered queryset, counted up to total_count_limit, when requested"""
+        if request.query_params.get(self.total_query_param, '').lower() not in ('1', 'true', 'yes'):
+            return None
+        count = queryset.order_by()[:self.total_count_limit + 1].count()
+        return {'total': min(count, self.total_count_limit), 'total_is_estimate': count > self.total_count_limit}
+
+    def _after(self, position, reverse):
+        """Q for rows strictly after (before when reverse) the position, expanded field by field"""
+        comparison = 'lt' if reverse else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            step = Q(**{f'{field}__{comparison}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous: value})
+            condition |= step
+
+        # The leading field alone bounds the index range scan
+        bound = 'lte' if reverse else 'gte'
+        return Q(**{f'{self.ordering[0]}__{bound}': position[0]}) & condition
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            # Row of a values() queryset, which selected the ordering columns
+            return [row[field] for field in self.ordering]
+        return [getattr(row, 'pk' if field == 'pk' else field) for field in self.ordering]
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [None if value is None else str(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                (model._meta.pk if field == 'pk' else model._meta.get_field(field)).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, bool(payload.get('r'))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            response.update(self.total)
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'total': {'type': 'integer'},
+                'total_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
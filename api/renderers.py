@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+import re
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency, FastJSONRenderer falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, MessagePack is not offered without it
+    msgpack = None
+
+
+# Values the fast encoders do not handle natively go through DRF's encoder,
+# so dates, Decimals, lazy strings and querysets come out the same way
+_drf_default = JSONEncoder().default
+
+# orjson writes some floats differently from json.dumps (1e16 vs 1e+16,
+# 0.00001 vs 1e-05); payloads where such a number may appear are re-rendered.
+# The pattern starts with a literal so the scan stays cheap on large payloads.
+_EXPONENT = re.compile(rb'e-?[0-9]+[,\]}]')
+
+
+def orjson_available():
+    return orjson is not None
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a dict or a list of dicts as CSV.
+
+    Streaming exports write their rows directly; this renderer covers
+    error payloads and content negotiation for ?format=csv.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()), extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a dict or a list of dicts as newline-delimited JSON"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(
+            json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows
+        ).encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed.
+
+    The output is byte-identical to JSONRenderer: datetimes and other types
+    orjson does not handle like DRF are passed to DRF's encoder, U+2028 and
+    U+2029 are escaped the same way, and payloads orjson cannot reproduce
+    exactly (indented output, some floats, integers beyond 64 bits) are
+    rendered by JSONRenderer itself. The one difference is NaN and
+    infinity, written as null where JSONRenderer refuses them.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=_drf_default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'0.0000' in ret or _EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders data as MessagePack. Requires msgpack.
+
+    Values are the ones the JSON renderers produce (dates as ISO strings,
+    UUIDs as strings), only the encoding is binary.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_drf_default, use_bin_type=True)
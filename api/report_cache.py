@@ -0,0 +1,288 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .counters import CompletedServiceCounters
+from .reports import ServiceReportManager
+
+
+DATA_VERSION_KEY = 'reports:data_version'
+DAY_VERSION_KEY = 'reports:day_version:{}'
+DAY_EPOCH_KEY = 'reports:day_epoch'
+
+
+class LRUCache:
+    """Thread-safe, size-bounded in-process cache with hit/miss counters and an optional entry lifetime"""
+
+    def __init__(self, max_entries, timeout=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0,
+            }
+
+
+class ReportCache:
+    """
+    Report result cache invalidated by data-version counters.
+
+    The counters live in Django's cache framework, shared by every worker
+    and management command (see CACHES), so a write or rollup rebuild in
+    one process invalidates the results cached by all of them. Entries
+    also expire after TIMEOUT seconds, bounding staleness when a version
+    bump is lost. A global version covers whole
+    report results and a per-day version covers the cached rows of one
+    closed day. A counter that disappears from the cache is re-seeded with
+    a fresh timestamp, so it never goes back to a value already used in a
+    cache key.
+    """
+
+    def __init__(self, max_entries, timeout=None):
+        self.entries = LRUCache(max_entries, timeout)
+
+    @staticmethod
+    def _seed():
+        return time.time_ns()
+
+    def data_version(self):
+        version = cache.get(DATA_VERSION_KEY)
+        if version is None:
+            cache.add(DATA_VERSION_KEY, self._seed(), timeout=None)
+            version = cache.get(DATA_VERSION_KEY)
+        return version
+
+    def day_versions(self, days):
+        """
+        Versions of the cached rows of each day.
+
+        Each one pairs the day's own counter with the epoch shared by all
+        days, bumped when the rollups are rebuilt.
+        """
+        keys = {DAY_VERSION_KEY.format(day.isoformat()): day for day in days}
+        versions = cache.get_many([*keys, DAY_EPOCH_KEY])
+
+        missing = [key for key in (*keys, DAY_EPOCH_KEY) if key not in versions]
+        if missing:
+            seed = self._seed()
+            for key in missing:
+                cache.add(key, seed, timeout=None)
+            versions.update(cache.get_many(missing))
+
+        epoch = versions.get(DAY_EPOCH_KEY)
+        return {day: (epoch, versions.get(key)) for key, day in keys.items()}
+
+    @staticmethod
+    def _bump(key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, ReportCache._seed(), timeout=None):
+                cache.incr(key)
+
+    def invalidate(self, dates=(), all_days=False):
+        """Bump the global version and the versions of the given days (or of every day) once the write commits"""
+        def bump():
+            self._bump(DATA_VERSION_KEY)
+            if all_days:
+                self._bump(DAY_EPOCH_KEY)
+            for day in dates:
+                self._bump(DAY_VERSION_KEY.format(day.isoformat()))
+
+        transaction.on_commit(bump)
+
+    def get_or_compute(self, key, compute):
+        value = self.entries.get(key)
+        if value is None:
+            value = compute()
+            self.entries.set(key, value)
+        return value
+
+    def stats(self):
+        return dict(self.entries.stats(), data_version=self.data_version())
+
+
+report_cache = ReportCache(
+    getattr(settings, 'REPORT_CACHE', {}).get('MAX_ENTRIES', 2048),
+    getattr(settings, 'REPORT_CACHE', {}).get('TIMEOUT', 300),
+)
+
+
+def _cache_key(report, version, start_date=None, end_date=None, professional_id=None, service_type_id=None, limit=None):
+    return (
+        report,
+        version,
+        start_date.isoformat() if start_date else None,
+        end_date.isoformat() if end_date else None,
+        _normalize_id(professional_id),
+        _normalize_id(service_type_id),
+        limit,
+    )
+
+
+def _normalize_id(value):
+    if not value:
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return str(value)
+
+
+class CachedServiceReportManager(ServiceReportManager):
+    """
+    ServiceReportManager with cached results.
+
+    Whole results are cached per report and filter set. Completed-service
+    rollup rows of closed days (before today) are also cached per day, so
+    after a write only the affected days and the open days are read again.
+    """
+
+    @classmethod
+    def _completed_rollup_rows(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None):
+        parent = super(CachedServiceReportManager, cls)._completed_rollup_rows
+        today = timezone.localdate()
+
+        if not start_date or not end_date or start_date >= today:
+            return parent(start_date, end_date, professional_id, service_type_id)
+
+        closed_end = min(end_date, today - timedelta(days=1))
+        days = [start_date + timedelta(days=offset) for offset in range((closed_end - start_date).days + 1)]
+        versions = report_cache.day_versions(days)
+
+        rows = []
+        missing = []
+        for day in days:
+            cached = report_cache.entries.get(('day_rows', day, versions[day]))
+            if cached is None:
+                missing.append(day)
+            else:
+                rows.extend(cached)
+
+        if missing:
+            missing_days = set(missing)
+            fetched = {day: [] for day in missing}
+            for row in parent(missing[0], missing[-1]):
+                if row[0] in missing_days:
+                    fetched[row[0]].append(row)
+            for day, day_rows in fetched.items():
+                report_cache.entries.set(('day_rows', day, versions[day]), tuple(day_rows))
+                rows.extend(day_rows)
+
+        if end_date >= today:
+            rows.extend(parent(today, end_date))
+
+        professional_id = _normalize_id(professional_id)
+        service_type_id = _normalize_id(service_type_id)
+        if professional_id:
+            rows = [row for row in rows if row[1] == professional_id]
+        if service_type_id:
+            rows = [row for row in rows if row[2] == service_type_id]
+
+        return rows
+
+    @classmethod
+    def get_completed_services_report(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None,
+                                      granularity='day'):
+        key = _cache_key(
+            'completed_services', report_cache.data_version(), start_date, end_date, professional_id, service_type_id
+        ) + (granularity,)
+        return report_cache.get_or_compute(
+            key,
+            lambda: super(CachedServiceReportManager, cls).get_completed_services_report(
+                start_date, end_date, professional_id, service_type_id, granularity
+            )
+        )
+
+    @classmethod
+    def get_performance_metrics(cls, start_date=None, end_date=None):
+        key = _cache_key('performance_metrics', report_cache.data_version(), start_date, end_date)
+        return report_cache.get_or_compute(
+            key,
+            lambda: super(CachedServiceReportManager, cls).get_performance_metrics(start_date, end_date)
+        )
+
+    @classmethod
+    def get_top_services(cls, start_date=None, end_date=None, limit=10):
+        key = _cache_key('top_services', report_cache.data_version(), start_date, end_date, limit=limit)
+        return report_cache.get_or_compute(
+            key,
+            lambda: super(CachedServiceReportManager, cls).get_top_services(start_date, end_date, limit)
+        )
+
+    @classmethod
+    def get_professional_performance(cls, start_date=None, end_date=None):
+        key = _cache_key('professional_performance', report_cache.data_version(), start_date, end_date)
+        return report_cache.get_or_compute(
+            key,
+            lambda: super(CachedServiceReportManager, cls).get_professional_performance(start_date, end_date)
+        )
+
+    @classmethod
+    def get_completed_services_count(cls, start_date=None, end_date=None):
+        key = _cache_key('completed_count', report_cache.data_version(), start_date, end_date)
+        return report_cache.get_or_compute(
+            key,
+            lambda: super(CachedServiceReportManager, cls).get_completed_services_count(start_date, end_date)
+        )
+
+    @classmethod
+    def get_quick_stats(cls, today):
+        """Dashboard counts read from the per-day completed-service counters"""
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        counts = CompletedServiceCounters.get_counts(min(week_start, month_start), today)
+
+        return {
+            'today_completed': counts[today],
+            'week_completed': sum(counts[day] for day in counts if day >= week_start),
+            'month_completed': sum(counts[day] for day in counts if day >= month_start),
+            'date': today.isoformat()
+        }
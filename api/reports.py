@@ -1,101 +1,253 @@
-from django.db import models
-from django.db.models import Count, Sum, Q, F
-from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Appointment, ServiceType, Professional, Client
+from decimal import Decimal
+from django.db.models import Count, Sum, Q
+from datetime import timedelta
+from .archive import AppointmentArchive
+from .models import Appointment, ServiceType, Professional, DailyServiceRollup
+
+
+ROLLUP_COLUMNS = ('date', 'professional_id', 'service_type_id', 'count', 'revenue', 'total_duration')
+
+# Column name and ORM lookup of each exported completed-service row
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('scheduled_date', 'scheduled_date'),
+    ('scheduled_time', 'scheduled_time'),
+    ('client_name', 'client__name'),
+    ('professional_name', 'professional__name'),
+    ('service_name', 'service_type__name'),
+    ('duration_minutes', 'duration_minutes'),
+    ('price', 'price'),
+)
+
+
+def _group_rollup_rows(rows, column):
+    """Sum count, revenue and duration of rollup rows grouped by one column"""
+    groups = {}
+    for row in rows:
+        totals = groups.get(row[column])
+        if totals is None:
+            totals = groups[row[column]] = [0, Decimal('0'), 0]
+        totals[0] += row[3]
+        totals[1] += row[4]
+        totals[2] += row[5]
+    return groups
+
+
+# Start of the time bucket containing a day, for each report granularity
+GRANULARITIES = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+    'quarter': lambda day: day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1),
+}
+
+
+def _average_price(revenue, count):
+    return (revenue / count).quantize(Decimal('0.01')) if count else None
+
+
+class AppointmentStats:
+    """Single-query appointment statistics shared by reports and the dashboard"""
+
+    @staticmethod
+    def aggregate(queryset):
+        """
+        Compute every status count, revenue and duration figure for a queryset
+        in one aggregate() call using filtered COUNT/SUM expressions.
+
+        Args:
+            queryset (QuerySet): Filtered appointments
+
+        Returns:
+            dict: total, by_status counts, completed_revenue and completed_duration
+        """
+        aggregates = {'total': Count('id')}
+        for status, label in Appointment.STATUS_CHOICES:
+            aggregates[f'status_{status}'] = Count('id', filter=Q(status=status))
+        aggregates['completed_revenue'] = Sum('price', filter=Q(status='completed'))
+        aggregates['completed_duration'] = Sum('duration_minutes', filter=Q(status='completed'))
+
+        result = queryset.aggregate(**aggregates)
+
+        return {
+            'total': result['total'],
+            'by_status': {
+                status: result[f'status_{status}']
+                for status, label in Appointment.STATUS_CHOICES
+            },
+            'completed_revenue': result['completed_revenue'] or Decimal('0'),
+            'completed_duration': result['completed_duration'] or 0,
+        }
 
 
 class ServiceReportManager:
     """Manager class for generating service completion reports"""
-    
+
     @staticmethod
-    def get_completed_services_report(start_date=None, end_date=None, professional_id=None, service_type_id=None):
+    def get_completed_services_queryset(start_date=None, end_date=None, professional_id=None, service_type_id=None):
         """
-        Generate a comprehensive report of completed services within a date range.
-        
+        Get the completed appointments matching the report filters.
+
         Args:
-            start_date (date): Start date for the report (inclusive)
-            end_date (date): End date for the report (inclusive)
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
             professional_id (str): Filter by specific professional
             service_type_id (str): Filter by specific service type
-            
+
         Returns:
-            dict: Report data with statistics and details
+            QuerySet: Completed appointments
         """
-        # Base queryset for completed appointments
-        queryset = Appointment.objects.filter(status='completed')
-        
-        # Apply date filters
+        queryset = AppointmentArchive.queryset(start_date).filter(status='completed')
+
         if start_date:
             queryset = queryset.filter(scheduled_date__gte=start_date)
         if end_date:
             queryset = queryset.filter(scheduled_date__lte=end_date)
-        
-        # Apply professional filter
         if professional_id:
             queryset = queryset.filter(professional_id=professional_id)
-            
-        # Apply service type filter
         if service_type_id:
             queryset = queryset.filter(service_type_id=service_type_id)
-        
-        # Optimize query with select_related to avoid N+1 queries
-        queryset = queryset.select_related('client', 'professional', 'service_type')
-        
-        # Calculate summary statistics
-        summary_stats = queryset.aggregate(
-            total_services=Count('id'),
-            total_revenue=Sum('price'),
-            avg_price=models.Avg('price'),
-            total_duration=Sum('duration_minutes')
-        )
-        
-        # Services by type
-        services_by_type = (
-            queryset.values('service_type__name', 'service_type__id')
-            .annotate(
-                count=Count('id'),
-                revenue=Sum('price'),
-                avg_duration=models.Avg('duration_minutes')
-            )
-            .order_by('-count')
+
+        return queryset
+
+    @classmethod
+    def iter_completed_services(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None, chunk_size=2000):
+        """
+        Iterate over completed services as tuples following EXPORT_COLUMNS.
+
+        Rows are fetched from the database in chunks, so memory use does not
+        grow with the size of the range.
+        """
+        queryset = cls.get_completed_services_queryset(start_date, end_date, professional_id, service_type_id)
+        return (
+            queryset.order_by('scheduled_date', 'scheduled_time', 'id')
+            .values_list(*(lookup for name, lookup in EXPORT_COLUMNS))
+            .iterator(chunk_size=chunk_size)
         )
+
+    @classmethod
+    def _completed_rollup_rows(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None):
+        """
+        Fetch the rollup rows of completed services as plain tuples.
+
+        Each row follows ROLLUP_COLUMNS. The number of rows grows with the
+        number of days in the range, not with the number of appointments.
+        """
+        queryset = DailyServiceRollup.objects.filter(status='completed')
+
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        if professional_id:
+            queryset = queryset.filter(professional_id=professional_id)
+        if service_type_id:
+            queryset = queryset.filter(service_type_id=service_type_id)
+
+        return list(queryset.order_by().values_list(*ROLLUP_COLUMNS))
+
+    @staticmethod
+    def _professional_names(ids):
+        return dict(Professional.objects.filter(id__in=ids).values_list('id', 'name'))
+
+    @staticmethod
+    def _service_types(ids):
+        return {
+            service_type_id: (name, base_price)
+            for service_type_id, name, base_price in
+            ServiceType.objects.filter(id__in=ids).values_list('id', 'name', 'base_price')
+        }
+
+    @classmethod
+    def get_completed_services_report(cls, start_date=None, end_date=None, professional_id=None, service_type_id=None,
+                                      granularity='day'):
+        """
+        Generate a comprehensive report of completed services within a date range.
         
-        # Services by professional
-        services_by_professional = (
-            queryset.values('professional__name', 'professional__id')
-            .annotate(
-                count=Count('id'),
-                revenue=Sum('price'),
-                avg_duration=models.Avg('duration_minutes')
-            )
-            .order_by('-count')
+        Args:
+            start_date (date): Start date for the report (inclusive)
+            end_date (date): End date for the report (inclusive)
+            professional_id (str): Filter by specific professional
+            service_type_id (str): Filter by specific service type
+            granularity (str): Bucket size of daily_breakdown: day, week, month or quarter.
+                Each row is labelled with the first day of its bucket.
+            
+        Returns:
+            dict: Report data with statistics and details
+        """
+        rows = cls._completed_rollup_rows(start_date, end_date, professional_id, service_type_id)
+
+        by_type = _group_rollup_rows(rows, 2)
+        by_professional = _group_rollup_rows(rows, 1)
+        by_day = _group_rollup_rows(rows, 0)
+
+        total_services = sum(totals[0] for totals in by_day.values())
+        total_revenue = sum((totals[1] for totals in by_day.values()), Decimal('0'))
+        total_duration = sum(totals[2] for totals in by_day.values())
+
+        service_types = cls._service_types(by_type.keys())
+        professional_names = cls._professional_names(by_professional.keys())
+
+        services_by_type = sorted(
+            (
+                {
+                    'service_type__name': service_types[key][0],
+                    'service_type__id': key,
+                    'count': count,
+                    'revenue': revenue,
+                    'avg_duration': duration / count
+                }
+                for key, (count, revenue, duration) in by_type.items()
+                if count and key in service_types
+            ),
+            key=lambda item: (-item['count'], item['service_type__name'])
         )
-        
-        # Daily breakdown
-        daily_breakdown = (
-            queryset.values('scheduled_date')
-            .annotate(
-                count=Count('id'),
-                revenue=Sum('price')
-            )
-            .order_by('scheduled_date')
+
+        services_by_professional = sorted(
+            (
+                {
+                    'professional__name': professional_names[key],
+                    'professional__id': key,
+                    'count': count,
+                    'revenue': revenue,
+                    'avg_duration': duration / count
+                }
+                for key, (count, revenue, duration) in by_professional.items()
+                if count and key in professional_names
+            ),
+            key=lambda item: (-item['count'], item['professional__name'])
         )
-        
+
+        # Buckets are built from the per-day rollup totals, never from raw appointments
+        bucket_start = GRANULARITIES[granularity]
+        buckets = {}
+        for day, (count, revenue, duration) in by_day.items():
+            if not count:
+                continue
+            totals = buckets.setdefault(bucket_start(day), [0, Decimal('0')])
+            totals[0] += count
+            totals[1] += revenue
+
+        daily_breakdown = [
+            {'scheduled_date': bucket, 'count': buckets[bucket][0], 'revenue': buckets[bucket][1]}
+            for bucket in sorted(buckets)
+        ]
+
         return {
             'summary': {
-                'total_services': summary_stats['total_services'] or 0,
-                'total_revenue': float(summary_stats['total_revenue'] or 0),
-                'average_price': float(summary_stats['avg_price'] or 0),
-                'total_duration_hours': round((summary_stats['total_duration'] or 0) / 60, 2),
+                'total_services': total_services,
+                'total_revenue': float(total_revenue),
+                'average_price': float(total_revenue / total_services) if total_services else 0.0,
+                'total_duration_hours': round(total_duration / 60, 2),
+                'granularity': granularity,
                 'period': {
                     'start_date': start_date.isoformat() if start_date else None,
                     'end_date': end_date.isoformat() if end_date else None
                 }
             },
-            'services_by_type': list(services_by_type),
-            'services_by_professional': list(services_by_professional),
-            'daily_breakdown': list(daily_breakdown)
+            'services_by_type': services_by_type,
+            'services_by_professional': services_by_professional,
+            'daily_breakdown': daily_breakdown
         }
     
     @staticmethod
@@ -110,33 +262,22 @@ class ServiceReportManager:
         Returns:
             dict: Performance metrics
         """
-        # Base queryset
-        queryset = Appointment.objects.all()
+        queryset = AppointmentArchive.queryset(start_date)
         
         if start_date:
             queryset = queryset.filter(scheduled_date__gte=start_date)
         if end_date:
             queryset = queryset.filter(scheduled_date__lte=end_date)
         
-        # Calculate metrics by status
-        status_breakdown = (
-            queryset.values('status')
-            .annotate(count=Count('id'))
-            .order_by('status')
-        )
+        # Every status count in a single query
+        stats = AppointmentStats.aggregate(queryset)
+        total_appointments = stats['total']
+        by_status = stats['by_status']
         
-        # Calculate completion rate
-        total_appointments = queryset.count()
-        completed_appointments = queryset.filter(status='completed').count()
+        completed_appointments = by_status['completed']
         completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
-        
-        # Calculate cancellation rate
-        cancelled_appointments = queryset.filter(status='cancelled').count()
-        cancellation_rate = (cancelled_appointments / total_appointments * 100) if total_appointments > 0 else 0
-        
-        # Calculate no-show rate
-        no_show_appointments = queryset.filter(status='no_show').count()
-        no_show_rate = (no_show_appointments / total_appointments * 100) if total_appointments > 0 else 0
+        cancellation_rate = (by_status['cancelled'] / total_appointments * 100) if total_appointments > 0 else 0
+        no_show_rate = (by_status['no_show'] / total_appointments * 100) if total_appointments > 0 else 0
         
         return {
             'total_appointments': total_appointments,
@@ -144,11 +285,15 @@ class ServiceReportManager:
             'completion_rate': round(completion_rate, 2),
             'cancellation_rate': round(cancellation_rate, 2),
             'no_show_rate': round(no_show_rate, 2),
-            'status_breakdown': list(status_breakdown)
+            'status_breakdown': [
+                {'status': status, 'count': by_status[status]}
+                for status in sorted(by_status)
+                if by_status[status]
+            ]
         }
     
-    @staticmethod
-    def get_top_services(start_date=None, end_date=None, limit=10):
+    @classmethod
+    def get_top_services(cls, start_date=None, end_date=None, limit=10):
         """
         Get the most popular services by completion count.
         
@@ -160,27 +305,28 @@ class ServiceReportManager:
         Returns:
             list: Top services with statistics
         """
-        queryset = Appointment.objects.filter(status='completed')
-        
-        if start_date:
-            queryset = queryset.filter(scheduled_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(scheduled_date__lte=end_date)
-        
-        top_services = (
-            queryset.values('service_type__name', 'service_type__base_price')
-            .annotate(
-                completion_count=Count('id'),
-                total_revenue=Sum('price'),
-                avg_price=models.Avg('price')
-            )
-            .order_by('-completion_count')[:limit]
+        by_type = _group_rollup_rows(cls._completed_rollup_rows(start_date, end_date), 2)
+        service_types = cls._service_types(by_type.keys())
+
+        top_services = sorted(
+            (
+                {
+                    'service_type__name': service_types[key][0],
+                    'service_type__base_price': service_types[key][1],
+                    'completion_count': count,
+                    'total_revenue': revenue,
+                    'avg_price': _average_price(revenue, count)
+                }
+                for key, (count, revenue, duration) in by_type.items()
+                if count and key in service_types
+            ),
+            key=lambda item: (-item['completion_count'], item['service_type__name'])
         )
-        
-        return list(top_services)
+
+        return top_services[:limit]
     
-    @staticmethod
-    def get_professional_performance(start_date=None, end_date=None):
+    @classmethod
+    def get_professional_performance(cls, start_date=None, end_date=None):
         """
         Get performance metrics for each professional.
         
@@ -191,25 +337,50 @@ class ServiceReportManager:
         Returns:
             list: Professional performance data
         """
-        queryset = Appointment.objects.filter(status='completed')
-        
-        if start_date:
-            queryset = queryset.filter(scheduled_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(scheduled_date__lte=end_date)
-        
-        professional_stats = (
-            queryset.values('professional__name', 'professional__id')
-            .annotate(
-                services_completed=Count('id'),
-                total_revenue=Sum('price'),
-                avg_service_price=models.Avg('price'),
-                total_hours_worked=Sum('duration_minutes') / 60.0
-            )
-            .order_by('-services_completed')
+        by_professional = _group_rollup_rows(cls._completed_rollup_rows(start_date, end_date), 1)
+        professional_names = cls._professional_names(by_professional.keys())
+
+        return sorted(
+            (
+                {
+                    'professional__name': professional_names[key],
+                    'professional__id': key,
+                    'services_completed': count,
+                    'total_revenue': revenue,
+                    'avg_service_price': _average_price(revenue, count),
+                    'total_hours_worked': duration / 60.0
+                }
+                for key, (count, revenue, duration) in by_professional.items()
+                if count and key in professional_names
+            ),
+            key=lambda item: (-item['services_completed'], item['professional__name'])
         )
-        
-        return list(professional_stats)
+
+    @staticmethod
+    def get_completed_services_count(start_date=None, end_date=None):
+        """Get the number of completed services within a date range"""
+        return ReportOptimizer.get_optimized_completed_services_count(start_date, end_date)
+
+    @classmethod
+    def get_quick_stats(cls, today):
+        """
+        Get the completed service counts shown on the dashboard.
+
+        Args:
+            today (date): Reference day
+
+        Returns:
+            dict: Completed services today, this week and this month
+        """
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+
+        return {
+            'today_completed': cls.get_completed_services_count(start_date=today, end_date=today),
+            'week_completed': cls.get_completed_services_count(start_date=week_start, end_date=today),
+            'month_completed': cls.get_completed_services_count(start_date=month_start, end_date=today),
+            'date': today.isoformat()
+        }
 
 
 class ReportOptimizer:
@@ -240,7 +411,7 @@ class ReportOptimizer:
         Optimized query for getting just the count of completed services.
         This is much faster for large datasets when you only need the count.
         """
-        queryset = Appointment.objects.filter(status='completed')
+        queryset = AppointmentArchive.queryset(start_date).filter(status='completed')
         
         if start_date:
             queryset = queryset.filter(scheduled_date__gte=start_date)
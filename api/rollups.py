@@ -0,0 +1,145 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, F
+from .models import AppointmentRecord, DailyServiceRollup
+
+
+class RollupManager:
+    """Keeps the DailyServiceRollup table in sync with appointment writes"""
+
+    @staticmethod
+    def _rollup_key(appointment):
+        return (
+            appointment.scheduled_date,
+            appointment.professional_id,
+            appointment.service_type_id,
+            appointment.status,
+        )
+
+    @staticmethod
+    def apply_change(before, after):
+        """
+        Apply the difference between two states of one appointment.
+
+        Args:
+            before: Appointment state before the write (None when created)
+            after: Appointment state after the write (None when deleted)
+
+        Both states only need the scheduled_date, professional_id,
+        service_type_id, status, price and duration_minutes attributes.
+        """
+        RollupManager.apply_changes([(before, after)])
+
+    @staticmethod
+    def apply_changes(changes):
+        """
+        Apply a batch of (before, after) appointment changes.
+
+        Deltas for the same rollup row are merged first so each touched
+        row is updated once.
+        """
+        deltas = {}
+        for before, after in changes:
+            for state, sign in ((before, -1), (after, 1)):
+                if state is None:
+                    continue
+                delta = deltas.setdefault(RollupManager._rollup_key(state), [0, Decimal('0'), 0])
+                delta[0] += sign
+                delta[1] += sign * Decimal(state.price)
+                delta[2] += sign * state.duration_minutes
+
+        for key, (count, revenue, duration) in deltas.items():
+            if count == 0 and revenue == 0 and duration == 0:
+                continue
+            RollupManager._apply_delta(key, count, revenue, duration)
+
+    @staticmethod
+    def _apply_delta(key, count, revenue, duration):
+        date, professional_id, service_type_id, status = key
+        rows = DailyServiceRollup.objects.filter(
+            date=date,
+            professional_id=professional_id,
+            service_type_id=service_type_id,
+            status=status
+        )
+        updated = rows.update(
+            count=F('count') + count,
+            revenue=F('revenue') + revenue,
+            total_duration=F('total_duration') + duration
+        )
+
+        if not updated and count > 0:
+            try:
+                with transaction.atomic():
+                    DailyServiceRollup.objects.create(
+                        date=date,
+                        professional_id=professional_id,
+                        service_type_id=service_type_id,
+                        status=status,
+                        count=count,
+                        revenue=revenue,
+                        total_duration=duration
+                    )
+            except IntegrityError:
+                # Another writer created the row first, add on top of it
+                rows.update(
+                    count=F('count') + count,
+                    revenue=F('revenue') + revenue,
+                    total_duration=F('total_duration') + duration
+                )
+        elif count < 0:
+            # Drop rows that no longer represent any appointment
+            rows.filter(count__lte=0).delete()
+
+    @staticmethod
+    def rebuild(start_date=None, end_date=None):
+        """
+        Recompute the rollup rows from the appointments, archived ones included.
+
+        Args:
+            start_date (date): First day to rebuild (inclusive)
+            end_date (date): Last day to rebuild (inclusive)
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        # Archived appointments keep counting in the rollups
+        appointments = AppointmentRecord.objects.all()
+        rollups = DailyServiceRollup.objects.all()
+
+        if start_date:
+            appointments = appointments.filter(scheduled_date__gte=start_date)
+            rollups = rollups.filter(date__gte=start_date)
+        if end_date:
+            appointments = appointments.filter(scheduled_date__lte=end_date)
+            rollups = rollups.filter(date__lte=end_date)
+
+        grouped = (
+            appointments.values('scheduled_date', 'professional_id', 'service_type_id', 'status')
+            .annotate(
+                count=Count('id'),
+                revenue=Sum('price'),
+                total_duration=Sum('duration_minutes')
+            )
+            .order_by()
+        )
+
+        with transaction.atomic():
+            rollups.delete()
+            created = DailyServiceRollup.objects.bulk_create(
+                (
+                    DailyServiceRollup(
+                        date=row['scheduled_date'],
+                        professional_id=row['professional_id'],
+                        service_type_id=row['service_type_id'],
+                        status=row['status'],
+                        count=row['count'],
+                        revenue=row['revenue'] or 0,
+                        total_duration=row['total_duration'] or 0
+                    )
+                    for row in grouped.iterator(chunk_size=2000)
+                ),
+                batch_size=1000
+            )
+
+        return len(created)
@@ -0,0 +1,334 @@
+import re
+import unicodedata
+from collections import namedtuple
+from django.core.exceptions import ValidationError
+from .availability import AvailabilityManager, ScheduleGrid, _minutes
+from .models import Professional, ServiceType
+
+
+# Largest number of requests accepted in one optimization
+SCHEDULE_MAX_REQUESTS = 1000
+
+# One pending request, its window is the bitmap of the slots where it may start
+ScheduleRequest = namedtuple('ScheduleRequest', 'index service_type_id slots_needed window professional_id')
+
+
+def _normalize(text):
+    """Lowercase text without accents, so 'Coloração' matches 'coloracao'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+class SpecialtyMatcher:
+    """
+    Decides which professionals can perform each service.
+
+    Professional.specialties is free text ("Cabelo, Coloração"): a
+    professional is eligible for a service when one of their comma or
+    semicolon separated specialties appears as whole words in the
+    service's name or description, ignoring case and accents.
+    Professionals without specialties are eligible for every service.
+    """
+
+    @staticmethod
+    def specialties(text):
+        return [item.strip() for item in re.split(r'[,;]', _normalize(text)) if item.strip()]
+
+    @classmethod
+    def eligibility(cls, professionals, service_types):
+        """
+        Args:
+            professionals (list): (id, specialties) pairs
+            service_types (list): (id, name, description) tuples
+
+        Returns:
+            dict: Eligible professional ids per service type id, in the order given
+        """
+        patterns = [
+            (professional_id, [re.compile(r'\b' + re.escape(item) + r'\b') for item in cls.specialties(text)])
+            for professional_id, text in professionals
+        ]
+        eligible = {}
+        for service_type_id, name, description in service_types:
+            haystack = _normalize(f'{name} {description}')
+            eligible[service_type_id] = [
+                professional_id for professional_id, compiled in patterns
+                if not compiled or any(pattern.search(haystack) for pattern in compiled)
+            ]
+        return eligible
+
+
+class DayScheduleOptimizer:
+    """
+    Assigns pending requests of one day to professionals and start slots.
+
+    Works on the ScheduleGrid bitmaps of each professional-day, so checking
+    where a request fits on a professional is a few integer operations.
+    Requests with the fewest options are placed first. Each one goes where
+    it fills a gap exactly, or else next to taken slots, to avoid leaving
+    idle gaps. Its preferred professional is used when possible. Requests
+    still unplaced then try to take the place of a booked request that
+    can move to another professional or time, which books more requests
+    than the greedy pass alone.
+    """
+
+    def __init__(self, grid, busy, eligibility):
+        """
+        Args:
+            grid (ScheduleGrid): Slot grid of the day
+            busy (dict): Taken-slot bitmap per professional id (every candidate professional must be present)
+            eligibility (dict): Eligible professional ids per service type id
+        """
+        self.grid = grid
+        self.busy = dict(busy)
+        self.eligibility = eligibility
+        self.placed = {}
+        self.by_professional = {professional_id: set() for professional_id in busy}
+
+    def candidates(self, request):
+        return [
+            professional_id for professional_id in self.eligibility.get(request.service_type_id, ())
+            if professional_id in self.busy
+        ]
+
+    def best_start(self, busy, request):
+        """
+        Best start slot of a request on a professional-day, or None.
+
+        Returns:
+            tuple: (score, slot), the score is 2 when both neighbours are
+            taken (or closed), 1 when one is, 0 otherwise
+        """
+        starts = self.grid.fitting_starts(busy, request.slots_needed) & request.window
+        if not starts:
+            return None
+        # Slots outside opening hours count as taken
+        blocked = busy | ~self.grid.full
+        left = starts & ((blocked << 1) | 1)
+        right = starts & (blocked >> request.slots_needed)
+        for score, options in ((2, left & right), (1, left | right), (0, starts)):
+            if options:
+                return score, (options & -options).bit_length() - 1
+
+    def best_placement(self, request):
+        """(professional id, slot) where the request fits best, or None"""
+        best = None
+        for professional_id in self.candidates(request):
+            found = self.best_start(self.busy[professional_id], request)
+            if found is None:
+                continue
+            if professional_id == request.professional_id:
+                return professional_id, found[1]
+            # Ties go to the busier day, keeping free days open for long services
+            key = (found[0], self.busy[professional_id].bit_count())
+            if best is None or key > best[0]:
+                best = (key, professional_id, found[1])
+        return best and best[1:]
+
+    def mask(self, request, slot):
+        return ((1 << request.slots_needed) - 1) << slot
+
+    def reach(self, request):
+        """Bitmap of every slot the request could occupy within its window"""
+        if not request.window:
+            return 0
+        first = (request.window & -request.window).bit_length() - 1
+        end = request.window.bit_length() - 1 + request.slots_needed
+        return ((1 << (end - first)) - 1) << first
+
+    def place(self, request, professional_id, slot):
+        self.busy[professional_id] |= self.mask(request, slot)
+        self.placed[request.index] = (request, professional_id, slot)
+        self.by_professional[professional_id].add(request.index)
+
+    def remove(self, index):
+        request, professional_id, slot = self.placed.pop(index)
+        self.busy[professional_id] &= ~self.mask(request, slot)
+        self.by_professional[professional_id].discard(index)
+        return request, professional_id, slot
+
+    def options(self, request):
+        """Number of (professional, start) pairs the request could take now"""
+        return sum(
+            (self.grid.fitting_starts(self.busy[professional_id], request.slots_needed) & request.window).bit_count()
+            for professional_id in self.candidates(request)
+        )
+
+    def solve(self, requests):
+        """
+        Args:
+            requests (list): ScheduleRequest entries
+
+        Returns:
+            tuple: ({request index: (professional id, slot)}, [unplaced request indexes])
+        """
+        counted = [(self.options(request), request) for request in requests]
+        unplaced = [request for count, request in counted if not count]
+        ordered = sorted(
+            ((count, request) for count, request in counted if count),
+            key=lambda item: (item[0], -item[1].slots_needed, item[1].index)
+        )
+
+        pending = []
+        for count, request in ordered:
+            placement = self.best_placement(request)
+            if placement is None:
+                pending.append(request)
+            else:
+                self.place(request, *placement)
+
+        for request in pending:
+            if not self.displace(request):
+                unplaced.append(request)
+
+        return (
+            {index: (professional_id, slot) for index, (request, professional_id, slot) in self.placed.items()},
+            sorted(request.index for request in unplaced),
+        )
+
+    def displace(self, request):
+        """
+        Place a request by moving one booked request elsewhere.
+
+        Only requests overlapping the window and not sitting on their
+        preferred professional are moved.
+
+        Returns:
+            bool: Whether the request was placed
+        """
+        for professional_id in self.candidates(request):
+            for index in sorted(self.by_professional[professional_id]):
+                other, _, slot = self.placed[index]
+                if other.professional_id == professional_id:
+                    continue
+                if not self.mask(other, slot) & self.reach(request):
+                    continue
+
+                self.remove(index)
+                found = self.best_start(self.busy[professional_id], request)
+                if found is not None:
+                    self.place(request, professional_id, found[1])
+                    moved = self.best_placement(other)
+                    if moved is not None:
+                        self.place(other, *moved)
+                        return True
+                    self.remove(request.index)
+                self.place(other, professional_id, slot)
+        return False
+
+    def idle_slots(self):
+        """Free slots between the first and last taken slot of every professional-day"""
+        idle = 0
+        for busy in self.busy.values():
+            if busy:
+                low = (busy & -busy).bit_length() - 1
+                idle += busy.bit_length() - low - busy.bit_count()
+        return idle
+
+
+class ScheduleOptimizer:
+    """Proposes assignments for a batch of pending requests on one day"""
+
+    @staticmethod
+    def propose(day, items, now=None, grid=None):
+        """
+        Assign pending requests to active professionals without conflicts.
+
+        Existing scheduled, in-progress and completed appointments of the
+        day are kept as they are. Nothing is saved: the proposal can be
+        booked with the bulk endpoint.
+
+        Args:
+            day (date): Day to schedule
+            items (list): Requests as dicts with service_type, start and end
+                (HH:MM window the service must fit in), and optionally
+                professional (preferred) and client
+            now (datetime): Slots before this moment are not offered
+
+        Returns:
+            dict: Assigned requests with their professional and time, and the unplaced request indexes
+
+        Raises:
+            ValueError: When an item is invalid or the salon is closed that day
+        """
+        grid = grid or ScheduleGrid()
+        if not grid.is_open(day):
+            raise ValueError('The salon is closed on this day')
+
+        parsed = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise ValueError(f'Request {index}: expected an object')
+            try:
+                service_type_id = ServiceType._meta.pk.to_python(item.get('service_type'))
+                preferred = Professional._meta.pk.to_python(item.get('professional'))
+            except ValidationError:
+                raise ValueError(f'Request {index}: invalid service type or professional id')
+            try:
+                start, end = _minutes(item['start']), _minutes(item['end'])
+            except (KeyError, TypeError, ValueError, AttributeError):
+                raise ValueError(f'Request {index}: start and end must be HH:MM times')
+            if service_type_id is None:
+                raise ValueError(f'Request {index}: service_type is required')
+            if start >= end:
+                raise ValueError(f'Request {index}: start must be before end')
+            parsed.append((index, service_type_id, preferred, item['start'], item['end']))
+
+        service_types = ServiceType.objects.filter(pk__in={entry[1] for entry in parsed}, is_active=True).in_bulk()
+        professionals = list(Professional.objects.filter(is_active=True).values_list('id', 'name', 'specialties'))
+        names = {professional_id: name for professional_id, name, specialties in professionals}
+
+        eligibility = SpecialtyMatcher.eligibility(
+            [(professional_id, specialties) for professional_id, name, specialties in professionals],
+            [(service_type.pk, service_type.name, service_type.description) for service_type in service_types.values()],
+        )
+        bitmaps = AvailabilityManager.busy_bitmaps(grid, day, day, list(names))
+        busy = {professional_id: bitmaps.get((professional_id, day), 0) for professional_id in names}
+        if now is not None and now.date() == day:
+            # Slots already started today count as taken
+            elapsed = _minutes(now.time()) - grid.opening
+            if elapsed > 0:
+                past = grid.mask(grid.slot_time(0), elapsed)
+                busy = {professional_id: value | past for professional_id, value in busy.items()}
+
+        optimizer = DayScheduleOptimizer(grid, busy, eligibility)
+        requests = []
+        for index, service_type_id, preferred, start, end in parsed:
+            if service_type_id not in service_types:
+                raise ValueError(f'Request {index}: service type not found')
+            if preferred is not None and preferred not in names:
+                raise ValueError(f'Request {index}: professional not found')
+            slots_needed = grid.slots_needed(service_types[service_type_id].duration_minutes)
+            requests.append(ScheduleRequest(
+                index=index,
+                service_type_id=service_type_id,
+                slots_needed=slots_needed,
+                window=grid.start_window(start, end, slots_needed),
+                professional_id=preferred,
+            ))
+
+        idle_before = optimizer.idle_slots()
+        placed, unplaced = optimizer.solve(requests)
+
+        assigned = []
+        for index, (professional_id, slot) in sorted(placed.items()):
+            service_type = service_types[requests[index].service_type_id]
+            assigned.append({
+                'request': index,
+                'client': items[index].get('client'),
+                'service_type': service_type.pk,
+                'professional': professional_id,
+                'professional_name': names[professional_id],
+                'scheduled_date': day,
+                'scheduled_time': grid.slot_time(slot),
+                'duration_minutes': service_type.duration_minutes,
+                'price': service_type.base_price,
+            })
+
+        return {
+            'date': day,
+            'assigned': assigned,
+            'unassigned': unplaced,
+            'idle_minutes_before': idle_before * grid.slot_minutes,
+            'idle_minutes_after': optimizer.idle_slots() * grid.slot_minutes,
+        }
@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist
+from django.db import transaction
+from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist, ReportJob, AppointmentEvent, WaitlistEntry
+from .fieldsets import FieldsetSerializerMixin
+from .reports import GRANULARITIES
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
     class Meta:
@@ -21,62 +24,131 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return user
 
 
-class ProfessionalSerializer(serializers.ModelSerializer):
+class ProfessionalSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Professional
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Client
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
-class ServiceTypeSerializer(serializers.ModelSerializer):
+class ServiceTypeSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ServiceType
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.name', read_only=True)
     professional_name = serializers.CharField(source='professional.name', read_only=True)
     service_name = serializers.CharField(source='service_type.name', read_only=True)
+    expandable_fields = {
+        'client': ClientSerializer,
+        'professional': ProfessionalSerializer,
+        'service_type': ServiceTypeSerializer,
+        'created_by': CustomUserSerializer,
+    }
     
     class Meta:
         model = Appointment
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at', 'created_by')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'end_minute', 'version', 'created_by')
     
+    def validate(self, data):
+        data = super().validate(data)
+
+        def value(field):
+            return data[field] if field in data else getattr(self.instance, field, None)
+
+        professional = value('professional')
+        scheduled_date = value('scheduled_date')
+        scheduled_time = value('scheduled_time')
+        duration_minutes = value('duration_minutes')
+        appointment_status = value('status') or 'scheduled'
+
+        if appointment_status not in Appointment.BLOCKING_STATUSES or None in (
+            professional, scheduled_date, scheduled_time, duration_minutes
+        ):
+            return data
+
+        if not transaction.get_autocommit():
+            # Bookings for one professional queue up here until the saving transaction ends
+            list(Professional.objects.select_for_update().filter(pk=professional.pk).values_list('pk'))
+
+        conflicts = Appointment.objects.overlapping(professional.pk, scheduled_date, scheduled_time, duration_minutes)
+        if self.instance is not None:
+            conflicts = conflicts.exclude(pk=self.instance.pk)
+
+        conflict = conflicts.order_by('scheduled_time').values_list('scheduled_time', 'end_minute').first()
+        if conflict:
+            start, end_minute = conflict
+            raise serializers.ValidationError({
+                'scheduled_time': (
+                    f'{professional.name} already has an appointment from {start:%H:%M} '
+                    f'to {end_minute // 60:02d}:{end_minute % 60:02d} on {scheduled_date}.'
+                )
+            })
+
+        return data
+
     def create(self, validated_data):
         # Set the created_by field to the current user
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class AppointmentListSerializer(serializers.ModelSerializer):
+class AppointmentBulkItemSerializer(serializers.Serializer):
+    """
+    One item of a bulk appointment write.
+
+    Related objects are plain UUIDs here, they are resolved against rows
+    preloaded once for the whole batch. Items with an id update that
+    appointment and only need the fields that change.
+    """
+    id = serializers.UUIDField(required=False)
+    client = serializers.UUIDField()
+    professional = serializers.UUIDField()
+    service_type = serializers.UUIDField()
+    scheduled_date = serializers.DateField()
+    scheduled_time = serializers.TimeField()
+    duration_minutes = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES, default='scheduled')
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class AppointmentListSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Simplified serializer for listing appointments"""
     client_name = serializers.CharField(source='client.name', read_only=True)
     professional_name = serializers.CharField(source='professional.name', read_only=True)
     service_name = serializers.CharField(source='service_type.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    expandable_fields = {
+        'client': ClientSerializer,
+        'professional': ProfessionalSerializer,
+        'service_type': ServiceTypeSerializer,
+    }
     
     class Meta:
         model = Appointment
         fields = (
             'id', 'client_name', 'professional_name', 'service_name', 
             'scheduled_date', 'scheduled_time', 'duration_minutes', 
-            'price', 'status', 'status_display'
+            'price', 'status', 'status_display', 'version'
         )
 
 
-class ReceptionistSerializer(serializers.ModelSerializer):
+class ReceptionistSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    expandable_fields = {'user': CustomUserSerializer}
     
     class Meta:
         model = Receptionist
@@ -84,6 +156,84 @@ class ReceptionistSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
+class WaitlistEntrySerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.name', read_only=True)
+    service_name = serializers.CharField(source='service_type.name', read_only=True)
+    expandable_fields = {
+        'client': ClientSerializer,
+        'professional': ProfessionalSerializer,
+        'service_type': ServiceTypeSerializer,
+    }
+    
+    class Meta:
+        model = WaitlistEntry
+        fields = '__all__'
+        read_only_fields = ('id', 'created_at', 'updated_at', 'created_by')
+    
+    def validate(self, data):
+        data = super().validate(data)
+
+        def value(field):
+            return data[field] if field in data else getattr(self.instance, field, None)
+
+        if None not in (value('earliest_date'), value('latest_date')) and value('earliest_date') > value('latest_date'):
+            raise serializers.ValidationError({'latest_date': 'latest_date cannot be before earliest_date.'})
+        if None not in (value('earliest_time'), value('latest_time')) and value('earliest_time') >= value('latest_time'):
+            raise serializers.ValidationError({'latest_time': 'latest_time must be after earliest_time.'})
+        return data
+
+    def create(self, validated_data):
+        validated_data['created_by'] = self.context['request'].user
+        return super().create(validated_data)
+
+
+class ReportJobRequestSerializer(serializers.Serializer):
+    """Report spec submitted for background computation"""
+    report = serializers.ChoiceField(choices=ReportJob.REPORT_CHOICES)
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+    professional_id = serializers.UUIDField(required=False, allow_null=True)
+    service_type_id = serializers.UUIDField(required=False, allow_null=True)
+    limit = serializers.IntegerField(required=False, min_value=1, default=10)
+    granularity = serializers.ChoiceField(choices=list(GRANULARITIES), required=False, default='day')
+
+    def validate(self, data):
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError('start_date cannot be after end_date.')
+
+        if data.get('professional_id') and not Professional.objects.filter(id=data['professional_id']).exists():
+            raise serializers.ValidationError({'professional_id': 'Professional not found.'})
+
+        if data.get('service_type_id') and not ServiceType.objects.filter(id=data['service_type_id']).exists():
+            raise serializers.ValidationError({'service_type_id': 'Service type not found.'})
+
+        return data
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = ReportJob
+        fields = (
+            'id', 'report', 'parameters', 'status', 'status_display', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
+
+
+class AppointmentEventSerializer(serializers.ModelSerializer):
+    kind = serializers.CharField(source='get_kind_display', read_only=True)
+
+    class Meta:
+        model = AppointmentEvent
+        fields = ('kind', 'status', 'scheduled_date', 'scheduled_time', 'professional_id', 'occurred_at')
+        read_only_fields = fields
+
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
@@ -0,0 +1,83 @@
+from collections import namedtuple
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .counters import CompletedServiceCounters
+from .events import broker
+from .models import Appointment, AppointmentTombstone
+from .report_cache import report_cache
+from .rollups import RollupManager
+from .timeline import AppointmentTimeline
+
+
+TRACKED_FIELDS = (
+    'scheduled_date', 'scheduled_time', 'professional_id', 'service_type_id',
+    'status', 'price', 'duration_minutes',
+)
+
+AppointmentSnapshot = namedtuple('AppointmentSnapshot', ('id',) + TRACKED_FIELDS)
+
+
+def snapshot(appointment):
+    """Capture the fields derived data depends on from an appointment instance"""
+    return AppointmentSnapshot(appointment.pk, *(getattr(appointment, field) for field in TRACKED_FIELDS))
+
+
+def notify_appointment_change(before, after):
+    """
+    Propagate one appointment write to every derived store.
+
+    Write paths that bypass model signals (bulk operations, conditional
+    updates) must call this directly.
+
+    Args:
+        before (AppointmentSnapshot): State before the write, None on create
+        after (AppointmentSnapshot): State after the write, None on delete
+    """
+    notify_appointment_changes([(before, after)])
+
+
+def notify_appointment_changes(changes):
+    """
+    Propagate a batch of appointment writes to every derived store.
+
+    Args:
+        changes (list): (before, after) AppointmentSnapshot pairs
+    """
+    RollupManager.apply_changes(changes)
+    CompletedServiceCounters.apply_changes(changes)
+    AppointmentTombstone.objects.bulk_create([
+        AppointmentTombstone(
+            appointment_id=before.id,
+            scheduled_date=before.scheduled_date,
+            professional_id=before.professional_id
+        )
+        for before, after in changes if after is None
+    ])
+    AppointmentTimeline.record(changes)
+    report_cache.invalidate({
+        state.scheduled_date for change in changes for state in change if state is not None
+    })
+    broker.publish_changes(changes)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or instance._state.adding:
+        return
+
+    row = Appointment.objects.filter(pk=instance.pk).values_list(*TRACKED_FIELDS).first()
+    if row:
+        instance._previous_state = AppointmentSnapshot(instance.pk, *row)
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    notify_appointment_change(getattr(instance, '_previous_state', None), snapshot(instance))
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    notify_appointment_change(snapshot(instance), None)
@@ -0,0 +1,133 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from .models import Appointment, AppointmentTombstone
+
+
+def _setting(name, default):
+    return getattr(settings, 'APPOINTMENT_SYNC', {}).get(name, default)
+
+
+class TokenExpired(Exception):
+    """The token is older than the tombstone retention, the client has to reload everything"""
+
+
+class AppointmentSync:
+    """
+    Delta sync of the appointment table.
+
+    A token is an opaque watermark on updated_at (and on the deleted_at of
+    tombstones). Each read goes back LAG_SECONDS before the watermark, so
+    writes whose transaction committed shortly after a later updated_at was
+    handed out are still delivered. Clients apply changes as upserts, so
+    seeing a row twice is harmless.
+
+    While has_more is set the token also holds the id of the last row
+    sent, and the next page continues strictly after (updated_at, id)
+    without going back, so pages always move forward even when more rows
+    than the limit share a timestamp or fall inside the lag.
+    """
+
+    @staticmethod
+    def encode_token(watermark, after_id=None):
+        value = watermark.isoformat() if after_id is None else f'{watermark.isoformat()}|{after_id}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @staticmethod
+    def decode_token(token):
+        """
+        Returns:
+            tuple: (watermark, id of the last row sent or None)
+
+        Raises:
+            ValueError: When the token is malformed
+        """
+        try:
+            value, _, after_id = base64.urlsafe_b64decode(token.encode()).decode().partition('|')
+            watermark = datetime.fromisoformat(value)
+            after_id = Appointment._meta.pk.to_python(after_id or None)
+        except (binascii.Error, UnicodeDecodeError, ValidationError) as error:
+            raise ValueError('Invalid token') from error
+        if timezone.is_naive(watermark):
+            raise ValueError('Invalid token')
+        return watermark, after_id
+
+    @staticmethod
+    def current_token(now=None):
+        """Token to start syncing from, taken before loading the initial list"""
+        now = now or timezone.now()
+        return AppointmentSync.encode_token(now - timedelta(seconds=_setting('LAG_SECONDS', 5)))
+
+    @staticmethod
+    def changes_since(token, limit=None, now=None):
+        """
+        Get the appointments changed and deleted after a token.
+
+        Args:
+            token (str): Token returned by an earlier call or by current_token()
+            limit (int): Most changed appointments returned at once
+
+        Returns:
+            dict: changed (Appointment list), deleted (ids), token and has_more
+
+        Raises:
+            ValueError: When the token is malformed
+            TokenExpired: When tombstones older than the token were already purged
+        """
+        now = now or timezone.now()
+        limit = limit or _setting('MAX_CHANGES', 1000)
+        lag = timedelta(seconds=_setting('LAG_SECONDS', 5))
+        watermark, after_id = AppointmentSync.decode_token(token)
+
+        if watermark < now - timedelta(days=_setting('TOMBSTONE_RETENTION_DAYS', 30)):
+            raise TokenExpired()
+
+        if after_id is None:
+            after = Q(updated_at__gt=watermark - lag)
+        else:
+            # Next page of a larger change set, continue right after the last row sent
+            after = Q(updated_at__gte=watermark) & (Q(updated_at__gt=watermark) | Q(id__gt=after_id))
+
+        changed = list(
+            Appointment.objects.select_related('client', 'professional', 'service_type')
+            .filter(after)
+            .order_by('updated_at', 'id')[:limit + 1]
+        )
+        has_more = len(changed) > limit
+        changed = changed[:limit]
+
+        tombstones = AppointmentTombstone.objects.filter(deleted_at__gt=watermark - lag)
+        if has_more:
+            # Deletes are only reported up to the last change on this page
+            tombstones = tombstones.filter(deleted_at__lte=changed[-1].updated_at)
+        deleted = list(tombstones.order_by('deleted_at').values_list('appointment_id', 'deleted_at'))
+
+        if has_more:
+            new_token = AppointmentSync.encode_token(changed[-1].updated_at, changed[-1].id)
+        else:
+            seen = [appointment.updated_at for appointment in changed] + [deleted_at for _, deleted_at in deleted]
+            new_token = AppointmentSync.encode_token(max(seen + [watermark, now - lag]))
+
+        return {
+            'changed': changed,
+            'deleted': list(dict.fromkeys(appointment_id for appointment_id, _ in deleted)),
+            'token': new_token,
+            'has_more': has_more,
+        }
+
+    @staticmethod
+    def purge_tombstones(now=None):
+        """
+        Delete the tombstones past the retention period.
+
+        Returns:
+            int: Number of tombstones deleted
+        """
+        now = now or timezone.now()
+        cutoff = now - timedelta(days=_setting('TOMBSTONE_RETENTION_DAYS', 30))
+        deleted, _ = AppointmentTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        return deleted
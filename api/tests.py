@@ -1,3 +1,1204 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Count, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .analytics import ColumnarAppointmentStore, ColumnarReportManager, numpy_available
+from .archive import AppointmentArchive
+from .benchmarking import SyntheticDataset, measure
+from .models import (
+    CustomUser, Professional, Client, ServiceType, Appointment, AppointmentEvent, ArchivedAppointment,
+    DailyServiceRollup, ReportJob, WaitlistEntry,
+)
+from .counters import COMPLETED_KEY, CompletedServiceCounters
+from .events import broker
+from .jobs import ReportJobManager
+from .middleware import CompressionMiddleware
+from .parsers import FastJSONParser, MessagePackParser
+from .renderers import FastJSONRenderer, msgpack_available
+from .reports import EXPORT_COLUMNS, ServiceReportManager
+from .report_cache import CachedServiceReportManager, DATA_VERSION_KEY, LRUCache, report_cache
+from .rollups import RollupManager
+from .scheduling import SpecialtyMatcher
+from .sync import AppointmentSync
+from .views import AppointmentViewSet, ClientViewSet
+from .views_reports import BUNDLE_SECTIONS
+from .waitlist import WaitlistMatcher
 
-# Create your tests here.
+
+class ReportTestMixin:
+    """Shared fixture: one professional, service type and client with appointments in every status"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='reception', email='reception@salon.com', password='secret')
+        cls.professional = Professional.objects.create(name='Maria Silva', cpf='12345678901')
+        cls.service_type = ServiceType.objects.create(name='Manicure', base_price=Decimal('25.00'), duration_minutes=45)
+        cls.client_obj = Client.objects.create(
+            name='Cliente 1', cpf='10000000001', phone='+5511999990001', email='cliente1@email.com'
+        )
+
+        cls.today = date.today()
+        statuses = ['scheduled', 'completed', 'completed', 'completed', 'cancelled', 'no_show']
+        for hour, appointment_status in enumerate(statuses, start=8):
+            cls.create_appointment(cls.today, time(hour), appointment_status)
+        cls.create_appointment(cls.today - timedelta(days=1), time(9), 'completed')
+
+    @classmethod
+    def create_appointment(cls, scheduled_date, scheduled_time, appointment_status, **extra):
+        fields = {
+            'client': cls.client_obj,
+            'professional': cls.professional,
+            'service_type': cls.service_type,
+            'scheduled_date': scheduled_date,
+            'scheduled_time': scheduled_time,
+            'duration_minutes': 45,
+            'price': Decimal('25.00'),
+            'status': appointment_status,
+        }
+        fields.update(extra)
+        return Appointment.objects.create(**fields)
+
+    def setUp(self):
+        report_cache.entries.clear()
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+
+class PerformanceMetricsQueryBudgetTests(ReportTestMixin, TestCase):
+
+    def test_metrics_are_computed_in_one_query(self):
+        # The archive boundary lookup plus the metrics aggregate
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/reports/performance-metrics/', {
+                'start_date': self.today.isoformat(),
+                'end_date': self.today.isoformat(),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_appointments'], 6)
+        self.assertEqual(response.data['completed_appointments'], 3)
+        self.assertEqual(response.data['completion_rate'], 50.0)
+        self.assertEqual(response.data['cancellation_rate'], 16.67)
+        self.assertEqual(response.data['no_show_rate'], 16.67)
+        self.assertEqual(response.data['status_breakdown'], [
+            {'status': 'cancelled', 'count': 1},
+            {'status': 'completed', 'count': 3},
+            {'status': 'no_show', 'count': 1},
+            {'status': 'scheduled', 'count': 1},
+        ])
+
+
+class DashboardStatsQueryBudgetTests(ReportTestMixin, TestCase):
+
+    def test_dashboard_stats_query_budget(self):
+        # One count per catalogue table plus one aggregate for today's appointments
+        with self.assertNumQueries(4):
+            response = self.api.get('/api/dashboard/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'total_clients': 1,
+            'total_professionals': 1,
+            'total_services': 1,
+            'today_appointments': 6,
+            'pending_appointments': 1,
+            'completed_appointments': 3,
+        })
+
+
+class ReportCacheTests(ReportTestMixin, TestCase):
+
+    def rollup_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if 'api_dailyservicerollup' in query['sql']]
+
+    def test_lru_counts_hits_misses_and_evicts_the_least_recent(self):
+        entries = LRUCache(2)
+        entries.set('a', 1)
+        entries.set('b', 2)
+        self.assertEqual(entries.get('a'), 1)
+        entries.set('c', 3)
+
+        self.assertIsNone(entries.get('b'))
+        self.assertEqual((entries.get('a'), entries.get('c')), (1, 3))
+        stats = entries.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['entries']), (3, 1, 1, 2))
+
+    def test_entries_expire(self):
+        entries = LRUCache(2, timeout=300)
+        with mock.patch('api.report_cache.time.monotonic', return_value=1000):
+            entries.set('a', 1)
+        with mock.patch('api.report_cache.time.monotonic', return_value=1299):
+            self.assertEqual(entries.get('a'), 1)
+        with mock.patch('api.report_cache.time.monotonic', return_value=1300):
+            self.assertIsNone(entries.get('a'))
+
+    def test_writes_invalidate_once_committed(self):
+        report = CachedServiceReportManager.get_performance_metrics(self.today, self.today)
+        version = report_cache.data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_appointment(self.today, time(15), 'completed')
+            self.assertEqual(report_cache.data_version(), version)
+            self.assertEqual(CachedServiceReportManager.get_performance_metrics(self.today, self.today), report)
+
+        self.assertNotEqual(report_cache.data_version(), version)
+        self.assertEqual(
+            CachedServiceReportManager.get_performance_metrics(self.today, self.today)['total_appointments'],
+            report['total_appointments'] + 1
+        )
+
+    def test_closed_days_are_reused_across_reports(self):
+        start, end = self.today - timedelta(days=10), self.today - timedelta(days=1)
+        CachedServiceReportManager.get_completed_services_report(start, end)
+
+        with CaptureQueriesContext(connection) as queries:
+            CachedServiceReportManager.get_completed_services_report(start, end, granularity='week')
+        self.assertEqual(self.rollup_queries(queries), [])
+
+        changed = self.today - timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_appointment(changed, time(10), 'completed')
+        with CaptureQueriesContext(connection) as queries:
+            report = CachedServiceReportManager.get_completed_services_report(start, end, granularity='month')
+
+        # Only the changed day is read again
+        [sql] = self.rollup_queries(queries)
+        self.assertEqual(sql.count(changed.isoformat()), 2)
+        self.assertEqual(report['summary']['total_services'], 2)
+
+    def test_versions_are_shared_with_other_processes(self):
+        version = report_cache.data_version()
+        other_process = FileBasedCache(settings.CACHES['default']['LOCATION'], {})
+        other_process.incr(DATA_VERSION_KEY)
+        self.assertEqual(report_cache.data_version(), version + 1)
+
+    def test_rollup_rebuild_invalidates_cached_reports(self):
+        start, end = self.today - timedelta(days=10), self.today - timedelta(days=1)
+        CachedServiceReportManager.get_completed_services_report(start, end)
+        version = report_cache.data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_report_rollups', stdout=io.StringIO())
+
+        self.assertNotEqual(report_cache.data_version(), version)
+        with CaptureQueriesContext(connection) as queries:
+            CachedServiceReportManager.get_completed_services_report(start, end, granularity='week')
+        self.assertEqual(len(self.rollup_queries(queries)), 1)
+
+
+class RollupManagerTests(ReportTestMixin, TestCase):
+
+    def rollups(self):
+        return list(DailyServiceRollup.objects.order_by('date', 'professional_id', 'service_type_id', 'status').values_list(
+            'date', 'professional_id', 'service_type_id', 'status', 'count', 'revenue', 'total_duration'
+        ))
+
+    def assertMatchesRebuild(self):
+        maintained = self.rollups()
+        RollupManager.rebuild()
+        self.assertEqual(maintained, self.rollups())
+
+    def test_every_write_keeps_rollups_equal_to_a_rebuild(self):
+        other = Professional.objects.create(name='Ana Santos', cpf='12345678902')
+        self.assertMatchesRebuild()
+
+        appointment = self.create_appointment(self.today, time(18), 'scheduled')
+        self.assertMatchesRebuild()
+
+        appointment.status = 'completed'
+        appointment.save()
+        self.assertMatchesRebuild()
+
+        appointment.scheduled_date = self.today + timedelta(days=3)
+        appointment.professional = other
+        appointment.price = Decimal('40.00')
+        appointment.save()
+        self.assertMatchesRebuild()
+
+        appointment.delete()
+        self.assertMatchesRebuild()
+
+        moved = Appointment.objects.filter(scheduled_date=self.today, status='scheduled').get()
+        response = self.api.post('/api/appointments/bulk/', [
+            {
+                'client': str(self.client_obj.id), 'professional': str(other.id), 'service_type': str(self.service_type.id),
+                'scheduled_date': '2030-01-07', 'scheduled_time': '09:00', 'duration_minutes': 60, 'price': '30.00',
+            },
+            {'id': str(moved.id), 'scheduled_date': '2030-01-08', 'status': 'completed'},
+        ], format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertMatchesRebuild()
+
+    def test_rebuild_matches_a_direct_aggregate(self):
+        DailyServiceRollup.objects.all().delete()
+        RollupManager.rebuild()
+
+        grouped = (
+            Appointment.objects.values_list('scheduled_date', 'professional_id', 'service_type_id', 'status')
+            .annotate(count=Count('id'), revenue=Sum('price'), total_duration=Sum('duration_minutes'))
+            .order_by('scheduled_date', 'professional_id', 'service_type_id', 'status')
+        )
+        self.assertEqual(self.rollups(), list(grouped))
+
+    def test_migration_backfill_matches_a_rebuild(self):
+        RollupManager.rebuild()
+        rebuilt = self.rollups()
+        DailyServiceRollup.objects.all().delete()
+
+        migration = importlib.import_module('api.migrations.0003_dailyservicerollup')
+        state = MigrationLoader(connection).project_state(('api', '0003_dailyservicerollup'))
+        migration.populate_rollups(state.apps, None)
+        self.assertEqual(self.rollups(), rebuilt)
+
+@skipUnless(numpy_available(), 'numpy is not installed')
+class ColumnarReportTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = ColumnarAppointmentStore()
+        patcher = mock.patch.object(ColumnarReportManager, 'store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertMatchesORM(self):
+        for start_date in (None, self.today):
+            self.assertEqual(
+                ColumnarReportManager.get_completed_services_report(start_date, granularity='week'),
+                ServiceReportManager.get_completed_services_report(start_date, granularity='week'),
+            )
+            for method in ('get_performance_metrics', 'get_top_services', 'get_professional_performance',
+                           'get_completed_services_count'):
+                self.assertEqual(
+                    getattr(ColumnarReportManager, method)(start_date),
+                    getattr(ServiceReportManager, method)(start_date),
+                    method
+                )
+
+    def test_reports_match_the_orm_manager_across_writes(self):
+        self.assertEqual(self.store.refresh(), 7)
+        self.assertMatchesORM()
+
+        scheduled = Appointment.objects.get(scheduled_date=self.today, status='scheduled')
+        scheduled.status = 'completed'
+        scheduled.price = Decimal('31.50')
+        scheduled.save()
+        Appointment.objects.filter(status='cancelled').get().delete()
+        self.create_appointment(self.today + timedelta(days=2), time(10), 'completed')
+
+        # Only the written rows are read again, the delete comes from its tombstone
+        self.assertLessEqual(self.store.refresh(), 3)
+        self.assertEqual(self.store.size, 7)
+        self.assertMatchesORM()
+
+class ReportJobTests(ReportTestMixin, TestCase):
+
+    def submit(self, **body):
+        return self.api.post('/api/reports/jobs/', {'report': 'performance_metrics', **body}, format='json')
+
+    def test_job_result_matches_the_synchronous_report(self):
+        response = self.submit(report='top_services', start_date=self.today.isoformat())
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+
+        self.assertEqual(ReportJobManager.run_pending(), 1)
+        job = self.api.get(f"/api/reports/jobs/{response.data['id']}/")
+        self.assertEqual(job.data['status'], 'completed')
+
+        report = self.api.get('/api/reports/top-services/', {'start_date': self.today.isoformat()})
+        result = json.loads(job.content)['result']
+        self.assertEqual(result, json.loads(report.content)['top_services'])
+        # Decimals come out as numbers, as in the synchronous response
+        self.assertEqual(result[0]['total_revenue'], 75.0)
+
+    def test_finished_jobs_are_reused_until_the_data_changes(self):
+        first = self.submit()
+        # A pending job is shared as well
+        self.assertEqual(self.submit().data['id'], first.data['id'])
+        ReportJobManager.run_pending()
+
+        reused = self.submit()
+        self.assertEqual(reused.status_code, 200)
+        self.assertEqual(reused.data['id'], first.data['id'])
+        self.assertNotEqual(self.submit(start_date=self.today.isoformat()).data['id'], first.data['id'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_appointment(self.today, time(18), 'completed')
+        recomputed = self.submit()
+        self.assertEqual(recomputed.status_code, 202)
+        self.assertNotEqual(recomputed.data['id'], first.data['id'])
+
+    def test_failed_job_keeps_the_error(self):
+        job_id = self.submit().data['id']
+        with mock.patch.object(ReportJobManager, 'compute', side_effect=RuntimeError('report exploded')), \
+                self.assertLogs('api.jobs', 'ERROR'):
+            ReportJobManager.run_pending()
+
+        response = self.api.get(f'/api/reports/jobs/{job_id}/')
+        self.assertEqual((response.data['status'], response.data['error']), ('failed', 'report exploded'))
+        self.assertIsNone(response.data['result'])
+        # A failed job is not reused
+        self.assertNotEqual(self.submit().data['id'], job_id)
+
+class CompletedServicesGranularityTests(ReportTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for scheduled_date in (date(2025, 1, 30), date(2025, 2, 3), date(2025, 2, 4), date(2025, 4, 1)):
+            cls.create_appointment(scheduled_date, time(10), 'completed')
+
+    def get_breakdown(self, granularity):
+        response = self.api.get('/api/reports/completed-services/', {
+            'start_date': '2025-01-01',
+            'end_date': '2025-04-30',
+            'granularity': granularity,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [(row['scheduled_date'], row['count']) for row in response.data['daily_breakdown']]
+
+    def test_buckets_are_labelled_by_their_first_day(self):
+        self.assertEqual(self.get_breakdown('week'), [
+            (date(2025, 1, 27), 1), (date(2025, 2, 3), 2), (date(2025, 3, 31), 1),
+        ])
+        self.assertEqual(self.get_breakdown('month'), [
+            (date(2025, 1, 1), 1), (date(2025, 2, 1), 2), (date(2025, 4, 1), 1),
+        ])
+        self.assertEqual(self.get_breakdown('quarter'), [
+            (date(2025, 1, 1), 3), (date(2025, 4, 1), 1),
+        ])
+
+    def test_invalid_granularity_is_rejected(self):
+        response = self.api.get('/api/reports/completed-services/', {'granularity': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CompletedServicesExportTests(ReportTestMixin, TestCase):
+
+    def export(self, **params):
+        response = self.api.get('/api/reports/completed-services/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_rows_follow_the_export_columns(self):
+        lines = self.export().splitlines()
+        self.assertEqual(lines[0].split(','), [name for name, lookup in EXPORT_COLUMNS])
+
+        completed = Appointment.objects.filter(status='completed').order_by('scheduled_date', 'scheduled_time')
+        self.assertEqual(len(lines), completed.count() + 1)
+        first = completed.first()
+        self.assertEqual(lines[1].split(','), [
+            str(first.id), first.scheduled_date.isoformat(), '09:00:00', 'Cliente 1', 'Maria Silva', 'Manicure', '45', '25.00',
+        ])
+
+    def test_ndjson_rows_are_objects_in_column_order(self):
+        rows = [json.loads(line) for line in self.export(format='ndjson', start_date=self.today.isoformat()).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(list(rows[0]), [name for name, lookup in EXPORT_COLUMNS])
+        self.assertEqual([row['scheduled_time'] for row in rows], ['09:00:00', '10:00:00', '11:00:00'])
+        self.assertEqual((rows[0]['price'], rows[0]['duration_minutes']), ('25.00', 45))
+
+    def test_filters(self):
+        yesterday = (self.today - timedelta(days=1)).isoformat()
+        self.assertEqual(len(self.export(start_date=yesterday, end_date=yesterday).splitlines()), 2)
+        other = Professional.objects.create(name='Ana Santos', cpf='12345678902')
+        self.assertEqual(len(self.export(professional_id=str(other.id)).splitlines()), 1)
+        self.assertEqual(len(self.export(professional_id=str(self.professional.id)).splitlines()), 5)
+
+        response = self.api.get('/api/reports/completed-services/export/', {'start_date': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_archived_appointments_are_exported(self):
+        archived = self.create_appointment(date(2024, 3, 4), time(9), 'completed')
+        AppointmentArchive.archive(date(2025, 1, 1))
+
+        rows = [json.loads(line) for line in self.export(format='ndjson', end_date='2024-12-31').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [str(archived.id)])
+        self.assertEqual(len(self.export(format='ndjson').splitlines()), 5)
+
+class ReportBundleTests(ReportTestMixin, TestCase):
+
+    def bundle(self, **params):
+        return self.api.get('/api/reports/bundle/', params)
+
+    def test_sections_can_be_selected(self):
+        with self.settings(REPORT_BUNDLE={'WORKERS': 1}):
+            response = self.bundle()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(set(BUNDLE_SECTIONS) <= set(response.data))
+
+            response = self.bundle(sections='top_services,quick_stats')
+            self.assertEqual(set(response.data) & set(BUNDLE_SECTIONS), {'top_services', 'quick_stats'})
+
+        response = self.bundle(sections='top_services,revenue,nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('revenue, nope', response.data['error'])
+
+    def test_sections_match_their_standalone_endpoints(self):
+        params = {'start_date': (self.today - timedelta(days=1)).isoformat(), 'end_date': self.today.isoformat()}
+        standalone = {
+            'completed_services': ('/api/reports/completed-services/', None),
+            'performance_metrics': ('/api/reports/performance-metrics/', None),
+            'top_services': ('/api/reports/top-services/', 'top_services'),
+            'professional_performance': ('/api/reports/professional-performance/', 'professional_performance'),
+            'quick_stats': ('/api/reports/quick-stats/', None),
+        }
+        with self.settings(REPORT_BUNDLE={'WORKERS': 1}):
+            bundle = json.loads(self.bundle(granularity='week', **params).content)
+
+        for section, (url, key) in standalone.items():
+            expected = json.loads(self.api.get(url, {'granularity': 'week', **params}).content)
+            self.assertEqual(bundle[section], expected[key] if key else expected, section)
+
+    def test_worker_errors_are_reported(self):
+        threads = []
+
+        def fail(*args):
+            threads.append(threading.current_thread().name)
+            raise RuntimeError('section exploded')
+
+        with mock.patch.object(CachedServiceReportManager, 'get_top_services', side_effect=fail), \
+                mock.patch.object(CachedServiceReportManager, 'get_performance_metrics', return_value={}):
+            response = self.bundle(sections='performance_metrics,top_services')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('section exploded', response.data['error'])
+        self.assertTrue(threads[0].startswith('report-bundle'))
+
+class QuickStatsCounterTests(ReportTestMixin, TestCase):
+
+    def test_counters_follow_completed_status_changes(self):
+        # The first read seeds the counters, later reads do not touch the database
+        self.api.get('/api/reports/quick-stats/')
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/reports/quick-stats/')
+        self.assertEqual(response.data['today_completed'], 3)
+
+        appointment = Appointment.objects.filter(scheduled_date=self.today, status='scheduled').get()
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'completed'
+            appointment.save()
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/reports/quick-stats/')
+        self.assertEqual(response.data['today_completed'], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.filter(scheduled_date=self.today, status='completed').first().delete()
+        self.assertEqual(self.api.get('/api/reports/quick-stats/').data['today_completed'], 3)
+        self.assertEqual(
+            CompletedServiceCounters.reconcile(self.today - timedelta(days=1), self.today), []
+        )
+
+
+    def test_reconcile_command_fixes_counters_seeded_by_the_server(self):
+        self.api.get('/api/reports/quick-stats/')
+        # The command runs in its own process and sees the counters the server seeded
+        key = COMPLETED_KEY.format(self.today.isoformat())
+        FileBasedCache(settings.CACHES['default']['LOCATION'], {}).set(key, 7)
+
+        output = io.StringIO()
+        call_command('reconcile_completed_counters', '--check-only', stdout=output)
+        self.assertIn(f'{self.today.isoformat()}: counter 7, table 3', output.getvalue())
+        self.assertEqual(cache.get(key), 7)
+
+        output = io.StringIO()
+        call_command('reconcile_completed_counters', stdout=output)
+        self.assertIn('Fixed 1 counters.', output.getvalue())
+        self.assertEqual(self.api.get('/api/reports/quick-stats/').data['today_completed'], 3)
+
+        output = io.StringIO()
+        call_command('reconcile_completed_counters', stdout=output)
+        self.assertIn('Counters match the appointments table.', output.getvalue())
+
+class AvailabilityTests(ReportTestMixin, TestCase):
+
+    def test_free_intervals_skip_taken_slots(self):
+        day = date(2030, 1, 7)
+        self.create_appointment(day, time(9), 'scheduled', duration_minutes=60)
+        self.create_appointment(day, time(10, 30), 'cancelled')
+        self.create_appointment(day, time(12, 10), 'in_progress', duration_minutes=50)
+
+        response = self.api.get('/api/availability/', {
+            'service_type': str(self.service_type.id),
+            'start': day.isoformat(),
+            'end': day.isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['professionals'][0]['days'], [{
+            'date': day,
+            'free': [
+                {'start': time(8), 'end': time(9)},
+                {'start': time(10), 'end': time(12)},
+                {'start': time(13), 'end': time(18)},
+            ],
+        }])
+
+    def test_range_is_bounded(self):
+        response = self.api.get('/api/availability/', {
+            'service_type': str(self.service_type.id),
+            'start': '2030-01-01',
+            'end': '2030-03-01',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class AppointmentOverlapTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.day = date(2030, 1, 7)
+        self.coloracao = self.create_appointment(self.day, time(10), 'scheduled', duration_minutes=180)
+
+    def book(self, scheduled_time, **extra):
+        payload = {
+            'client': str(self.client_obj.id),
+            'professional': str(self.professional.id),
+            'service_type': str(self.service_type.id),
+            'scheduled_date': self.day.isoformat(),
+            'scheduled_time': scheduled_time,
+            'duration_minutes': 45,
+            'price': '25.00',
+        }
+        payload.update(extra)
+        return self.api.post('/api/appointments/', payload, format='json')
+
+    def test_overlapping_booking_is_rejected(self):
+        response = self.book('10:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('10:00 to 13:00', response.data['scheduled_time'][0])
+
+        self.assertEqual(self.book('09:30').status_code, 400)
+        self.assertEqual(self.book('09:15').status_code, 201)
+        self.assertEqual(self.book('13:00').status_code, 201)
+
+    def test_freed_and_moved_appointments(self):
+        self.assertEqual(self.book('11:00', status='cancelled').status_code, 201)
+
+        response = self.api.patch(
+            f'/api/appointments/{self.coloracao.id}/', {'scheduled_time': '14:00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['end_minute'], 17 * 60)
+        self.assertEqual(self.book('10:30').status_code, 201)
+
+
+class BulkAppointmentTests(ReportTestMixin, TestCase):
+
+    def item(self, scheduled_time, **extra):
+        item = {
+            'client': str(self.client_obj.id),
+            'professional': str(self.professional.id),
+            'service_type': str(self.service_type.id),
+            'scheduled_date': '2030-01-07',
+            'scheduled_time': scheduled_time,
+            'duration_minutes': 60,
+            'price': '25.00',
+        }
+        item.update(extra)
+        return item
+
+    def test_partial_failures_are_reported_per_item(self):
+        existing = self.create_appointment(date(2030, 1, 7), time(8), 'scheduled', duration_minutes=60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post('/api/appointments/bulk/', [
+                self.item('09:00'),
+                self.item('09:30'),                      # overlaps the item above
+                self.item('11:00', professional=str(self.service_type.id)),
+                {'id': str(existing.id), 'scheduled_time': '10:00', 'status': 'completed'},
+                self.item('08:00'),                      # free once the existing one moved
+            ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (2, 1, 2))
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'error', 'error', 'updated', 'created']
+        )
+        self.assertIn('professional', response.data['results'][2]['errors'])
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.scheduled_time, existing.end_minute), (time(10), 11 * 60))
+        self.assertEqual(Appointment.objects.filter(scheduled_date=date(2030, 1, 7)).count(), 3)
+
+        report = self.api.get('/api/reports/completed-services/', {'start_date': '2030-01-07', 'end_date': '2030-01-07'})
+        self.assertEqual(report.data['summary']['total_services'], 1)
+
+
+class KeysetPaginationTests(ReportTestMixin, TestCase):
+
+    def collect(self, url, params, link):
+        pages = []
+        response = self.api.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            if not response.data[link]:
+                return response, pages
+            response = self.api.get(response.data[link])
+
+    def test_pages_walk_the_whole_list_both_ways(self):
+        expected = [
+            str(pk) for pk in Appointment.objects.order_by('scheduled_date', 'scheduled_time', 'id').values_list('pk', flat=True)
+        ]
+
+        last, pages = self.collect('/api/appointments/', {'page_size': 3, 'total': 'true'}, 'next')
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertIsNone(self.api.get('/api/appointments/', {'page_size': 3}).data['previous'])
+
+        first, back = self.collect(last.data['previous'], {}, 'previous')
+        self.assertEqual(back, [pages[1], pages[0]])
+
+    def test_total_and_invalid_cursor(self):
+        response = self.api.get('/api/appointments/', {'total': 'true'})
+        self.assertEqual((response.data['total'], response.data['total_is_estimate']), (7, False))
+        self.assertEqual(self.api.get('/api/clients/', {'cursor': 'bogus'}).status_code, 404)
+
+
+class AppointmentSyncTests(ReportTestMixin, TestCase):
+
+    def test_changes_since_token(self):
+        with self.settings(APPOINTMENT_SYNC={'LAG_SECONDS': 0}):
+            token = self.api.get('/api/appointments/changes/').data['token']
+            created = self.create_appointment(date(2030, 1, 7), time(9), 'scheduled')
+            removed = Appointment.objects.filter(scheduled_date=self.today).first()
+            removed_id = removed.id
+            removed.delete()
+
+            response = self.api.get('/api/appointments/changes/', {'since': token})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['id'] for row in response.data['changed']], [str(created.id)])
+            self.assertEqual(response.data['deleted'], [removed_id])
+
+            response = self.api.get('/api/appointments/changes/', {'since': response.data['token']})
+            self.assertEqual((response.data['changed'], response.data['deleted']), ([], []))
+
+    def test_pages_move_forward_when_rows_share_a_timestamp(self):
+        stamp = timezone.now() - timedelta(seconds=1)
+        Appointment.objects.update(updated_at=stamp)
+        token = AppointmentSync.encode_token(stamp - timedelta(minutes=1))
+
+        received = []
+        for _ in range(10):
+            changes = AppointmentSync.changes_since(token, limit=2)
+            received += [appointment.id for appointment in changes['changed']]
+            token = changes['token']
+            if not changes['has_more']:
+                break
+
+        self.assertFalse(changes['has_more'])
+        self.assertEqual(sorted(received), sorted(Appointment.objects.values_list('id', flat=True)))
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.api.get('/api/appointments/changes/', {'since': 'nope'}).status_code, 400)
+        forged = AppointmentSync.encode_token(timezone.now(), 'not-an-id')
+        self.assertEqual(self.api.get('/api/appointments/changes/', {'since': forged}).status_code, 400)
+
+        expired = AppointmentSync.encode_token(timezone.now() - timedelta(days=60))
+        self.assertEqual(self.api.get('/api/appointments/changes/', {'since': expired}).status_code, 410)
+
+
+class AppointmentEventsTests(ReportTestMixin, TestCase):
+
+    def book(self, scheduled_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.create_appointment(scheduled_date, time(9), 'scheduled')
+
+    async def test_stream_delivers_matching_changes(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get('/api/appointments/events/', {'token': token, 'date': '2030-01-07'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        await sync_to_async(self.book)(date(2030, 1, 8))
+        appointment = await sync_to_async(self.book)(date(2030, 1, 7))
+
+        message = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        self.assertIn('event: appointment', message)
+        self.assertIn(f'"id": "{appointment.id}"', message)
+        self.assertIn('"event": "created"', message)
+
+        # A client disconnect cancels the pending read, which unsubscribes the stream
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(broker.subscriber_count, 0)
+
+    async def test_unpadded_date_filter_matches(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get('/api/appointments/events/', {'token': token, 'date': '2030-1-7'})
+        self.assertEqual(response.status_code, 200)
+
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        appointment = await sync_to_async(self.book)(date(2030, 1, 7))
+
+        message = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        self.assertIn(f'"id": "{appointment.id}"', message)
+
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+
+    async def test_requires_a_valid_token(self):
+        response = await self.async_client.get('/api/appointments/events/', {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+class StatusTransitionTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.appointment = self.create_appointment(date(2030, 1, 7), time(9), 'scheduled')
+
+    def transition(self, new_status, **extra):
+        return self.api.patch(
+            f'/api/appointments/{self.appointment.id}/update_status/', dict(extra, status=new_status), format='json'
+        )
+
+    def test_conditional_update_and_version_conflict(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.transition('in_progress', version=1)
+        self.assertEqual(response.status_code, 200)
+        appointment_writes = [
+            query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "api_appointment"')
+        ]
+        self.assertEqual(len(appointment_writes), 1)
+        self.assertIn('"version" = 1', appointment_writes[0])
+        self.assertEqual(set(response.data), {'id', 'status', 'version', 'updated_at'})
+        self.assertEqual((response.data['status'], response.data['version']), ('in_progress', 2))
+
+        stale = self.transition('cancelled', version=1)
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual((stale.data['status'], stale.data['version']), ('in_progress', 2))
+
+        self.assertEqual(self.transition('scheduled').status_code, 400)
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.status, self.appointment.version), ('in_progress', 2))
+
+    def test_reinstating_into_a_taken_slot_conflicts(self):
+        self.assertEqual(self.transition('cancelled').status_code, 200)
+        self.create_appointment(date(2030, 1, 7), time(9, 30), 'scheduled')
+
+        response = self.transition('scheduled')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('09:30', response.data['error'])
+
+
+class AppointmentTimelineTests(ReportTestMixin, TestCase):
+
+    def test_every_write_path_appends_to_the_log(self):
+        appointment = self.create_appointment(date(2030, 1, 7), time(9), 'scheduled')
+        url = f'/api/appointments/{appointment.id}/'
+        self.api.patch(f'{url}update_status/', {'status': 'in_progress'}, format='json')
+        self.api.patch(url, {'notes': 'Chegou atrasada'}, format='json')
+        self.api.patch(f'{url}update_status/', {'status': 'completed'}, format='json')
+        self.api.delete(url)
+
+        response = self.api.get(f'{url}timeline/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(event['kind'], event['status']) for event in response.data['events']],
+            [('created', 'scheduled'), ('status_changed', 'in_progress'),
+             ('status_changed', 'completed'), ('deleted', 'completed')]
+        )
+        with self.assertRaises(ValueError):
+            AppointmentEvent.objects.filter(appointment_id=appointment.id).first().save()
+
+    def test_stage_durations_from_the_log(self):
+        appointment = self.create_appointment(self.today, time(14), 'scheduled')
+        scheduled_at = timezone.make_aware(datetime.combine(self.today, time(14)))
+        AppointmentEvent.objects.bulk_create([
+            AppointmentEvent(
+                appointment_id=appointment.id, professional_id=self.professional.id,
+                kind=AppointmentEvent.STATUS_CHANGED, status=event_status,
+                scheduled_date=self.today, scheduled_time=time(14),
+                occurred_at=scheduled_at + timedelta(minutes=minutes),
+            )
+            for event_status, minutes in (('in_progress', 10), ('completed', 55))
+        ])
+
+        response = self.api.get('/api/reports/stage-durations/', {'professional_id': self.professional.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['overall']['wait'], {'count': 1, 'average_minutes': 10.0, 'max_minutes': 10.0})
+        self.assertEqual(response.data['overall']['service']['average_minutes'], 45.0)
+        self.assertEqual(response.data['by_professional'][0]['professional_name'], 'Maria Silva')
+
+
+class AppointmentArchiveTests(ReportTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.old = [
+            cls.create_appointment(date(2024, 3, 4), time(hour), appointment_status)
+            for hour, appointment_status in ((9, 'completed'), (10, 'cancelled'), (11, 'completed'), (12, 'scheduled'))
+        ]
+
+    def snapshot(self):
+        return [
+            self.api.get('/api/appointments/', {'date': '2024-03-04'}).content,
+            self.api.get('/api/appointments/').content,
+            self.api.get(f'/api/appointments/{self.old[0].id}/').content,
+            self.api.get('/api/reports/completed-services/', {'start_date': '2024-01-01', 'granularity': 'month'}).content,
+            self.api.get('/api/reports/performance-metrics/', {'start_date': '2024-01-01'}).content,
+        ]
+
+    def test_archiving_keeps_lists_and_reports(self):
+        before = self.snapshot()
+        rollups = RollupManager.rebuild()
+
+        self.assertEqual(AppointmentArchive.archive(date(2025, 1, 1), batch_size=2), 3)
+        # Open appointments stay in the working table
+        self.assertEqual(Appointment.objects.filter(scheduled_date=date(2024, 3, 4)).count(), 1)
+        self.assertEqual(ArchivedAppointment.objects.count(), 3)
+        self.assertEqual(AppointmentArchive.latest_archived_date(), date(2024, 3, 4))
+
+        report_cache.entries.clear()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(RollupManager.rebuild(), rollups)
+
+        # Archived appointments are read-only
+        response = self.api.patch(f'/api/appointments/{self.old[0].id}/', {'notes': 'x'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_archiving_from_another_process_is_seen_at_once(self):
+        before = self.snapshot()
+
+        # The command runs with its own cache, nothing is shared with this process
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                   'LOCATION': 'archive-command'}}):
+            call_command('archive_appointments', before='2025-01-01', stdout=io.StringIO())
+        self.assertEqual(ArchivedAppointment.objects.count(), 3)
+
+        report_cache.entries.clear()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_recent_dates_read_only_the_working_table(self):
+        AppointmentArchive.archive(date(2025, 1, 1))
+
+        for day, reads_archive in ((self.today, False), (date(2024, 3, 4), True)):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.get('/api/appointments/', {'date': day.isoformat()})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                any('api_appointment_record' in query['sql'] for query in queries.captured_queries),
+                reads_archive
+            )
+
+
+class ScheduleOptimizerTests(ReportTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.day = date(2030, 1, 7)
+        cls.colorist = Professional.objects.create(name='Ana Santos', cpf='12345678902', specialties='Coloração')
+        cls.coloring = ServiceType.objects.create(
+            name='Coloração', description='Coloração de cabelo', base_price=Decimal('120.00'), duration_minutes=60
+        )
+        cls.create_appointment(cls.day, time(9), 'scheduled')
+
+    def propose(self, requests, day=None):
+        return self.api.post('/api/availability/optimize/', {
+            'date': (day or self.day).isoformat(),
+            'requests': requests,
+        }, format='json')
+
+    def test_specialties_decide_eligibility(self):
+        eligible = SpecialtyMatcher.eligibility(
+            [('maria', 'Cabelo, Coloracao'), ('ana', 'Manicure; Pedicure'), ('pedro', '')],
+            [('coloring', 'Coloração', 'Coloração de cabelo'), ('nails', 'Manicure', 'Manicure completa'),
+             ('massage', 'Massagem', 'Massagem relaxante')],
+        )
+        self.assertEqual(eligible, {
+            'coloring': ['maria', 'pedro'],
+            'nails': ['ana', 'pedro'],
+            'massage': ['pedro'],
+        })
+
+    def test_requests_are_fitted_without_conflicts(self):
+        response = self.propose([
+            {'service_type': str(self.service_type.id), 'start': '09:00', 'end': '10:30', 'client': str(self.client_obj.id)},
+            {'service_type': str(self.coloring.id), 'start': '09:00', 'end': '11:00', 'professional': str(self.colorist.id)},
+            {'service_type': str(self.service_type.id), 'start': '09:00', 'end': '09:30'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        assigned = {item['request']: item for item in response.data['assigned']}
+        self.assertEqual(
+            (assigned[0]['professional'], assigned[0]['scheduled_time'], assigned[0]['client']),
+            (self.professional.id, time(9, 45), str(self.client_obj.id))
+        )
+        self.assertEqual((assigned[1]['professional'], assigned[1]['scheduled_time']), (self.colorist.id, time(9)))
+        self.assertEqual(response.data['unassigned'], [2])
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.propose([{'service_type': str(self.coloring.id), 'start': '09:00', 'end': '10:00'}],
+                                      day=self.today - timedelta(days=1)).status_code, 400)
+        response = self.propose([{'service_type': str(self.coloring.id), 'start': '11:00', 'end': '10:00'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Request 0: start must be before end')
+
+
+class WaitlistTests(ReportTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.day = date(2030, 1, 7)
+        cls.appointment = cls.create_appointment(cls.day, time(10), 'scheduled')
+        cls.waiting_client = Client.objects.create(
+            name='Cliente 2', cpf='10000000002', phone='+5511999990002', email='cliente2@email.com'
+        )
+
+        def entry(client=None, **fields):
+            values = {
+                'client': client or cls.waiting_client,
+                'service_type': cls.service_type,
+                'earliest_date': cls.day - timedelta(days=3),
+                'latest_date': cls.day + timedelta(days=3),
+                'earliest_time': time(9),
+                'latest_time': time(12),
+            }
+            values.update(fields)
+            return WaitlistEntry.objects.create(**values)
+
+        cls.any_professional = entry()
+        cls.preferred = entry(professional=cls.professional, earliest_time=time(10), latest_time=time(11))
+        entry(earliest_time=time(14), latest_time=time(16))
+        entry(earliest_date=cls.day + timedelta(days=1))
+        entry(status='booked')
+        entry(client=cls.client_obj)
+
+    def test_cancelling_offers_the_slot_to_matching_entries(self):
+        response = self.api.patch(
+            f'/api/appointments/{self.appointment.id}/update_status/', {'status': 'cancelled'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(candidate['waitlist_entry'], candidate['scheduled_time'], candidate['preferred_professional'])
+             for candidate in response.data['waitlist_candidates']],
+            [(self.preferred.id, time(10), True), (self.any_professional.id, time(10), False)]
+        )
+
+    def offered(self, candidates):
+        return [(candidate['waitlist_entry'], candidate['scheduled_time']) for candidate in candidates]
+
+    def test_cancelling_through_patch_and_bulk_offers_the_slot(self):
+        expected = [(self.preferred.id, time(10)), (self.any_professional.id, time(10))]
+        url = f'/api/appointments/{self.appointment.id}/'
+
+        response = self.api.patch(url, {'notes': 'Call first'}, format='json')
+        self.assertNotIn('waitlist_candidates', response.data)
+        response = self.api.patch(url, {'status': 'no_show'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.offered(response.data['waitlist_candidates']), expected)
+
+        # Afterwards the candidates can still be fetched
+        response = self.api.get('/api/waitlist/candidates/', {'appointment': str(self.appointment.id)})
+        self.assertEqual(self.offered(response.data['waitlist_candidates']), expected)
+
+        self.api.patch(url, {'status': 'scheduled'}, format='json')
+        response = self.api.get('/api/waitlist/candidates/', {'appointment': str(self.appointment.id)})
+        self.assertEqual(response.status_code, 400)
+        response = self.api.post('/api/appointments/bulk/', [
+            {'id': str(self.appointment.id), 'status': 'cancelled'},
+        ], format='json')
+        self.assertEqual(self.offered(response.data['results'][0]['waitlist_candidates']), expected)
+
+        self.assertEqual(self.api.get('/api/waitlist/candidates/', {'appointment': 'nope'}).status_code, 404)
+
+    def test_matching_reads_the_open_entries_index(self):
+        # The queryset candidates() reads, for a freed 10:00-11:00 slot
+        entries = WaitlistMatcher.open_entries(
+            self.professional.id, self.day, [self.service_type.id], time(10), time(11),
+            exclude_client_id=self.client_obj.id
+        )
+        self.assertIn('idx_waitlist_open', entries.explain())
+
+    def test_window_must_be_ordered(self):
+        response = self.api.post('/api/waitlist/', {
+            'client': str(self.waiting_client.id), 'service_type': str(self.service_type.id),
+            'earliest_date': '2030-01-07', 'latest_date': '2030-01-06',
+            'earliest_time': '09:00', 'latest_time': '12:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('latest_date', response.data)
+
+
+class ValuesSerializationTests(ReportTestMixin, TestCase):
+
+    def assert_same_list_response(self, viewset, url, params):
+        fast = self.api.get(url, params)
+        with mock.patch.object(viewset, 'values_serialization', False):
+            regular = self.api.get(url, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_appointment_list_is_byte_identical(self):
+        response = self.assert_same_list_response(AppointmentViewSet, '/api/appointments/', {'page_size': 4})
+        self.assertEqual(len(response.data['results']), 4)
+        following = self.assert_same_list_response(AppointmentViewSet, response.data['next'], {})
+        self.assertEqual(len(following.data['results']), 3)
+
+    def test_client_list_is_byte_identical(self):
+        Client.objects.create(
+            name='Ana Souza', cpf='10000000002', phone='+5511999990002',
+            email='ana@email.com', birth_date=date(1990, 5, 17)
+        )
+        response = self.assert_same_list_response(ClientViewSet, '/api/clients/', {'search': 'a'})
+        self.assertEqual(response.data['results'][0]['birth_date'], '1990-05-17')
+
+
+class FieldsetTests(ReportTestMixin, TestCase):
+
+    def test_fields_trim_payload_and_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/clients/', {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        self.assertNotIn('address', queries.captured_queries[0]['sql'])
+
+        self.assertEqual(self.api.get('/api/clients/', {'fields': 'id,nope'}).status_code, 400)
+
+    def test_expand_nests_only_the_requested_related_fields(self):
+        appointment = Appointment.objects.filter(status='scheduled').first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(
+                f'/api/appointments/{appointment.id}/', {'fields': 'id,price,client.name', 'expand': 'professional'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'client', 'professional', 'price'})
+        self.assertEqual(response.data['client'], {'name': 'Cliente 1'})
+        self.assertEqual(response.data['professional']['name'], 'Maria Silva')
+        # The archive boundary lookup plus the appointment with its relations
+        self.assertEqual(len(queries.captured_queries), 2)
+        self.assertNotIn('"api_client"."email"', queries.captured_queries[1]['sql'])
+
+        self.assertEqual(self.api.get('/api/appointments/', {'expand': 'notes'}).status_code, 400)
+
+
+class FastRendererTests(ReportTestMixin, TestCase):
+
+    def test_fast_json_matches_drf_json_byte_for_byte(self):
+        payloads = [
+            {
+                'when': timezone.now(), 'day': date(2030, 1, 7), 'at': time(9, 30), 'price': Decimal('25.50'),
+                'id': self.professional.id, 'label': gettext_lazy('Scheduled'), 'text': 'linha\u2028nova "aspas"',
+                'floats': [0.1, 1e16, 2.5e-05, 0.0001], 'big': 2 ** 70, 1: None, 'nested': (1, 2),
+            },
+            self.api.get('/api/appointments/').data,
+            ServiceReportManager.get_completed_services_report(),
+        ]
+        for payload in payloads:
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(
+            FastJSONRenderer().render(payloads[0], 'application/json; indent=2'),
+            JSONRenderer().render(payloads[0], 'application/json; indent=2')
+        )
+
+    def test_fast_json_parser_round_trips(self):
+        body = JSONRenderer().render({'status': 'completed', 'version': 2 ** 70, 'notes': 'ok'})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body))['version'], 2 ** 70)
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"status": NaN}'))
+
+    @skipUnless(msgpack_available(), 'msgpack is not installed')
+    def test_msgpack_negotiation(self):
+        response = self.api.get('/api/appointments/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(response.content)), json.loads(
+            self.api.get('/api/appointments/').content
+        ))
+
+
+class CompressionMiddlewareTests(ReportTestMixin, TestCase):
+
+    def test_pages_and_lists_are_gzipped_and_cached(self):
+        page = self.client.get('/reports/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(page['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', page['Vary'])
+        self.assertIn(b'</html>', gzip.decompress(page.content))
+
+        middleware = CompressionMiddleware(lambda request: HttpResponse(b'{"a": 1}' * 500, content_type='application/json'))
+        request = RequestFactory().get('/api/appointments/', HTTP_ACCEPT_ENCODING='gzip')
+        first, second = middleware(request), middleware(request)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(middleware.cache.stats()['hits'], 1)
+
+        plain = self.api.get('/api/dashboard/stats/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_streaming_bodies_are_compressed_except_event_streams(self):
+        export = self.api.get(
+            '/api/reports/completed-services/export/', {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0'
+        )
+        self.assertEqual(export['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(b''.join(export.streaming_content)).startswith(b'id,'))
+
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter([b'data: {}\n\n']), content_type='text/event-stream')
+        )
+        events = middleware(RequestFactory().get('/api/appointments/events/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertFalse(events.has_header('Content-Encoding'))
+
+
+class BenchmarkingTests(TestCase):
+
+    def generate(self, *sizes):
+        dataset = SyntheticDataset(date(2030, 1, 31), seed=7, span_days=5, professionals=3, clients=4)
+        for size in sizes:
+            dataset.grow(size)
+        rows = list(Appointment.objects.order_by('scheduled_date', 'scheduled_time', 'professional__name').values_list(
+            'scheduled_date', 'scheduled_time', 'professional__name', 'client__name', 'service_type__name',
+            'price', 'status',
+        ))
+        for model in (Appointment, Professional, Client, ServiceType):
+            model.objects.all().delete()
+        return rows
+
+    def test_synthetic_dataset_is_deterministic(self):
+        rows = self.generate(12)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(len(set(row[:3] for row in rows)), 12)
+        # Growing in steps stores the same rows as growing at once
+        self.assertEqual(self.generate(5, 12), rows)
+
+    def test_measure_reports_latency_queries_and_memory(self):
+        result = measure(lambda: list(ServiceType.objects.all()), repeat=3, track_memory=True)
+        self.assertEqual(set(result), {'p50_ms', 'p95_ms', 'mean_ms', 'queries', 'peak_memory_kib'})
+        self.assertEqual(result['queries'], 1)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.utils import timezone
+from .models import AppointmentEvent, Professional
+
+
+# Stages measured by the stage-durations report, as (name, status that ends it)
+STAGES = (
+    ('wait', 'in_progress'),
+    ('service', 'completed'),
+)
+
+
+def _event_kind(before, after):
+    """Kind of event a write produces, None when it changes nothing the log tracks"""
+    if before is None:
+        return AppointmentEvent.CREATED
+    if after is None:
+        return AppointmentEvent.DELETED
+    if before.status != after.status:
+        return AppointmentEvent.STATUS_CHANGED
+    if (before.scheduled_date, before.scheduled_time, before.professional_id) != (
+        after.scheduled_date, after.scheduled_time, after.professional_id
+    ):
+        return AppointmentEvent.RESCHEDULED
+    return None
+
+
+def _minutes(delta):
+    return delta.total_seconds() / 60
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'average_minutes': None, 'max_minutes': None}
+    return {
+        'count': len(values),
+        'average_minutes': round(sum(values) / len(values), 1),
+        'max_minutes': round(max(values), 1),
+    }
+
+
+class AppointmentTimeline:
+    """
+    Writes and reads the appointment event log.
+
+    Events are inserted by notify_appointment_changes, inside the
+    transaction of the write that produced them.
+    """
+
+    @staticmethod
+    def record(changes, now=None):
+        """
+        Append the events of a batch of appointment writes.
+
+        Args:
+            changes (list): (before, after) AppointmentSnapshot pairs
+
+        Returns:
+            list: AppointmentEvent instances created
+        """
+        now = now or timezone.now()
+        events = []
+        for before, after in changes:
+            kind = _event_kind(before, after)
+            if kind is None:
+                continue
+            state = after or before
+            events.append(AppointmentEvent(
+                appointment_id=state.id,
+                professional_id=state.professional_id,
+                kind=kind,
+                status=state.status,
+                scheduled_date=state.scheduled_date,
+                scheduled_time=state.scheduled_time,
+                occurred_at=now,
+            ))
+        return AppointmentEvent.objects.bulk_create(events) if events else []
+
+    @staticmethod
+    def for_appointment(appointment_id):
+        """Events of one appointment, oldest first"""
+        return AppointmentEvent.objects.filter(appointment_id=appointment_id).order_by('occurred_at', 'id')
+
+    @staticmethod
+    def stage_durations(start_date, end_date, professional_id=None):
+        """
+        Get how long appointments waited to start and how long the service took.
+
+        wait is the time from the scheduled start to the move to in_progress
+        (negative when started early), service the time from in_progress to
+        completed. Both are read in one ordered pass over the log; a stage is
+        counted when both of its events happened within the period.
+
+        Args:
+            start_date (date): First day of the period
+            end_date (date): Last day of the period
+            professional_id: Only count this professional's appointments
+
+        Returns:
+            dict: Overall and per-professional count, average and max minutes of each stage
+        """
+        tz = timezone.get_current_timezone()
+        window_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz)
+        window_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()), tz)
+
+        events = AppointmentEvent.objects.filter(
+            occurred_at__gte=window_start,
+            occurred_at__lt=window_end,
+            status__in=[status for _, status in STAGES],
+        )
+        if professional_id:
+            events = events.filter(professional_id=professional_id)
+        rows = events.order_by('appointment_id', 'occurred_at', 'id').values_list(
+            'appointment_id', 'professional_id', 'status', 'scheduled_date', 'scheduled_time', 'occurred_at'
+        )
+
+        durations = defaultdict(lambda: {name: [] for name, _ in STAGES})
+        current_id = started_at = None
+        for appointment_id, prof_id, status, scheduled_date, scheduled_time, occurred_at in rows.iterator():
+            if appointment_id != current_id:
+                current_id, started_at = appointment_id, None
+
+            if status == 'in_progress':
+                scheduled_at = timezone.make_aware(datetime.combine(scheduled_date, scheduled_time), tz)
+                durations[prof_id]['wait'].append(_minutes(occurred_at - scheduled_at))
+                started_at = occurred_at
+            elif started_at is not None:
+                durations[prof_id]['service'].append(_minutes(occurred_at - started_at))
+                started_at = None
+
+        names = dict(Professional.objects.filter(pk__in=durations).values_list('id', 'name'))
+        overall = {name: [] for name, _ in STAGES}
+        by_professional = []
+        for prof_id, stages in durations.items():
+            for name, values in stages.items():
+                overall[name].extend(values)
+            by_professional.append({
+                'professional_id': str(prof_id),
+                'professional_name': names.get(prof_id),
+                **{name: _summary(values) for name, values in stages.items()},
+            })
+        by_professional.sort(key=lambda row: row['professional_name'] or '')
+
+        return {
+            'overall': {name: _summary(values) for name, values in overall.items()},
+            'by_professional': by_professional,
+        }
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Appointment, Professional
+from .signals import AppointmentSnapshot, TRACKED_FIELDS, notify_appointment_change
+
+
+class TransitionError(Exception):
+    """A status change that cannot be applied, with the HTTP status to answer"""
+
+    def __init__(self, message, status_code, **details):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+
+
+class StatusTransitions:
+    """
+    Status changes applied with one conditional UPDATE.
+
+    The row is only written when its version still matches the one read
+    (or sent by the client), so two receptionists changing the same
+    appointment cannot silently overwrite each other: the second one gets
+    a conflict instead.
+    """
+
+    @staticmethod
+    def allowed(current_status, new_status):
+        return new_status in Appointment.STATUS_TRANSITIONS.get(current_status, ())
+
+    @staticmethod
+    def apply(appointment_id, new_status, expected_version=None):
+        """
+        Move an appointment to a new status.
+
+        Args:
+            appointment_id: Appointment primary key
+            new_status (str): Target status
+            expected_version (int): Version the client last saw, None to use the current one
+
+        Returns:
+            dict: id, status, version and updated_at after the change
+
+        Raises:
+            TransitionError: Not found (404), invalid or disallowed status (400),
+                version conflict (409) or overlapping a booking when reinstated (409)
+        """
+        if new_status not in dict(Appointment.STATUS_CHOICES):
+            raise TransitionError('Invalid status', 400)
+
+        with transaction.atomic():
+            row = Appointment.objects.filter(pk=appointment_id).order_by().values_list(
+                'version', *TRACKED_FIELDS
+            ).first()
+            if row is None:
+                raise TransitionError('Appointment not found', 404)
+
+            version, *state = row
+            before = AppointmentSnapshot(appointment_id, *state)
+
+            if expected_version is not None and expected_version != version:
+                raise TransitionError(
+                    'The appointment was changed by someone else', 409,
+                    status=before.status, version=version
+                )
+
+            if not StatusTransitions.allowed(before.status, new_status):
+                raise TransitionError(
+                    f'Cannot change status from {before.status} to {new_status}', 400,
+                    allowed=list(Appointment.STATUS_TRANSITIONS.get(before.status, ()))
+                )
+
+            if new_status in Appointment.BLOCKING_STATUSES and before.status not in Appointment.BLOCKING_STATUSES:
+                StatusTransitions._check_slot_is_free(before)
+
+            now = timezone.now()
+            updated = Appointment.objects.filter(pk=appointment_id, version=version).update(
+                status=new_status, updated_at=now, version=F('version') + 1
+            )
+            if not updated:
+                raise TransitionError('The appointment was changed by someone else', 409)
+
+            # The UPDATE bypasses model signals
+            notify_appointment_change(before, before._replace(status=new_status))
+
+        return {
+            'id': appointment_id,
+            'status': new_status,
+            'version': version + 1,
+            'updated_at': now,
+        }
+
+    @staticmethod
+    def _check_slot_is_free(state):
+        """A reinstated appointment takes its slot back, unless someone else was booked there"""
+        list(Professional.objects.select_for_update().filter(pk=state.professional_id).values_list('pk'))
+        conflict = (
+            Appointment.objects.overlapping(
+                state.professional_id, state.scheduled_date, state.scheduled_time, state.duration_minutes
+            )
+            .exclude(pk=state.id)
+            .values_list('scheduled_time', flat=True)
+            .first()
+        )
+        if conflict is not None:
+            raise TransitionError(
+                f'The professional already has an appointment at {conflict:%H:%M} in this slot', 409
+            )
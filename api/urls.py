@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from . import views_reports
+from . import views_events
 
 router = DefaultRouter()
 router.register(r'users', views.CustomUserViewSet)
@@ -11,19 +12,31 @@ router.register(r'clients', views.ClientViewSet)
 router.register(r'service-types', views.ServiceTypeViewSet)
 router.register(r'appointments', views.AppointmentViewSet)
 router.register(r'receptionists', views.ReceptionistViewSet)
+router.register(r'waitlist', views.WaitlistEntryViewSet)
 
 urlpatterns = [
+    # Before the router, which would take "events" for an appointment id
+    path('appointments/events/', views_events.appointment_events, name='appointment_events'),
     path('', include(router.urls)),
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('availability/', views.availability, name='availability'),
+    path('availability/optimize/', views.optimize_schedule, name='optimize_schedule'),
     
     # Report endpoints
     path('reports/completed-services/', views_reports.completed_services_report, name='completed_services_report'),
+    path('reports/completed-services/export/', views_reports.completed_services_export, name='completed_services_export'),
     path('reports/performance-metrics/', views_reports.performance_metrics, name='performance_metrics'),
     path('reports/top-services/', views_reports.top_services, name='top_services'),
     path('reports/professional-performance/', views_reports.professional_performance, name='professional_performance'),
     path('reports/quick-stats/', views_reports.quick_stats, name='quick_stats'),
+    path('reports/analytics/breakdown/', views_reports.analytics_breakdown, name='analytics_breakdown'),
+    path('reports/stage-durations/', views_reports.stage_durations, name='stage_durations'),
+    path('reports/bundle/', views_reports.report_bundle, name='report_bundle'),
+    path('reports/cache-stats/', views_reports.report_cache_stats, name='report_cache_stats'),
+    path('reports/jobs/', views_reports.report_jobs, name='report_jobs'),
+    path('reports/jobs/<uuid:job_id>/', views_reports.report_job_detail, name='report_job_detail'),
 ]
 
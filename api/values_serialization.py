@@ -0,0 +1,153 @@
+import copy
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from .fieldsets import select_fields
+
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.EmailField, serializers.IntegerField,
+    serializers.BooleanField, serializers.ChoiceField,
+)
+
+
+def _column(model, source):
+    """ORM path of a dotted serializer source, e.g. client.name -> client__name"""
+    parts = source.split('.')
+    for index, part in enumerate(parts):
+        field = model._meta.get_field(part)
+        if index < len(parts) - 1:
+            if not field.is_relation:
+                raise FieldDoesNotExist(source)
+            model = field.related_model
+        elif field.is_relation:
+            raise FieldDoesNotExist(source)
+    return '__'.join(parts)
+
+
+class ValuesSerializer:
+    """
+    Serializes rows of a .values() queryset exactly as a ModelSerializer would.
+
+    The serializer's fields are compiled once into (key, column, converter)
+    steps: model fields and dotted sources become ORM paths, get_X_display
+    becomes a label lookup built from the choices, and each value goes
+    through the same DRF field's to_representation (skipped for fields that
+    return strings and numbers unchanged). Rows never become model
+    instances, which is where most of the list time went.
+
+    Serializers with fields that cannot be read from columns (method
+    fields, nested serializers, properties) are not supported.
+    """
+    _compiled = {}
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._set_steps(self._compile(serializer_class))
+
+    def _set_steps(self, steps):
+        self.steps = steps
+        self.columns = list(dict.fromkeys(column for _, column, _ in steps))
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        """Compiled ValuesSerializer of a serializer class, None when it is not supported"""
+        if serializer_class not in cls._compiled:
+            try:
+                cls._compiled[serializer_class] = cls(serializer_class)
+            except (FieldDoesNotExist, ValueError):
+                cls._compiled[serializer_class] = None
+        return cls._compiled[serializer_class]
+
+    @staticmethod
+    def _compile(serializer_class):
+        model = serializer_class.Meta.model
+        steps = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+
+            source = field.source
+            if source.startswith('get_') and source.endswith('_display'):
+                model_field = model._meta.get_field(source[len('get_'):-len('_display')])
+                labels = {value: str(label) for value, label in model_field.flatchoices}
+                steps.append((name, model_field.attname, lambda value, labels=labels: labels.get(value, str(value))))
+            elif isinstance(field, PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise ValueError(f'{name}: pk_field is not supported')
+                steps.append((name, model._meta.get_field(source).attname, None))
+            elif isinstance(field, (
+                serializers.BaseSerializer, serializers.SerializerMethodField,
+                serializers.RelatedField, serializers.ManyRelatedField,
+            )):
+                raise ValueError(f'{name}: {type(field).__name__} cannot be read from columns')
+            else:
+                convert = None if type(field) in PASSTHROUGH_FIELDS else field.to_representation
+                steps.append((name, _column(model, source), convert))
+        return steps
+
+    def restricted(self, fields):
+        """
+        Copy serializing only some of the fields, as requested with ?fields=.
+
+        Raises:
+            ValidationError: When a field does not exist
+        """
+        steps = select_fields({step[0]: step for step in self.steps}, fields)
+        restricted = copy.copy(self)
+        restricted._set_steps(list(steps.values()))
+        return restricted
+
+    def values(self, queryset, extra=()):
+        """
+        The queryset as dict rows holding the serialized columns.
+
+        Args:
+            extra (tuple): More columns to select, e.g. the keyset pagination ordering
+        """
+        return queryset.values(*dict.fromkeys(self.columns + list(extra)))
+
+    def to_representation(self, rows):
+        """Serialize an iterable of values() rows into a list of dicts"""
+        steps = self.steps
+        data = []
+        for row in rows:
+            item = {}
+            for key, column, convert in steps:
+                value = row[column]
+                item[key] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class ValuesListMixin:
+    """
+    ViewSet list action that serializes through ValuesSerializer.
+
+    The response is identical to the regular list; views whose list
+    serializer is not supported, and requests expanding relations, fall
+    back to it. Requests trimmed with ?fields= (FieldsetViewSetMixin)
+    select and serialize only those columns.
+    """
+    values_serialization = True
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = (
+            ValuesSerializer.for_serializer(self.get_serializer_class()) if self.values_serialization else None
+        )
+        fieldset = self.get_fieldset() if hasattr(self, 'get_fieldset') else None
+        if values_serializer is not None and fieldset is not None:
+            fields, expand = fieldset
+            values_serializer = None if expand else values_serializer.restricted(fields)
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = values_serializer.values(
+            self.filter_queryset(self.get_queryset()), extra=getattr(self, 'keyset_ordering', ())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(queryset))
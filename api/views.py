@@ -3,26 +3,42 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-from datetime import datetime, date
-from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist
+from django.utils import timezone
+from datetime import datetime, date, timedelta
+from .archive import AppointmentArchive
+from .availability import AvailabilityManager
+from .bulk import BULK_MAX_ITEMS, BulkAppointmentWriter
+from .scheduling import SCHEDULE_MAX_REQUESTS, ScheduleOptimizer
+from .sync import AppointmentSync, TokenExpired
+from .timeline import AppointmentTimeline
+from .transitions import StatusTransitions, TransitionError
+from .fieldsets import FieldsetViewSetMixin
+from .values_serialization import ValuesListMixin
+from .waitlist import FREEING_STATUSES, WaitlistMatcher
+from .models import CustomUser, Professional, Client, ServiceType, Appointment, Receptionist, WaitlistEntry
+from .reports import AppointmentStats
 from .serializers import (
     CustomUserSerializer, ProfessionalSerializer, ClientSerializer,
     ServiceTypeSerializer, AppointmentSerializer, AppointmentListSerializer,
-    ReceptionistSerializer, LoginSerializer
+    AppointmentEventSerializer, ReceptionistSerializer, WaitlistEntrySerializer, LoginSerializer
 )
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(FieldsetViewSetMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('id',)
 
 
-class ProfessionalViewSet(viewsets.ModelViewSet):
+class ProfessionalViewSet(FieldsetViewSetMixin, viewsets.ModelViewSet):
     queryset = Professional.objects.all()
     serializer_class = ProfessionalSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('name', 'id')
     
     def get_queryset(self):
         queryset = Professional.objects.all()
@@ -32,10 +48,11 @@ class ProfessionalViewSet(viewsets.ModelViewSet):
         return queryset.order_by('name')
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(FieldsetViewSetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('name', 'id')
     
     def get_queryset(self):
         queryset = Client.objects.all()
@@ -55,10 +72,11 @@ class ClientViewSet(viewsets.ModelViewSet):
         return queryset.order_by('name')
 
 
-class ServiceTypeViewSet(viewsets.ModelViewSet):
+class ServiceTypeViewSet(FieldsetViewSetMixin, viewsets.ModelViewSet):
     queryset = ServiceType.objects.all()
     serializer_class = ServiceTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('name', 'id')
     
     def get_queryset(self):
         queryset = ServiceType.objects.all()
@@ -68,28 +86,71 @@ class ServiceTypeViewSet(viewsets.ModelViewSet):
         return queryset.order_by('name')
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(FieldsetViewSetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('scheduled_date', 'scheduled_time', 'id')
     
     def get_serializer_class(self):
         if self.action == 'list':
             return AppointmentListSerializer
         return AppointmentSerializer
     
-    def get_queryset(self):
-        queryset = Appointment.objects.select_related('client', 'professional', 'service_type')
+    # Validation locks the professional, so the overlap check and the write share one transaction
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
+    def update(self, request, *args, **kwargs):
+        """
+        Update an appointment. When the change cancels it or marks it as a
+        no-show, `waitlist_candidates` lists the waitlist entries that can
+        take the freed slot, as in update_status.
+        """
+        self.freed_slot = False
+        with transaction.atomic():
+            response = super().update(request, *args, **kwargs)
+        if self.freed_slot:
+            response.data['waitlist_candidates'] = WaitlistMatcher.for_appointment(
+                self.kwargs['pk'], now=timezone.localtime()
+            )
+        return response
+    
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        super().perform_update(serializer)
+        self.freed_slot = WaitlistMatcher.frees_slot(previous_status, serializer.instance.status)
+    
+    def get_source(self, filter_date=None):
+        """
+        Appointments the action reads from.
         
-        # Filter by date
+        Lists and details include archived appointments only when the
+        requested day can be in the archive. Writes always go to the working
+        table, so archived appointments are read-only.
+        """
+        if self.action == 'list':
+            return AppointmentArchive.queryset(filter_date)
+        if self.action == 'retrieve':
+            return AppointmentArchive.queryset()
+        return Appointment.objects.all()
+    
+    def get_queryset(self):
+        filter_date = None
         date_param = self.request.query_params.get('date', None)
         if date_param:
             try:
                 filter_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-                queryset = queryset.filter(scheduled_date=filter_date)
             except ValueError:
                 pass
         
+        queryset = self.get_source(filter_date).select_related('client', 'professional', 'service_type')
+        
+        # Filter by date
+        if filter_date is not None:
+            queryset = queryset.filter(scheduled_date=filter_date)
+        
         # Filter by status
         status_param = self.request.query_params.get('status', None)
         if status_param:
@@ -107,6 +168,100 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('scheduled_date', 'scheduled_time')
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create and update many appointments in one transaction.
+        
+        Accepts a list of appointments (or {"appointments": [...]}). Items
+        with an id update that appointment. Each item gets its own result,
+        items that fail validation or conflict are skipped and the rest are
+        saved.
+        """
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('appointments')
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Expected a non-empty list of appointments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'A bulk request cannot exceed {BULK_MAX_ITEMS} appointments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            results = BulkAppointmentWriter.write(items, user=request.user)
+        except IntegrityError:
+            return Response(
+                {'error': 'The batch conflicts with appointments saved at the same time, retry it'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        counts = {'created': 0, 'updated': 0, 'error': 0}
+        for result in results:
+            counts[result['status']] += 1
+        
+        return Response({
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'failed': counts['error'],
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Get the appointments created, updated or deleted after a sync token.
+        
+        Query parameters:
+        - since: Token from an earlier call; without it only a starting token is returned
+        
+        Clients take a starting token, load the list, then call this with the
+        latest token and apply `changed` as upserts and `deleted` as removals.
+        """
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'token': AppointmentSync.current_token(), 'changed': [], 'deleted': [], 'has_more': False})
+        
+        try:
+            changes = AppointmentSync.changes_since(since)
+        except ValueError:
+            return Response({'error': 'Invalid sync token'}, status=status.HTTP_400_BAD_REQUEST)
+        except TokenExpired:
+            return Response(
+                {'error': 'The sync token expired, reload the appointment list'},
+                status=status.HTTP_410_GONE
+            )
+        
+        return Response({
+            'token': changes['token'],
+            'has_more': changes['has_more'],
+            'changed': AppointmentListSerializer(changes['changed'], many=True).data,
+            'deleted': changes['deleted'],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Get the event log of an appointment, oldest first.
+        
+        Also answers for deleted appointments, whose log is kept.
+        """
+        try:
+            events = list(AppointmentTimeline.for_appointment(self.kwargs['pk']))
+        except ValidationError:
+            events = []
+        if not events:
+            return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'appointment_id': self.kwargs['pk'],
+            'events': AppointmentEventSerializer(events, many=True).data,
+        })
+    
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's appointments"""
@@ -117,27 +272,92 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
-        """Update appointment status"""
-        appointment = self.get_object()
-        new_status = request.data.get('status')
+        """
+        Update appointment status.
         
-        if new_status not in dict(Appointment.STATUS_CHOICES):
-            return Response(
-                {'error': 'Invalid status'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        Send the `version` last read to have the change rejected with 409
+        when someone else modified the appointment in the meantime. When the
+        appointment is cancelled or marked no_show, `waitlist_candidates`
+        lists the waitlist entries that can take the freed slot, best first.
+        """
+        version = request.data.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid version'}, status=status.HTTP_400_BAD_REQUEST)
         
-        appointment.status = new_status
-        appointment.save()
+        try:
+            result = StatusTransitions.apply(self.kwargs['pk'], request.data.get('status'), version)
+        except (ValueError, ValidationError):
+            return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
+        except TransitionError as error:
+            return Response(dict(error.details, error=error.message), status=error.status_code)
         
-        serializer = self.get_serializer(appointment)
-        return Response(serializer.data)
+        if result['status'] in FREEING_STATUSES:
+            result['waitlist_candidates'] = WaitlistMatcher.for_appointment(self.kwargs['pk'], now=timezone.localtime())
+        return Response(result)
 
 
-class ReceptionistViewSet(viewsets.ModelViewSet):
+class ReceptionistViewSet(FieldsetViewSetMixin, viewsets.ModelViewSet):
     queryset = Receptionist.objects.all()
     serializer_class = ReceptionistSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('employee_id', 'id')
+
+
+class WaitlistEntryViewSet(FieldsetViewSetMixin, viewsets.ModelViewSet):
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('created_at', 'id')
+    
+    def get_queryset(self):
+        queryset = WaitlistEntry.objects.select_related('client', 'service_type')
+        
+        # Filter by status
+        status_param = self.request.query_params.get('status', None)
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+        
+        # Filter by client
+        client_param = self.request.query_params.get('client', None)
+        if client_param:
+            queryset = queryset.filter(client_id=client_param)
+        
+        # Filter by service type
+        service_type_param = self.request.query_params.get('service_type', None)
+        if service_type_param:
+            queryset = queryset.filter(service_type_id=service_type_param)
+        
+        return queryset.order_by('created_at')
+    
+    @action(detail=False, methods=['get'])
+    def candidates(self, request):
+        """
+        Get the waitlist entries that can take the slot of a cancelled or no-show appointment.
+        
+        Query parameters:
+        - appointment: Appointment UUID
+        """
+        try:
+            appointment = Appointment.objects.filter(pk=request.query_params.get('appointment')).values_list(
+                'id', 'status'
+            ).first()
+        except ValidationError:
+            appointment = None
+        if appointment is None:
+            return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
+        if appointment[1] not in FREEING_STATUSES:
+            return Response(
+                {'error': 'Only cancelled and no-show appointments free their slot'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'appointment': appointment[0],
+            'waitlist_candidates': WaitlistMatcher.for_appointment(appointment[0], now=timezone.localtime()),
+        })
 
 
 @api_view(['POST'])
@@ -183,19 +403,109 @@ def dashboard_stats(request):
     """Get dashboard statistics"""
     today = date.today()
     
+    # All of today's appointment figures come from a single query
+    today_stats = AppointmentStats.aggregate(Appointment.objects.filter(scheduled_date=today))
+    
     stats = {
         'total_clients': Client.objects.filter(is_active=True).count(),
         'total_professionals': Professional.objects.filter(is_active=True).count(),
         'total_services': ServiceType.objects.filter(is_active=True).count(),
-        'today_appointments': Appointment.objects.filter(scheduled_date=today).count(),
-        'pending_appointments': Appointment.objects.filter(
-            scheduled_date=today, 
-            status='scheduled'
-        ).count(),
-        'completed_appointments': Appointment.objects.filter(
-            scheduled_date=today, 
-            status='completed'
-        ).count(),
+        'today_appointments': today_stats['total'],
+        'pending_appointments': today_stats['by_status']['scheduled'],
+        'completed_appointments': today_stats['by_status']['completed'],
     }
     
     return Response(stats)
+
+
+# Longest range /api/availability/ searches in one request
+AVAILABILITY_MAX_DAYS = 31
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def availability(request):
+    """
+    Get the free intervals in which each active professional can take a service.
+    
+    Query parameters:
+    - service_type: Service type UUID (required), its duration sets the window to fit
+    - start: First day (YYYY-MM-DD format, default: today)
+    - end: Last day (YYYY-MM-DD format, default: 13 days after start)
+    - professional: Only search this professional UUID
+    """
+    service_type_id = request.query_params.get('service_type')
+    if not service_type_id:
+        return Response({'error': 'service_type is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        service_type = ServiceType.objects.get(pk=service_type_id)
+    except (ServiceType.DoesNotExist, ValueError, ValidationError):
+        return Response({'error': 'Service type not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        start = request.query_params.get('start')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else timezone.localdate()
+        end = request.query_params.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else start + timedelta(days=13)
+    except ValueError:
+        return Response(
+            {'error': 'Invalid date format. Use YYYY-MM-DD.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if start > end:
+        return Response({'error': 'start cannot be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days >= AVAILABILITY_MAX_DAYS:
+        return Response(
+            {'error': f'The search range cannot exceed {AVAILABILITY_MAX_DAYS} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    professional_id = request.query_params.get('professional')
+    try:
+        result = AvailabilityManager.find_free_slots(
+            service_type, start, end, professional_id=professional_id, now=timezone.localtime()
+        )
+    except (ValueError, ValidationError):
+        return Response({'error': 'Invalid professional'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def optimize_schedule(request):
+    """
+    Propose professionals and times for a batch of pending requests on one day.
+    
+    Body: {"date": "YYYY-MM-DD", "requests": [{"service_type": id, "start": "HH:MM",
+    "end": "HH:MM", "professional": id (optional, preferred), "client": id (optional)}]}
+    
+    Each request is fitted inside its window, on a professional whose
+    specialties match the service, without overlapping the day's appointments
+    or the other proposals. Nothing is saved.
+    """
+    try:
+        day = datetime.strptime(str(request.data.get('date')), '%Y-%m-%d').date()
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+    now = timezone.localtime()
+    if day < now.date():
+        return Response({'error': 'Cannot schedule a past day'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = request.data.get('requests')
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Expected a non-empty list of requests'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > SCHEDULE_MAX_REQUESTS:
+        return Response(
+            {'error': f'Cannot optimize more than {SCHEDULE_MAX_REQUESTS} requests at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        result = ScheduleOptimizer.propose(day, items, now=now)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(result)
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .events import broker
+
+
+def _authenticate(request):
+    """
+    Authenticate with the JWT from the Authorization header or the `token` query parameter.
+
+    EventSource cannot send headers, so browsers pass the access token in the URL.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+
+    try:
+        validated = authentication.get_validated_token(raw_token)
+        return authentication.get_user(validated)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _message(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f"id: {event['sequence']}\nevent: appointment\ndata: {data}\n\n"
+
+
+async def _stream(date, professional_id, heartbeat):
+    # Subscribe from the loop that consumes the response, the view itself
+    # may run on another one when sync middleware is installed
+    subscription = broker.subscribe(date=date, professional_id=professional_id)
+    try:
+        # Reconnect quickly if the connection drops
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+
+            yield _message(event)
+            if subscription.lagged and subscription.queue.empty():
+                yield 'event: resync\ndata: {}\n\n'
+                return
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def appointment_events(request):
+    """
+    Server-sent events stream of appointment changes (requires an ASGI server).
+    
+    Query parameters:
+    - date: Only changes touching this day (YYYY-MM-DD format)
+    - professional: Only changes touching this professional UUID
+    - token: JWT access token, when it cannot be sent in the Authorization header
+    
+    Each change arrives as an `appointment` event whose data holds the
+    event kind (created, updated, deleted), the appointment and its previous
+    state. A `resync` event means changes were dropped and the client
+    should reload its list.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'}, status=401)
+
+    date = request.GET.get('date')
+    if date:
+        parsed = parse_date(date)
+        if not parsed:
+            return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+        # Events carry zero-padded ISO dates, '2024-1-5' must match them too
+        date = parsed.isoformat()
+
+    professional_id = request.GET.get('professional')
+    if professional_id:
+        try:
+            professional_id = str(uuid.UUID(professional_id))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid professional'}, status=400)
+
+    heartbeat = getattr(settings, 'APPOINTMENT_EVENTS', {}).get('HEARTBEAT_SECONDS', 15)
+    response = StreamingHttpResponse(_stream(date, professional_id, heartbeat), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,12 +1,111 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+import csv
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.core.exceptions import ValidationError
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .reports import ServiceReportManager, ReportOptimizer
-from .models import Professional, ServiceType
+from .report_cache import CachedServiceReportManager, report_cache
+from .reports import EXPORT_COLUMNS, GRANULARITIES
+from .renderers import CSVRenderer, NDJSONRenderer
+from .models import Appointment, Professional, ServiceType, ReportJob
+from .jobs import ReportJobManager
+from .timeline import AppointmentTimeline
+from .analytics import BREAKDOWN_DIMENSIONS, get_store, numpy_available
+from .serializers import ReportJobRequestSerializer, ReportJobSerializer
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+BUNDLE_SECTIONS = (
+    'completed_services', 'performance_metrics', 'top_services',
+    'professional_performance', 'quick_stats',
+)
+
+_bundle_executor = None
+_bundle_executor_lock = threading.Lock()
+
+
+def _get_bundle_executor():
+    """Thread pool computing bundle sections, or None when sections run sequentially"""
+    global _bundle_executor
+    workers = getattr(settings, 'REPORT_BUNDLE', {}).get('WORKERS', len(BUNDLE_SECTIONS))
+    if workers <= 1:
+        return None
+    with _bundle_executor_lock:
+        if _bundle_executor is None:
+            _bundle_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-bundle')
+        return _bundle_executor
+
+
+def _run_bundle_section(compute):
+    try:
+        return compute()
+    finally:
+        # Pool threads are outside the request cycle, release their connection here
+        close_old_connections()
+
+
+class _Echo:
+    """File-like object that returns what is written, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def _with_header(header, rows):
+    yield header
+    yield from rows
+
+
+def _parse_report_filters(request):
+    """
+    Parse and validate the filters shared by the completed services reports.
+
+    Returns:
+        tuple: (filters dict, None) on success or (None, error Response)
+    """
+    filters = {
+        'start_date': None,
+        'end_date': None,
+        'professional_id': request.GET.get('professional_id') or None,
+        'service_type_id': request.GET.get('service_type_id') or None,
+    }
+
+    for name in ('start_date', 'end_date'):
+        value = request.GET.get(name)
+        if value:
+            filters[name] = parse_date(value)
+            if not filters[name]:
+                return None, Response(
+                    {'error': f'Invalid {name} format. Use YYYY-MM-DD.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+    if filters['start_date'] and filters['end_date'] and filters['start_date'] > filters['end_date']:
+        return None, Response(
+            {'error': 'start_date cannot be after end_date.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        if filters['professional_id'] and not Professional.objects.filter(id=filters['professional_id']).exists():
+            return None, Response({'error': 'Professional not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if filters['service_type_id'] and not ServiceType.objects.filter(id=filters['service_type_id']).exists():
+            return None, Response({'error': 'Service type not found.'}, status=status.HTTP_404_NOT_FOUND)
+    except ValidationError:
+        return None, Response({'error': 'Invalid professional_id or service_type_id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return filters, None
 
 
 @api_view(['GET'])
@@ -20,6 +119,7 @@ def completed_services_report(request):
     - end_date: End date (YYYY-MM-DD format)
     - professional_id: Filter by professional UUID
     - service_type_id: Filter by service type UUID
+    - granularity: Bucket size of daily_breakdown: day (default), week, month or quarter
     """
     try:
         # Parse query parameters
@@ -27,6 +127,13 @@ def completed_services_report(request):
         end_date_str = request.GET.get('end_date')
         professional_id = request.GET.get('professional_id')
         service_type_id = request.GET.get('service_type_id')
+        granularity = request.GET.get('granularity', 'day')
+        
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'error': f'Invalid granularity. Use one of: {", ".join(GRANULARITIES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Parse dates
         start_date = None
@@ -76,11 +183,12 @@ def completed_services_report(request):
                 )
         
         # Generate report
-        report_data = ServiceReportManager.get_completed_services_report(
+        report_data = CachedServiceReportManager.get_completed_services_report(
             start_date=start_date,
             end_date=end_date,
             professional_id=professional_id,
-            service_type_id=service_type_id
+            service_type_id=service_type_id,
+            granularity=granularity
         )
         
         return Response(report_data, status=status.HTTP_200_OK)
@@ -92,6 +200,45 @@ def completed_services_report(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVRenderer, NDJSONRenderer])
+def completed_services_export(request):
+    """
+    API endpoint for streaming every completed service row as CSV or NDJSON.
+    
+    Query parameters:
+    - format: csv (default) or ndjson
+    - start_date: Start date (YYYY-MM-DD format)
+    - end_date: End date (YYYY-MM-DD format)
+    - professional_id: Filter by professional UUID
+    - service_type_id: Filter by service type UUID
+    """
+    filters, error = _parse_report_filters(request)
+    if error:
+        return error
+
+    rows = CachedServiceReportManager.iter_completed_services(chunk_size=EXPORT_CHUNK_SIZE, **filters)
+    columns = [name for name, lookup in EXPORT_COLUMNS]
+    export_format = request.accepted_renderer.format
+
+    if export_format == 'ndjson':
+        content = (
+            json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+    else:
+        writer = csv.writer(_Echo())
+        content = (writer.writerow(row) for row in _with_header(columns, rows))
+
+    filename = 'completed_services_{}_{}.{}'.format(
+        filters['start_date'] or 'start', filters['end_date'] or 'end', export_format
+    )
+    response = StreamingHttpResponse(content, content_type=f'{request.accepted_renderer.media_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def performance_metrics(request):
@@ -128,7 +275,7 @@ def performance_metrics(request):
                 )
         
         # Generate performance metrics
-        metrics_data = ServiceReportManager.get_performance_metrics(
+        metrics_data = CachedServiceReportManager.get_performance_metrics(
             start_date=start_date,
             end_date=end_date
         )
@@ -188,7 +335,7 @@ def top_services(request):
                 )
         
         # Get top services
-        top_services_data = ServiceReportManager.get_top_services(
+        top_services_data = CachedServiceReportManager.get_top_services(
             start_date=start_date,
             end_date=end_date,
             limit=limit
@@ -246,7 +393,7 @@ def professional_performance(request):
                 )
         
         # Get professional performance data
-        performance_data = ServiceReportManager.get_professional_performance(
+        performance_data = CachedServiceReportManager.get_professional_performance(
             start_date=start_date,
             end_date=end_date
         )
@@ -274,39 +421,234 @@ def quick_stats(request):
     Optimized for performance with large datasets.
     """
     try:
-        # Get today's date
-        today = timezone.now().date()
-        
-        # Get quick stats using optimized queries
-        today_completed = ReportOptimizer.get_optimized_completed_services_count(
-            start_date=today,
-            end_date=today
+        return Response(
+            CachedServiceReportManager.get_quick_stats(timezone.now().date()),
+            status=status.HTTP_200_OK
         )
         
-        # Get this month's stats
-        month_start = today.replace(day=1)
-        month_completed = ReportOptimizer.get_optimized_completed_services_count(
-            start_date=month_start,
-            end_date=today
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred while getting quick stats: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-        
-        # Get this week's stats
-        week_start = today - timedelta(days=today.weekday())
-        week_completed = ReportOptimizer.get_optimized_completed_services_count(
-            start_date=week_start,
-            end_date=today
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_bundle(request):
+    """
+    API endpoint returning every report section for one filter set in a single response.
+    Independent sections are computed concurrently.
+    
+    Query parameters:
+    - start_date: Start date (YYYY-MM-DD format)
+    - end_date: End date (YYYY-MM-DD format)
+    - professional_id: Filter completed_services by professional UUID
+    - service_type_id: Filter completed_services by service type UUID
+    - limit: Number of top services to return (default: 10)
+    - granularity: Bucket size of the completed services breakdown (default: day)
+    - sections: Comma-separated subset of sections (default: all)
+    """
+    try:
+        filters, error = _parse_report_filters(request)
+        if error:
+            return error
+
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'error': f'Invalid granularity. Use one of: {", ".join(GRANULARITIES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = int(request.GET.get('limit', '10'))
+            if limit <= 0:
+                limit = 10
+        except ValueError:
+            limit = 10
+
+        sections = request.GET.get('sections')
+        sections = [name for name in sections.split(',') if name] if sections else list(BUNDLE_SECTIONS)
+        unknown = [name for name in sections if name not in BUNDLE_SECTIONS]
+        if unknown:
+            return Response(
+                {'error': f'Unknown sections: {", ".join(unknown)}. Choose from {", ".join(BUNDLE_SECTIONS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start_date = filters['start_date']
+        end_date = filters['end_date']
+        today = timezone.now().date()
+        section_tasks = {
+            'completed_services': lambda: CachedServiceReportManager.get_completed_services_report(
+                granularity=granularity, **filters
+            ),
+            'performance_metrics': lambda: CachedServiceReportManager.get_performance_metrics(start_date, end_date),
+            'top_services': lambda: CachedServiceReportManager.get_top_services(start_date, end_date, limit),
+            'professional_performance': lambda: CachedServiceReportManager.get_professional_performance(start_date, end_date),
+            'quick_stats': lambda: CachedServiceReportManager.get_quick_stats(today),
+        }
+
+        executor = _get_bundle_executor()
+        if executor is None or len(sections) == 1:
+            results = {name: section_tasks[name]() for name in sections}
+        else:
+            futures = {name: executor.submit(_run_bundle_section, section_tasks[name]) for name in sections}
+            results = {name: future.result() for name, future in futures.items()}
+
+        return Response({
+            'period': {
+                'start_date': start_date.isoformat() if start_date else None,
+                'end_date': end_date.isoformat() if end_date else None
+            },
+            'limit': limit,
+            **results
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred while generating the report bundle: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics_breakdown(request):
+    """
+    API endpoint slicing appointments by one dimension using the in-memory columnar engine.
+    Requires numpy.
+    
+    Query parameters:
+    - dimension: professional, service_type, weekday (0 = Monday), hour or status
+    - status: Only count this status (default: completed, use "all" for every status)
+    - start_date, end_date, professional_id, service_type_id: Same filters as completed services
+    """
+    if not numpy_available():
+        return Response(
+            {'error': 'The analytics engine is not available. Install numpy to enable it.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
+
+    filters, error = _parse_report_filters(request)
+    if error:
+        return error
+
+    dimension = request.GET.get('dimension')
+    if dimension not in BREAKDOWN_DIMENSIONS:
+        return Response(
+            {'error': f'dimension must be one of {", ".join(BREAKDOWN_DIMENSIONS)}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    status_filter = request.GET.get('status', 'completed')
+    if status_filter == 'all':
+        status_filter = None
+    elif status_filter not in dict(Appointment.STATUS_CHOICES):
+        return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        breakdown = get_store().breakdown(dimension, status=status_filter, **filters)
         
         return Response({
-            'today_completed': today_completed,
-            'week_completed': week_completed,
-            'month_completed': month_completed,
-            'date': today.isoformat()
+            'dimension': dimension,
+            'status': status_filter,
+            'breakdown': breakdown,
+            'period': {
+                'start_date': filters['start_date'].isoformat() if filters['start_date'] else None,
+                'end_date': filters['end_date'].isoformat() if filters['end_date'] else None
+            }
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response(
-            {'error': f'An error occurred while getting quick stats: {str(e)}'},
+            {'error': f'An error occurred while computing the breakdown: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stage_durations(request):
+    """
+    API endpoint for how long appointments wait to start and how long services take,
+    read from the appointment event log.
+    
+    Query parameters:
+    - start_date: Start date (YYYY-MM-DD format, default: 29 days before end_date)
+    - end_date: End date (YYYY-MM-DD format, default: today)
+    - professional_id: Filter by professional UUID
+    """
+    filters, error = _parse_report_filters(request)
+    if error:
+        return error
+
+    end_date = filters['end_date'] or timezone.localdate()
+    start_date = filters['start_date'] or end_date - timedelta(days=29)
+    if start_date > end_date:
+        return Response({'error': 'start_date cannot be after end_date.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    durations = AppointmentTimeline.stage_durations(start_date, end_date, professional_id=filters['professional_id'])
+
+    return Response({
+        **durations,
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def report_cache_stats(request):
+    """
+    API endpoint for inspecting the report cache.
+    Returns entry count, hit/miss/eviction counters and the current data version.
+    """
+    return Response(report_cache.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def report_jobs(request):
+    """
+    API endpoint for computing a report in the background.
+
+    Body:
+    - report: completed_services, performance_metrics, top_services or professional_performance
+    - start_date, end_date: Date range (YYYY-MM-DD format)
+    - professional_id, service_type_id: Filters for completed_services
+    - limit: Number of top services (default: 10)
+
+    Returns the job; poll /api/reports/jobs/<id>/ until its status is completed or failed.
+    A finished job for the same spec is returned as is while the data has not changed.
+    """
+    serializer = ReportJobRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    parameters = dict(serializer.validated_data)
+    report = parameters.pop('report')
+    job, created = ReportJobManager.submit(report, parameters, user=request.user)
+
+    return Response(
+        ReportJobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED if job.status in ('pending', 'running') else status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_detail(request, job_id):
+    """
+    API endpoint for polling a background report job.
+    The result is stored with the job, so repeated downloads are not recomputed.
+    """
+    try:
+        job = ReportJob.objects.get(id=job_id)
+    except ReportJob.DoesNotExist:
+        return Response({'error': 'Report job not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(ReportJobSerializer(job).data, status=status.HTTP_200_OK)
@@ -0,0 +1,167 @@
+from django.db.models import F, Q
+from .availability import AvailabilityManager, ScheduleGrid, _minutes
+from .models import Appointment, Professional, ServiceType, WaitlistEntry
+from .scheduling import SpecialtyMatcher
+
+
+# Largest number of candidates offered for one freed slot
+WAITLIST_MAX_CANDIDATES = 10
+
+# Statuses that free the appointment's slot
+FREEING_STATUSES = ('cancelled', 'no_show')
+
+
+class WaitlistMatcher:
+    """
+    Finds the waitlist entries that can take a slot freed by a cancellation.
+
+    The database only returns open entries for the day whose hours overlap
+    the freed interval, for services the professional can perform
+    (idx_waitlist_open), so the waitlist is never scanned as a whole. Each
+    one is then checked against the professional's free slots of the day
+    with the ScheduleGrid bitmaps: its service must fit inside its own
+    hours, in free time touching the freed interval.
+
+    Candidates are ranked by whether they asked for this professional,
+    then by how long they have been waiting.
+    """
+
+    @staticmethod
+    def frees_slot(previous_status, status):
+        """Whether a status change frees the appointment's time (None as previous status for a new appointment)"""
+        return status in FREEING_STATUSES and previous_status not in FREEING_STATUSES
+
+    @staticmethod
+    def for_appointment(appointment_id, now=None, grid=None, limit=WAITLIST_MAX_CANDIDATES):
+        """Candidates for the slot of a cancelled or no-show appointment"""
+        row = (
+            Appointment.objects.filter(pk=appointment_id)
+            .values_list('professional_id', 'client_id', 'scheduled_date', 'scheduled_time', 'duration_minutes')
+            .first()
+        )
+        if row is None:
+            return []
+        professional_id, client_id, day, start_time, duration = row
+        return WaitlistMatcher.candidates(
+            professional_id, day, start_time, duration, exclude_client_id=client_id, now=now, grid=grid, limit=limit
+        )
+
+    @staticmethod
+    def open_entries(professional_id, day, service_type_ids, start_time, end_time, exclude_client_id=None):
+        """
+        Open entries of a day whose hours overlap [start_time, end_time), best ranked first.
+
+        Returns:
+            QuerySet: Tuples of id, client id and name, service type id and
+            name, preferred professional id, earliest and latest time and
+            created_at
+        """
+        entries = (
+            WaitlistEntry.objects.filter(
+                status='waiting',
+                service_type_id__in=service_type_ids,
+                earliest_date__lte=day,
+                latest_date__gte=day,
+                earliest_time__lt=end_time,
+                latest_time__gt=start_time,
+            )
+            .filter(Q(professional__isnull=True) | Q(professional_id=professional_id))
+            # Best ranked first, so reading stops once enough entries fit
+            .order_by(F('professional').asc(nulls_last=True), 'created_at')
+            .values_list(
+                'id', 'client_id', 'client__name', 'service_type_id', 'service_type__name',
+                'professional_id', 'earliest_time', 'latest_time', 'created_at'
+            )
+        )
+        if exclude_client_id is not None:
+            entries = entries.exclude(client_id=exclude_client_id)
+        return entries
+
+    @staticmethod
+    def candidates(professional_id, day, start_time, duration_minutes, exclude_client_id=None, now=None, grid=None,
+                   limit=WAITLIST_MAX_CANDIDATES):
+        """
+        Rank the waitlist entries that fit a professional's freed interval.
+
+        Args:
+            professional_id: Professional whose time was freed
+            day (date): Day of the freed interval
+            start_time (time): Start of the freed interval
+            duration_minutes (int): Length of the freed interval
+            exclude_client_id: Client to leave out, e.g. the one who cancelled
+            now (datetime): Slots before this moment are not offered
+
+        Returns:
+            list: Dicts with the entry, client, service and proposed start time, best first
+        """
+        grid = grid or ScheduleGrid()
+        if not grid.is_open(day) or (now is not None and day < now.date()):
+            return []
+
+        freed = grid.mask(start_time, duration_minutes)
+        busy = AvailabilityManager.busy_bitmaps(grid, day, day, [professional_id]).get((professional_id, day), 0)
+        if now is not None and now.date() == day:
+            elapsed = _minutes(now.time()) - grid.opening
+            if elapsed > 0:
+                busy |= grid.mask(grid.slot_time(0), elapsed)
+        if not freed & ~busy:
+            return []
+
+        professional = Professional.objects.filter(pk=professional_id).values_list('specialties', flat=True).first()
+        service_types = list(ServiceType.objects.filter(is_active=True).values_list(
+            'id', 'name', 'description', 'duration_minutes'
+        ))
+        eligibility = SpecialtyMatcher.eligibility(
+            [(professional_id, professional or '')],
+            [(service_id, name, description) for service_id, name, description, duration in service_types],
+        )
+        durations = {
+            service_id: duration for service_id, name, description, duration in service_types
+            if eligibility[service_id]
+        }
+        if not durations:
+            return []
+
+        first = (freed & -freed).bit_length() - 1
+        end = freed.bit_length()
+        entries = WaitlistMatcher.open_entries(
+            professional_id, day, list(durations), grid.slot_time(first), grid.slot_time(end), exclude_client_id
+        )
+
+        candidates = []
+        for (entry_id, client_id, client_name, service_type_id, service_name,
+             preferred_id, earliest_time, latest_time, created_at) in entries.iterator(chunk_size=100):
+            slots_needed = grid.slots_needed(durations[service_type_id])
+            # Starts inside the entry's hours whose slots overlap the freed interval
+            lowest = max(0, first - slots_needed + 1)
+            touching = ((1 << (end - lowest)) - 1) << lowest
+            starts = (
+                grid.fitting_starts(busy, slots_needed)
+                & grid.start_window(earliest_time, latest_time, slots_needed)
+                & touching
+            )
+            if not starts:
+                continue
+
+            # The freed start when possible, otherwise the closest start to it
+            slot = min(
+                (bit for bit in range(starts.bit_length()) if starts >> bit & 1),
+                key=lambda bit: (abs(bit - first), bit)
+            )
+            candidates.append({
+                'waitlist_entry': entry_id,
+                'client': client_id,
+                'client_name': client_name,
+                'service_type': service_type_id,
+                'service_name': service_name,
+                'professional': professional_id,
+                'scheduled_date': day,
+                'scheduled_time': grid.slot_time(slot),
+                'duration_minutes': durations[service_type_id],
+                'preferred_professional': preferred_id == professional_id,
+                'waiting_since': created_at,
+            })
+            if len(candidates) == limit:
+                break
+
+        return candidates
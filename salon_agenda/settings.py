@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
+import importlib.util
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it compresses what every other middleware produced
+    'api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -85,6 +89,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # bookings cannot both pass the overlap check before writing
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -144,6 +153,94 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson-backed JSON (byte-identical to DRF's, stdlib fallback without orjson)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# MessagePack (Accept / Content-Type: application/msgpack) is offered when msgpack is installed
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('api.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('api.parsers.MessagePackParser')
+
+# Shared by every process of the server and the management commands: report
+# data versions, completed-service counters. SQLite keeps the app on one host,
+# so a cache directory is enough; point SALON_CACHE_DIR at a local disk.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SALON_CACHE_DIR', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 86400,
+    }
+}
+
+# Tests use a throwaway cache directory
+TEST_RUNNER = 'salon_agenda.test_runner.TestRunner'
+
+# Report result cache (in-process LRU, versions kept in the default cache)
+REPORT_CACHE = {
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': 300,   # seconds an entry is served, even if no invalidation reached this process
+}
+
+# Threads computing /api/reports/bundle/ sections (1 computes them sequentially)
+REPORT_BUNDLE = {
+    'WORKERS': 5,
+}
+
+# Background report jobs (local thread pool, no external broker)
+REPORT_JOBS = {
+    'WORKERS': 2,
+}
+
+# Opening hours used by the availability search (weekday 0 is Monday)
+SALON_HOURS = {
+    'OPENING_TIME': '08:00',
+    'CLOSING_TIME': '18:00',
+    'SLOT_MINUTES': 15,
+    'CLOSED_WEEKDAYS': [6],
+}
+
+# Per-day completed-service counters behind /api/reports/quick-stats/
+# (seconds before a seeded counter is re-read from the database)
+REPORT_COUNTERS = {
+    'TIMEOUT': 86400,
+}
+
+# Delta sync of /api/appointments/changes/
+APPOINTMENT_SYNC = {
+    'LAG_SECONDS': 5,                 # re-read window for late-committing writes
+    'TOMBSTONE_RETENTION_DAYS': 30,   # older tokens get 410 Gone
+    'MAX_CHANGES': 1000,
+}
+
+# Server-sent events of /api/appointments/events/ (in-process broker, single node)
+APPOINTMENT_EVENTS = {
+    'HEARTBEAT_SECONDS': 15,
+    'QUEUE_SIZE': 100,
+}
+
+# Response compression (brotli when installed, otherwise gzip)
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,            # bytes, smaller non-streaming responses are sent as is
+    'BROTLI_QUALITY': 5,
+    'CACHE_ENTRIES': 256,        # compressed bodies kept for repeated responses
+    'CACHE_MAX_SIZE': 1048576,   # larger bodies are not kept
+}
+
+# Archiving of closed appointments (python manage.py archive_appointments)
+APPOINTMENT_ARCHIVE = {
+    'HORIZON_DAYS': 365,   # closed appointments older than this leave the working table
+    'BATCH_SIZE': 1000,    # appointments moved per transaction
 }
 
 # JWT Configuration